@@ -3,6 +3,8 @@ import streamlit as st
 import pandas as pd
 from pathlib import Path
 import all_reports_master_merged as report  # таны үндсэн кодыг дуудаж байна
+import chart_of_accounts as coa
+import job_panel
 
 st.set_page_config(page_title="JET Audit Automation", layout="centered")
 
@@ -18,41 +20,27 @@ st.markdown("""
 # -----------------------------
 gl_file = st.file_uploader("GL Excel файл оруулна уу", type=["xlsx"])
 tb_file = st.file_uploader("TB Excel файл оруулж болно (заавал биш)", type=["xlsx"])
+coa_file = st.file_uploader("Дансны төлөвлөгөө (Prefix, Class) – заавал биш", type=["xlsx","csv"])
+low_memory = st.checkbox("Санах ой хэмнэх горим (маш том GL-д)", value=False,
+                         help="Sheet бүрийг мөр мөрөөр нь дискэнд бичнэ; санах ой GL-ийн хэмжээнээс хамаарахгүй.")
 
 # -----------------------------
 # Generate Report Button
 # -----------------------------
 if st.button("✅ Тайлан үүсгэх"):
     if gl_file:
-        # Түр хадгалалт
-        gl_path = Path("uploaded_gl.xlsx")
-        with open(gl_path, "wb") as f:
-            f.write(gl_file.read())
-
-        if tb_file:
-            tb_path = Path("uploaded_tb.xlsx")
-            with open(tb_path, "wb") as f:
-                f.write(tb_file.read())
-        else:
-            tb_path = None
-
-        # Таны кодын замуудыг өөрчилнө
-        report.INPUT_XLSX_GL = gl_path
-        report.INPUT_XLSX_TB = tb_path if tb_file else gl_path
-        report.OUTPUT_XLSX   = Path("final_report.xlsx")
-
-        # Кодоо ажиллуулна
-        with st.spinner("⏳ Тайлан үүсгэж байна..."):
-            report.main()
-
-        # Татах линк гаргана
-        st.success("✔ Тайлан амжилттай үүсгэлээ!")
-        with open("final_report.xlsx", "rb") as f:
-            st.download_button(
-                label="📥 Тайлан татах",
-                data=f,
-                file_name="JET_Audit_Report.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            )
+        try:
+            chart = coa.load_chart(coa_file) if coa_file else None
+        except ValueError as e:
+            st.error(f"⚠ {e}")
+            st.stop()
+
+        # Ажлыг process pool-ийн дараалалд өгнө; энэ session хүлээхгүй
+        job_panel.start(report.report_from_bytes, gl_file.getvalue(),
+                        tb_file.getvalue() if tb_file else None, chart,
+                        low_memory=low_memory, label=gl_file.name)
     else:
         st.error("⚠ GL файл заавал оруулах хэрэгтэй.")
+
+# Төлөв / татах линк
+job_panel.show("JET_Audit_Report.xlsx")
@@ -2,10 +2,23 @@
 # -*- coding: utf-8 -*-
 # pip install pandas openpyxl xlsxwriter
 
+import io
+import os
 import re
+import tempfile
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import pandas as pd
 import numpy as np
+import chart_of_accounts as coa
+import frame_compact
+import report_bundle
+import results_export
+import stage_timer
+import xlsx_cache
+import xlsx_stream
 
 # ---------------------------------------------------------------------
 # Config
@@ -14,6 +27,24 @@ INPUT_XLSX_GL = Path(r"C:\pYTHON\steppe road data.xlsx")  # GL
 INPUT_XLSX_TB = Path(r"C:\pYTHON\Steppe Road of Development LLC-JET Statistics 1.xlsx")  # TB (trial balance)
 OUTPUT_XLSX   = Path(r"C:\pYTHON\All_Tests_Report1.xlsx")
 TITLE_DATE    = "31 December 2024"
+COMPANY_NAME  = "Steppe Road of Development LLC"
+# True: xlsxwriter constant_memory – sheet бүр мөр мөрөөрөө дискэнд урсана,
+# санах ой GL-ийн хэмжээнээс хамаарахгүй (текст нь inline string болно)
+LOW_MEMORY    = False
+# Харилцагчийн дансны төлөвлөгөө (xlsx/csv: Prefix, Class[, Statement]);
+# None бол chart_of_accounts.DEFAULT_CHART
+CHART_OF_ACCOUNTS = None
+# Test-үүдийн үр дүнг зэрэг тооцох thread-ийн тоо (1 = дараалсан)
+SPEC_WORKERS  = os.cpu_count() or 1
+# Нэг хүснэгтэд sheet дээр үлдэх мөрийн дээд тоо; илүүдэл нь sidecar файлд
+# (report_bundle) ордог тул тайлангийн хэмжээ, бичих хугацаа GL-ээс хамаарахгүй.
+ROW_BUDGET    = int(os.getenv("JET_SHEET_ROW_BUDGET", "500000"))
+# sheet тус бүрийн тусгай хязгаар, жишээ нь {"GL - Raw": 100_000, "Test 6": 50_000}
+SHEET_ROW_BUDGETS = {}
+# Тестүүдийн хүснэгтийг Parquet + manifest.json болгон энд гаргана (None = гаргахгүй)
+RESULTS_DIR   = None
+# True: Excel огт бичихгүй, зөвхөн RESULTS_DIR (integration job-д)
+HEADLESS      = False
 
 # ---------------------------------------------------------------------
 # Helpers
@@ -47,26 +78,31 @@ def clean_sheet_name(name: str) -> str:
     return name[:31]  # Excel limit
 
 def load_first_sheet(xlsx_path: Path, prefer_keywords: list[str]) -> tuple[pd.DataFrame, str]:
-    xls = pd.ExcelFile(xlsx_path)
+    # sheet-ийн нэрсийг workbook metadata-аас; өгөгдлийг cache эсвэл chunk-аар уншина
+    sheet_names = xlsx_stream.sheet_names(xlsx_path)
+    sheet = None
     # exact match
     for kw in prefer_keywords:
-        exact = next((s for s in xls.sheet_names if s.strip().lower() == kw.lower()), None)
-        if exact:
-            df = pd.read_excel(xls, sheet_name=exact, engine="openpyxl")
-            return df.rename(columns={c: str(c).strip() for c in df.columns}), exact
+        sheet = next((s for s in sheet_names if s.strip().lower() == kw.lower()), None)
+        if sheet: break
     # contains
-    for kw in prefer_keywords:
-        contains = next((s for s in xls.sheet_names if kw.lower() in s.strip().lower()), None)
-        if contains:
-            df = pd.read_excel(xls, sheet_name=contains, engine="openpyxl")
-            return df.rename(columns={c: str(c).strip() for c in df.columns}), contains
+    if not sheet:
+        for kw in prefer_keywords:
+            sheet = next((s for s in sheet_names if kw.lower() in s.strip().lower()), None)
+            if sheet: break
     # fallback first
-    df = pd.read_excel(xls, sheet_name=xls.sheet_names[0], engine="openpyxl")
-    return df.rename(columns={c: str(c).strip() for c in df.columns}), xls.sheet_names[0]
-
+    sheet = sheet or sheet_names[0]
+    df = xlsx_cache.read_sheets(xlsx_path, [sheet])[sheet]
+    # давтагддаг текст -> categorical, int -> хамгийн бага төрөл; хэмнэлтийг stage-ийн логт
+    df, saved = frame_compact.compact_frame(df.rename(columns={c: str(c).strip() for c in df.columns}))
+    stage_timer.note(mem_before=saved["bytes_before"], mem_after=saved["bytes_after"])
+    return df, sheet
+
+@stage_timer.timed
 def load_gl(path: Path) -> tuple[pd.DataFrame, str]:
     return load_first_sheet(path, ["gl"])
 
+@stage_timer.timed
 def load_tb(path: Path) -> tuple[pd.DataFrame, str]:
     return load_first_sheet(path, ["tb", "trial balance", "balance", "jet", "statistics"])
 
@@ -82,6 +118,80 @@ def to_number(x):
     except:
         return pd.NA
 
+# to_numbers: нэг удаад боловсруулах мөрийн тоо (code point матрицын санах ойг хязгаарлана)
+AMOUNT_CHUNK = 200_000
+_ASCII_SPACE = np.array([9, 10, 11, 12, 13, 28, 29, 30, 31, 32], dtype=np.uint32)
+
+def _amount_text_chunk(txt: np.ndarray) -> np.ndarray:
+    """``to_number`` over a 'U' array using its code-point matrix."""
+    n = len(txt)
+    out = np.full(n, np.nan)
+    cp = np.ascontiguousarray(txt).view(np.uint32).reshape(n, -1)
+    width = cp.shape[1]
+
+    # Unicode оронтой тоо (\d) эсвэл зай (strip) агуулсан мөрийг to_number-оор задална
+    wide = np.unique(cp[cp > 127])
+    special = [c for c in wide.tolist() if chr(c).isdecimal() or chr(c).isspace()]
+    slow = np.isin(cp, special).any(axis=1) if special else np.zeros(n, dtype=bool)
+    for i in np.flatnonzero(slow):
+        v = to_number(str(txt[i]))
+        out[i] = np.nan if v is pd.NA else v
+
+    # str.strip() дараах эхний/сүүлийн тэмдэгт -> (...) сөрөг
+    solid = (cp != 0) & ~np.isin(cp, _ASCII_SPACE)
+    has = solid.any(axis=1)
+    first = solid.argmax(axis=1)
+    last = width - 1 - solid[:, ::-1].argmax(axis=1)
+    rows = np.arange(n)
+    neg = has & (cp[rows, first] == ord("(")) & (cp[rows, last] == ord(")"))
+
+    # re.sub(r"[^\d\.\-]", "") + float() хүлээн авах хэлбэр: -?(\d+\.?\d*|\.\d+)
+    digit = (cp >= ord("0")) & (cp <= ord("9"))
+    dot, minus = cp == ord("."), cp == ord("-")
+    keep = digit | dot | minus
+    lead = cp[rows, keep.argmax(axis=1)] == ord("-")
+    n_minus = minus.sum(axis=1)
+    ok = (~slow & (digit.sum(axis=1) > 0) & (dot.sum(axis=1) <= 1)
+          & ((n_minus == 0) | ((n_minus == 1) & lead)))
+    # <= 15 оронтой бол m / 10**k нь float()-той яг тэнцүү (хоёулаа яг дүрслэгдэнэ)
+    n_digit = digit.sum(axis=1)
+    after_dot = dot.any(axis=1)[:, None] & (np.arange(width) > dot.argmax(axis=1)[:, None])
+    n_frac = (digit & after_dot).sum(axis=1)
+    fast = ok & (n_digit <= 15)
+    m = np.zeros(n, dtype=np.int64)
+    cols, dcols = cp.T.astype(np.int64), digit.T.copy()
+    for j in range(width):
+        m = np.where(dcols[j], m * 10 + (cols[j] - ord("0")), m)
+    vals = m / 10.0 ** n_frac
+    vals[lead] = -vals[lead]
+    # урт тоонуудыг цэвэрлээд float()-оор задална
+    long_ = ok & ~fast
+    if long_.any():
+        order = np.argsort(~keep[long_], axis=1, kind="stable")
+        packed = np.take_along_axis(cp[long_], order, axis=1)
+        packed[~np.take_along_axis(keep[long_], order, axis=1)] = 0
+        vals[long_] = np.ascontiguousarray(packed).view(f"<U{width}").ravel().astype("float64")
+    out[ok] = np.where(neg[ok], -vals[ok], vals[ok])
+    return out
+
+def to_numbers(s: pd.Series) -> pd.Series:
+    """Column-level ``to_number``: same values, as float64 with NaN for NA."""
+    out = np.full(len(s), np.nan)
+    todo = s.notna().to_numpy(dtype=bool, copy=True)
+    if pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s):
+        v = s.to_numpy(dtype="float64", na_value=np.nan)
+        a = np.abs(v)
+        # str(x) экспонентгүй бол float(str(x)) == x; бусад нь текст замаар явна
+        plain = np.isfinite(v) & (a < 1e16) & ((a >= 1e-4) | (a == 0))
+        out[plain] = v[plain]
+        todo &= ~plain
+    idx = np.flatnonzero(todo)
+    values = s.to_numpy(dtype=object)
+    for i in range(0, len(idx), AMOUNT_CHUNK):
+        part = idx[i:i + AMOUNT_CHUNK]
+        out[part] = _amount_text_chunk(values[part].astype(str))
+    return pd.Series(out, index=s.index)
+
 def match_col(target, available):
     # exact
     for c in available:
@@ -96,15 +206,22 @@ def match_col(target, available):
             if alt.lower() in c.lower(): return c
     return None
 
+_FORMATS = weakref.WeakKeyDictionary()  # workbook -> format-ууд (нэг л удаа бүртгэнэ)
+
 def fmts(book):
-    return {
-        "bold":   book.add_format({'bold': True}),
-        "header": book.add_format({'bold': True,'bg_color':'#D9D9D9','border':1,'align':'center','valign':'vcenter'}),
-        "cell":   book.add_format({'border': 1}),
-        "date":   book.add_format({'border': 1,'num_format':'yyyy-mm-dd'}),
-        "money":  book.add_format({'border': 1,'num_format':'#,##0'}),
-        "center": book.add_format({'border': 1,'align':'center'}),
-    }
+    F = _FORMATS.get(book)
+    if F is None:
+        F = _FORMATS[book] = {
+            "bold":   book.add_format({'bold': True}),
+            "header": book.add_format({'bold': True,'bg_color':'#D9D9D9','border':1,'align':'center','valign':'vcenter'}),
+            "cell":   book.add_format({'border': 1}),
+            "date":   book.add_format({'border': 1,'num_format':'yyyy-mm-dd'}),
+            "money":  book.add_format({'border': 1,'num_format':'#,##0'}),
+            "center": book.add_format({'border': 1,'align':'center'}),
+        }
+    return F
+
+MONEY_COLS = {"Валютын дүн","Дебет дүн","Кредит дүн","Transaction","ABS"}
 
 def safe_write(ws, r, c, v, F, colname=None):
     if pd.isna(v):
@@ -112,433 +229,586 @@ def safe_write(ws, r, c, v, F, colname=None):
     elif isinstance(v, pd.Timestamp):
         ws.write_datetime(r, c, v.to_pydatetime(), F["date"])
     else:
-        if colname in {"Валютын дүн","Дебет дүн","Кредит дүн","Transaction","ABS"}:
+        if colname in MONEY_COLS:
             try:
                 n = float(str(v).replace(",", ""))
                 ws.write_number(r, c, n, F["money"]); return
             except: pass
         ws.write(r, c, v, F["cell"])
 
+def chart_cache(ws, values, n: int, money: bool = False) -> list | None:
+    """Chart numCache points for ``n`` rows holding ``values``, as xlsxwriter reads them back.
+
+    constant_memory sheet-ээс xlsxwriter утгаа буцааж уншиж чадахгүй тул
+    зөвхөн тэр үед cache-ийг бид өгнө; энгийн горимд None (xlsxwriter өөрөө).
+    """
+    if not ws.constant_memory:
+        return None
+    out = []
+    for v in list(values)[:n]:
+        if not isinstance(v, str) and pd.isna(v):
+            out.append("")  # хоосон нүд
+            continue
+        if money or not isinstance(v, str):
+            try:
+                v = f"{float(str(v).replace(',', '')):.16g}"
+            except ValueError:
+                pass
+        out.append(v)
+    return out + [None] * (n - len(out))  # бичигдээгүй мөр
+
+# ---------------------------------------------------------------------
+# Bulk writer – баганын төрөл, формат нэг удаа шийдэгдэнэ
+# ---------------------------------------------------------------------
+WRITE_BLOCK = 50_000  # нэг удаад бэлтгэх мөрийн тоо (санах ойг хязгаарлана)
+
+def _column_cells(ws, s: pd.Series, colname, F) -> tuple[list, list, list]:
+    """Per-row (write method, value, format) that ``safe_write`` would pick for ``s``."""
+    s = frame_compact.expand(s)  # categorical-ийг зөвхөн энэ блокоор задална
+    na = s.isna().to_numpy().tolist()
+    blank, cell = ws.write_blank, F["cell"]
+    kind = s.dtype.kind
+    if kind in "iufb":
+        if kind == "b":
+            put, fmt, vals = ws.write_boolean, cell, s.tolist()
+        elif colname in MONEY_COLS:  # float(str(v)) == v тоон утгад
+            put, fmt, vals = ws.write_number, F["money"], s.to_numpy(dtype=float, na_value=np.nan).tolist()
+        else:
+            put, fmt, vals = ws.write_number, cell, s.tolist()
+    elif kind == "M":
+        put, fmt = ws.write_datetime, F["date"]
+        vals = [None if x else v.to_pydatetime() for x, v in zip(na, s.tolist())]
+    elif colname not in MONEY_COLS and pd.api.types.infer_dtype(s, skipna=True) in ("string", "empty"):
+        put, fmt, vals = ws.write, cell, s.tolist()  # формула/URL танилт ws.write-д үлдэнэ
+    else:
+        # холимог эсвэл текст дүн: нүд бүрийг safe_write-аар
+        def put(r, c, v, _f):
+            safe_write(ws, r, c, v, F, colname)
+        return [put] * len(na), s.tolist(), [None] * len(na)
+    return ([blank if x else put for x in na], vals, [cell if x else fmt for x in na])
+
+def write_rows(ws, df: pd.DataFrame, first_row: int, first_col: int, F, extra: dict | None = None) -> None:
+    """Same cells as ``safe_write`` over every value of ``df``, emitted row by row.
+
+    ``extra`` maps a sheet column to a Series (may be shorter than ``df``) that is
+    written into the same rows after the frame's own cells.
+    """
+    cols, extra = list(df.columns), extra or {}
+    stage_timer.add_cells(len(df) * len(cols) + sum(min(len(s), len(df)) for s in extra.values()), len(df))
+    for start in range(0, len(df), WRITE_BLOCK):
+        part = df.iloc[start:start + WRITE_BLOCK]
+        plans = [_column_cells(ws, part.iloc[:, j], cols[j], F) for j in range(len(cols))]
+        extras = [(c, *_column_cells(ws, s.iloc[start:start + WRITE_BLOCK], None, F)) for c, s in extra.items()]
+        for i in range(len(part)):
+            r = first_row + start + i
+            for j, (puts, vals, fs) in enumerate(plans, start=first_col):
+                puts[i](r, j, vals[i], fs[i])
+            for j, puts, vals, fs in extras:
+                if i < len(vals): puts[i](r, j, vals[i], fs[i])
+
+# ---------------------------------------------------------------------
+# Digit patterns – "гоё тоо" тестүүдийн флагууд
+# ---------------------------------------------------------------------
+# нэр -> ("run", цифр, N)     : str(v)-ийн цифрүүдэд тухайн цифр N+ удаа дараалсан
+#        ("trailing", N)      : цифрүүд N+ тэгээр төгссөн
+#        ("round", k)         : тоон дүн нь 0 биш бүхэл бөгөөд 10**k-д хуваагдана
+DIGIT_PATTERNS = {
+    "nines6": ("run", "9", 6),   # Test 9
+    "zeros7": ("run", "0", 7),   # Test 10
+}
+
+def digit_flags(s: pd.Series, patterns: dict, amount: pd.Series | None = None) -> pd.DataFrame:
+    """Bool frame (row x pattern) over the digits of ``str(v)`` for every value of ``s``.
+
+    Digits are stripped once for all patterns; ``amount`` (parsed values) is only
+    needed for "round" patterns and defaults to ``to_numbers(s)``.
+    """
+    txt = frame_compact.per_value(s, lambda v: v.astype(str))
+    digits = txt.str.replace(r"[^0-9]", "", regex=True)
+    uni = ~txt.fillna("").str.isascii()
+    if uni.any():  # ASCII бус цифр (\d) – Python re-тэй ижил
+        digits[uni] = [re.sub(r"[^\d]", "", v) for v in txt[uni].tolist()]
+    digits = digits.fillna("")
+    out = {}
+    for name, (kind, *args) in patterns.items():
+        if kind == "run":
+            d, n = args
+            out[name] = digits.str.contains(f"{re.escape(d)}{{{n},}}", regex=True)
+        elif kind == "trailing":
+            out[name] = digits.str.endswith("0" * args[0])
+        elif kind == "round":
+            a = to_numbers(s) if amount is None else amount
+            out[name] = (a != 0) & (a % 10**args[0] == 0)
+        else:
+            raise ValueError(f"Unknown digit pattern: {kind}")
+    return pd.DataFrame({k: v.to_numpy(dtype=bool) for k, v in out.items()}, index=s.index)
+
+# ---------------------------------------------------------------------
+# Canonical GL – aliases, dates, amounts, account digits parsed once
+# ---------------------------------------------------------------------
+# ALIASES-аас гадна тестүүдийн шууд хайдаг баганууд
+CANON_EXTRA = ["Баримтын дугаар", "Үүсгэсэн огноо"]
+# canonical нэр -> parsed тоон багана
+CANON_NUMERIC = {"Transaction": "__TXN__", "Дебет дүн": "__DEBIT__", "Кредит дүн": "__CREDIT__"}
+
+@stage_timer.timed
+def build_canonical_gl(gl_raw: pd.DataFrame, chart=None) -> pd.DataFrame:
+    """Resolve every alias once and return a typed GL keyed by canonical names.
+
+    Columns keep their raw values except "Огноо", which is parsed to datetime.
+    Parsed amounts live in ``__TXN__``/``__DEBIT__``/``__CREDIT__`` (float, NaN for
+    blanks; ranked sheets sort these floats and list equal amounts in row order),
+    the digits of the account code in ``__ACC__``, its categorical
+    ``chart`` class in ``__CLASS__`` and the Transaction digit-pattern flags in
+    ``__<NAME>__`` (see DIGIT_PATTERNS).
+    """
+    cols = list(gl_raw.columns)
+    sel = {t: match_col(t, cols) for t in list(ALIASES) + CANON_EXTRA}
+    gl = pd.DataFrame({t: gl_raw[c] for t, c in sel.items() if c}, index=gl_raw.index)
+    if "Огноо" in gl.columns:
+        gl["Огноо"] = pd.to_datetime(gl["Огноо"], errors="coerce")
+    for t, key in CANON_NUMERIC.items():
+        if t in gl.columns:
+            gl[key] = to_numbers(gl[t])
+    if "Данс" in gl.columns:
+        gl["__ACC__"] = coa.account_key(gl["Данс"])
+        gl["__CLASS__"] = coa.classify(gl["__ACC__"], chart)
+    if "Transaction" in gl.columns:
+        for name, flag in digit_flags(gl["Transaction"], DIGIT_PATTERNS, gl["__TXN__"]).items():
+            gl[f"__{name.upper()}__"] = flag
+    return gl
+
+# ---------------------------------------------------------------------
+# Top-N – бүтэн sort-гүй, O(n) сонголт
+# ---------------------------------------------------------------------
+def top_n(values: np.ndarray, n: int) -> np.ndarray:
+    """Positions of the ``n`` largest values, largest first.
+
+    Equal values keep row order (as a stable ``sort_values(ascending=False)``
+    would), and NaN rows (in row order) only fill up a short result. Only the
+    candidates at or above the n-th largest value are ordered.
+    """
+    v = np.asarray(values, dtype=float)
+    nan = np.isnan(v)
+    ok = np.flatnonzero(~nan)
+    if n <= 0:
+        return ok[:0]
+    if len(ok) > n:
+        k = len(ok) - n
+        thr = v[ok[np.argpartition(v[ok], k)[k]]]  # n дэх хамгийн их утга
+        gt = ok[v[ok] > thr]
+        eq = ok[v[ok] == thr][:n - len(gt)]  # босго дээрх тэнцүү утга: эхний мөрүүд
+        ok = np.concatenate([gt, eq])
+    ok = ok[np.lexsort((ok, -v[ok]))]
+    return np.concatenate([ok, np.flatnonzero(nan)[:n - len(ok)]])
+
+_FRAME_MEMO = {}  # id(frame) -> (weakref, {key: value})
+_MEMO_LOCK = threading.Lock()  # зөвхөн _FRAME_MEMO бүртгэлийг хамгаална
+
+def frame_memo(df: pd.DataFrame) -> dict:
+    """Scratch dict tied to ``df``'s lifetime, for results several tests share.
+
+    ``memo["lock"]`` serialises work on this frame only: tests of one report
+    share a pass, while reports of other sessions run in parallel.
+    """
+    key = id(df)
+    with _MEMO_LOCK:
+        ent = _FRAME_MEMO.get(key)
+        if ent is None or ent[0]() is not df:
+            ent = _FRAME_MEMO[key] = (weakref.ref(df, lambda _, k=key: _FRAME_MEMO.pop(k, None)),
+                                      {"lock": threading.RLock()})
+    return ent[1]
+
+def top_rows(gl: pd.DataFrame, col: str, n: int, classes: tuple | None = None, absolute: bool = False) -> pd.DataFrame:
+    """The ``n`` rows of ``gl`` with the largest ``col`` (``abs`` if ``absolute``),
+    optionally only accounts whose ``__CLASS__`` is in ``classes``.
+
+    Rankings are memoised per frame, so tests ranking the same column share one pass.
+    """
+    memo = frame_memo(gl)
+    key = ("top", col, classes, absolute)
+    with memo["lock"]:
+        pos, have = memo.get(key, (None, -1))
+        if have < n:
+            v = gl[col].to_numpy(dtype=float, na_value=np.nan)
+            if absolute: v = np.abs(v)
+            idx = np.arange(len(gl))
+            if classes:
+                m = gl["__CLASS__"].isin(classes).to_numpy(dtype=bool)
+                idx, v = idx[m], v[m]
+            pos = idx[top_n(v, n)]
+            memo[key] = (pos, n)
+    return gl.iloc[pos[:n]]
+
 # ---------------------------------------------------------------------
 # RAW sheets
 # ---------------------------------------------------------------------
-def sheet_gl_raw(gl_raw: pd.DataFrame, wb, writer, src_sheet: str):
+@stage_timer.timed
+def sheet_gl_raw(gl_raw: pd.DataFrame, wb, writer, src_sheet: str,
+                 budget: int = ROW_BUDGET, sidecar_dir: Path | None = None) -> list[Path]:
     name = clean_sheet_name("GL - Raw")
     ws = wb.add_worksheet(name); writer.sheets[name] = ws
     F = fmts(wb)
     ws.write("A1", f"GL raw data (source sheet: {src_sheet})", F["bold"])
     # header
     for j,c in enumerate(gl_raw.columns, start=1): ws.write(2, j, c, F["header"])
-    # rows
-    for i,row in enumerate(gl_raw.itertuples(index=False), start=3):
-        for j,val in enumerate(row, start=1):
-            colname = gl_raw.columns[j-1]
-            safe_write(ws, i, j, val, F, colname)
+    # rows – budget-ээс илүүг sidecar-т
+    rows, note, path = report_bundle.split_rows(gl_raw, budget, 3, sidecar_dir, name)
+    write_rows(ws, rows, 3, 1, F)
+    if note: ws.write(3 + len(rows), 1, note, F["bold"])
     # widths
     for j,c in enumerate(gl_raw.columns, start=1):
         ws.set_column(j, j, min(max(10, len(str(c))+2), 40))
+    return [path] if path else []
 
-def sheet_tb_raw(tb_raw: pd.DataFrame, wb, writer, src_sheet: str):
+@stage_timer.timed
+def sheet_tb_raw(tb_raw: pd.DataFrame, wb, writer, src_sheet: str,
+                 budget: int = ROW_BUDGET, sidecar_dir: Path | None = None) -> list[Path]:
     name = clean_sheet_name("TB - Raw")
     ws = wb.add_worksheet(name); writer.sheets[name] = ws
     F = fmts(wb)
     ws.write("A1", f"TB raw data (source sheet: {src_sheet})", F["bold"])
     for j,c in enumerate(tb_raw.columns, start=1): ws.write(2, j, c, F["header"])
-    for i,row in enumerate(tb_raw.itertuples(index=False), start=3):
-        for j,val in enumerate(row, start=1):
-            colname = tb_raw.columns[j-1]
-            safe_write(ws, i, j, val, F, colname)
+    rows, note, path = report_bundle.split_rows(tb_raw, budget, 3, sidecar_dir, name)
+    write_rows(ws, rows, 3, 1, F)
+    if note: ws.write(3 + len(rows), 1, note, F["bold"])
     for j,c in enumerate(tb_raw.columns, start=1):
         ws.set_column(j, j, min(max(10, len(str(c))+2), 40))
+    return [path] if path else []
 
 # ---------------------------------------------------------------------
-# Test 6 – LEN
+# Test sheet spec + renderer
 # ---------------------------------------------------------------------
-def sheet_test6_len(gl: pd.DataFrame, wb, writer):
-    sheet_name = clean_sheet_name("Test 6")
+# Тест бүр dict (spec) буцаана, render_sheet бүгдийг нэг замаар бичнэ:
+#   sheet, title, procedure, comment        – B2 / C6 / C13 текст
+#   summary_label, tested, count            – C9 / B10 / C10 (int -> тоо, str -> текст)
+#   comment_label                           – B12 ("Comment" эсвэл "Comment:")
+#   tables  – [{"row", "col", "frame", "title": (row, text), "extra": {col: (header, Series)},
+#                "note": text (хүснэгтийн доор; budget_spec тавина)}]
+#   charts  – [{"title", "anchor", "rows": (first, last), "cols": (x, y), "x", "y", "money"}]
+#   widths  – set_column()-ийн аргументууд, дарааллаар нь
+# tables-ийг мөрийн өсөх дарааллаар өгнө (LOW_MEMORY горимд шаардлагатай).
+JE_LABEL = "No. of JE selected for testing"
+JE_LABEL_LONG = "Number of Journal Entries extracted in each test"
+
+def render_sheet(spec: dict, wb, writer, company_name=COMPANY_NAME, title_date=TITLE_DATE):
+    sheet_name = clean_sheet_name(spec["sheet"])
     ws = wb.add_worksheet(sheet_name); writer.sheets[sheet_name] = ws
     F = fmts(wb)
 
+    ws.write("B1",company_name,F["bold"]); ws.write("B2",spec["title"],F["bold"]); ws.write("B3",title_date,F["bold"])
+    ws.write("B5","Procedure",F["bold"]); ws.write("C6",spec["procedure"])
+    ws.write("B8","Summary",F["bold"]); ws.write("B9","Testing by Audit Team?",F["header"])
+    ws.write("C9",spec.get("summary_label",JE_LABEL),F["header"])
+    ws.write("B10",spec.get("tested","No"),F["cell"])
+    count = spec["count"]
+    if isinstance(count, str): ws.write("C10",count,F["cell"])
+    else: ws.write_number("C10",int(count),F["cell"])
+    ws.write("B12",spec.get("comment_label","Comment"),F["bold"]); ws.write("C13",spec["comment"])
+
+    for t in spec.get("tables", []):
+        if "title" in t:
+            ws.write(t["title"][0], 1, t["title"][1], F["bold"])
+        df, row, col = t["frame"], t["row"], t["col"]
+        for j, c in enumerate(df.columns, start=col): ws.write(row, j, c, F["header"])
+        extra = t.get("extra", {})
+        for j, (head, _) in extra.items(): ws.write(row, j, head, F["header"])
+        write_rows(ws, df, row+1, col, F, {j: s for j, (_, s) in extra.items()})
+        if "note" in t:
+            ws.write(row+1+len(df), col, t["note"], F["bold"])
+
+    for ch in spec.get("charts", []):
+        (first, last), (xc, yc) = ch["rows"], ch["cols"]
+        n = last - first + 1
+        chart = wb.add_chart({'type':'scatter','subtype':'straight_with_markers'})
+        chart.set_title({'name':ch["title"]}); chart.set_y_axis({'num_format':'#,##0'})
+        chart.add_series({'categories':[sheet_name,first,xc,last,xc],
+                          'values':    [sheet_name,first,yc,last,yc],
+                          'categories_data': chart_cache(ws, ch["x"], n),
+                          'values_data':     chart_cache(ws, ch["y"], n, money=ch.get("money", False)),
+                          'marker':{'type':'circle'}})
+        ws.insert_chart(ch["anchor"], chart, {'x_scale':1.15,'y_scale':1.0})
+
+    for w in spec.get("widths", []): ws.set_column(*w)
+    return ws
+
+def budget_spec(spec: dict, budget: int, sidecar_dir: Path | None) -> tuple[dict, list[Path]]:
+    """``spec`` with every table cut to ``budget`` rows, and the sidecars holding the rest.
+
+    A cut table gets a "note" pointing at its sidecar; charts over its rows are
+    clipped to the rows left on the sheet. Specs within budget are returned as is.
+    """
+    stem = clean_sheet_name(spec["sheet"])
+    tables, paths, limits = [], [], []
+    for i, t in enumerate(spec.get("tables", [])):
+        df, note, path = report_bundle.split_rows(t["frame"], budget, t["row"]+1, sidecar_dir,
+                                                  stem if i == 0 else f"{stem} ({i+1})")
+        if path is None:
+            tables.append(t)
+            continue
+        tables.append({**t, "frame": df, "note": note})
+        paths.append(path)
+        limits.append((t["row"]+1, t["row"]+len(t["frame"]), t["row"]+len(df)))
+    if not paths:
+        return spec, []
+    charts = []
+    for ch in spec.get("charts", []):
+        first, last = ch["rows"]
+        for lo, hi, kept in limits:
+            if lo <= first <= hi:
+                last = min(last, kept)
+        charts.append({**ch, "rows": (first, last)})
+    return {**spec, "tables": tables, "charts": charts}, paths
+
+def export_spec(spec: dict, directory: Path) -> dict:
+    """Write the tables of one test spec as Parquet; its results_export manifest entry.
+
+    Tables are exported whole – the sheet row budget does not apply here.
+    """
+    frames = {f"table{i}": t["frame"] for i, t in enumerate(spec.get("tables", []), start=1)}
+    summary = {"count": spec["count"], "tested": spec.get("tested", "No"),
+               "procedure": spec["procedure"], "comment": spec["comment"],
+               "table_titles": [t["title"][1] if "title" in t else None for t in spec.get("tables", [])]}
+    return results_export.write_test(directory, spec["sheet"], spec["title"], frames, summary)
+
+def name_widths(columns, widths: dict, default=14) -> list:
+    return [(i, i, widths.get(name, default)) for i, name in enumerate(columns, start=1)]
+
+def rank_frame(values: pd.Series, name: str) -> pd.DataFrame:
+    """Chart data table: Rank 1..n and the plotted amounts."""
+    return pd.DataFrame({"Rank": np.arange(1, len(values)+1), name: values.to_numpy()})
+
+# ---------------------------------------------------------------------
+# Test 6 – LEN
+# ---------------------------------------------------------------------
+@stage_timer.timed
+def spec_test6_len(gl: pd.DataFrame) -> dict:
     order = ["Данс","Дансны нэр","Огноо","Валют","Дебет дүн","Кредит дүн","Transaction","Гүйлгээний утга"]
-    sel = {c: match_col(c, list(gl.columns)) for c in order}
-    available = [c for c in order if sel[c]]
-    df = gl[[sel[c] for c in available]].copy()
-    df.columns = available
-    if "Огноо" in df.columns:
-        df["Огноо"] = pd.to_datetime(df["Огноо"], errors="coerce")
-    df["LEN"] = df.get("Гүйлгээний утга","").astype(str).str.len()
-
-    ws.write("B1","Steppe Road of Development LLC",F["bold"])
-    ws.write("B2","Test 6",F["bold"])
-    ws.write("B3",TITLE_DATE,F["bold"])
-    ws.write("B5","Procedure",F["bold"]); ws.write("C6","Extract journal entries and compute LEN of description.")
-    ws.write("B8","Summary",F["bold"])
-    ws.write("B9","Testing by Audit Team?",F["header"]); ws.write("C9","No. of JE selected for testing",F["header"])
-    ws.write("B10","No",F["cell"]); ws.write("C10","n.a",F["cell"])
-    ws.write("B12","Comment:",F["bold"]); ws.write("C13","We calculated LEN for description.")
-
-    start = 17
-    for j,c in enumerate(list(df.columns)): ws.write(start, j+1, c, F["header"])
-    for i,row in enumerate(df.itertuples(index=False), start=start+1):
-        for j,(col,val) in enumerate(zip(df.columns,row), start=1):
-            safe_write(ws,i,j,val,F,col)
+    available = [c for c in order if c in gl.columns]
+    df = gl[available].copy()
+    df["LEN"] = frame_compact.per_value(df.get("Гүйлгээний утга",""), lambda v: v.astype(str).str.len())
+
     widths={"Данс":16,"Дансны нэр":30,"Огноо":12,"Валют":6,"Дебет дүн":16,"Кредит дүн":16,"Transaction":12,"Гүйлгээний утга":32,"LEN":6}
-    for idx,name in enumerate(df.columns): ws.set_column(idx+1, idx+1, widths.get(name,14))
+    return {"sheet":"Test 6", "title":"Test 6",
+            "procedure":"Extract journal entries and compute LEN of description.",
+            "count":"n.a", "comment_label":"Comment:", "comment":"We calculated LEN for description.",
+            "tables":[{"row":17, "col":1, "frame":df}],
+            "widths":name_widths(df.columns, widths)}
 
 # ---------------------------------------------------------------------
 # Non-Business Day
 # ---------------------------------------------------------------------
-def sheet_non_business_day(gl: pd.DataFrame, wb, writer):
-    sheet_name = clean_sheet_name("Non-Business Day")
-    ws = wb.add_worksheet(sheet_name); writer.sheets[sheet_name] = ws
-    F=fmts(wb)
-
+@stage_timer.timed
+def spec_non_business_day(gl: pd.DataFrame) -> dict:
     target_cols = [
         "Данс","Дансны нэр","Огноо","Гүйлгээний дугаар","Харьцсан дансны нэр","Харьцсан данс","Day of the week",
         "Баримтын дугаар","Валют","Ханш","Валютын дүн","Дебет дүн","Кредит дүн","Transaction","Гүйлгээний утга",
         "ABS","Үүсгэсэн огноо","Day of the week /posted date/","Бүртгэсэн хэрэглэгч","Цонхны нэр"
     ]
-    sel = {t: match_col(t, list(gl.columns)) for t in target_cols}
-    df = pd.DataFrame({t: gl[sel[t]] if sel[t] else np.nan for t in target_cols})
-    if match_col("Огноо", list(df.columns)): df["Огноо"]=pd.to_datetime(df["Огноо"], errors="coerce")
-
-    ws.write("B1","Steppe Road of Development LLC",F["bold"])
-    ws.write("B2","Non business day journals",F["bold"])
-    ws.write("B3",TITLE_DATE,F["bold"])
-    ws.write("B5","Procedure",F["bold"])
-    ws.write("C6","Extract journal entries occurring on non-business days.")
-    ws.write("B8","Summary",F["bold"]); ws.write("B9","Testing by Audit Team?",F["header"]); ws.write("C9","Number of Journal Entries extracted in each test",F["header"])
-    ws.write("B10","No",F["cell"]); ws.write("C10","0",F["cell"])
-    ws.write("B12","Comment:",F["bold"]); ws.write("C13","Company has weekend postings for month-end; criterion not tested.")
-
-    start=16
-    for j,c in enumerate(df.columns): ws.write(start, j, c, F["header"])
-    for i,row in enumerate(df.itertuples(index=False), start=start+1):
-        for j,(col,val) in enumerate(zip(df.columns,row), start=0):
-            safe_write(ws,i,j,val,F,col)
-    for idx,name in enumerate(df.columns): ws.set_column(idx, idx, max(12, len(name)+2))
+    df = pd.DataFrame({t: gl[t] if t in gl.columns else np.nan for t in target_cols})
+
+    return {"sheet":"Non-Business Day", "title":"Non business day journals",
+            "procedure":"Extract journal entries occurring on non-business days.",
+            "summary_label":JE_LABEL_LONG, "count":"0",
+            "comment_label":"Comment:", "comment":"Company has weekend postings for month-end; criterion not tested.",
+            "tables":[{"row":16, "col":0, "frame":df}],
+            "widths":[(i, i, max(12, len(name)+2)) for i, name in enumerate(df.columns)]}
 
 # ---------------------------------------------------------------------
 # Test 8 – Keywords
 # ---------------------------------------------------------------------
-def sheet_test8(gl: pd.DataFrame, wb, writer):
-    sheet_name = clean_sheet_name("Test 8")
-    ws = wb.add_worksheet(sheet_name); writer.sheets[sheet_name] = ws
-    F = fmts(wb)
-    desc_col = match_col("Гүйлгээний утга", list(gl.columns))
-    if not desc_col: raise ValueError("Гүйлгээний утга багана олдсонгүй")
-
-    keywords = [
-        ("Terminate", ["Дуусгах","зогсоох","цуцлах"]),
-        ("Adjust",    ["Тохируулга"]),
-        ("Error",     ["Алдаа"]),
-        ("Wrong",     ["Буруу"]),
-        ("Revise",    ["Засах","дахин хянах","өөрчлөх"]),
-        ("Буцаалт",   ["Буцаалт"]),
-        ("Delete",    ["Устгах","арилгах"]),
-    ]
+# Англи нэр -> монгол хайх үгс; англи нэр өөрөө мөн хайгдана
+TEST8_KEYWORDS = {
+    "Terminate": ["Дуусгах","зогсоох","цуцлах"],
+    "Adjust":    ["Тохируулга"],
+    "Error":     ["Алдаа"],
+    "Wrong":     ["Буруу"],
+    "Revise":    ["Засах","дахин хянах","өөрчлөх"],
+    "Буцаалт":   ["Буцаалт"],
+    "Delete":    ["Устгах","арилгах"],
+}
 
+def keyword_hits(text: pd.Series, keywords: dict) -> pd.DataFrame:
+    """Bool frame (row x keyword group): does the lowercased text contain any term of the group.
+
+    Text is lowercased once and scanned once with an alternation of every term;
+    only rows that hit are rescanned to tell the groups apart. Blank text never hits.
+    """
+    if isinstance(text.dtype, pd.CategoricalDtype):  # ялгаатай текст бүрийг нэг л удаа
+        return frame_compact.per_value(text, lambda v: keyword_hits(v, keywords))
+    groups = list(keywords)
+    term_groups = {}
+    for j, g in enumerate(groups):
+        for t in [g.lower()] + [m.lower() for m in keywords[g]]:
+            term_groups.setdefault(t, set()).add(j)
+    terms = sorted(term_groups, key=len, reverse=True)
+    # нэг байрлалд хамгийн урт нь таарвал түүний prefix болох бүх үг мөн таарсан
+    closure = {t: set().union(*(term_groups[u] for u in terms if t.startswith(u))) for t in terms}
+    alt = "|".join(re.escape(t) for t in terms)
+
+    out = np.zeros((len(text), len(groups)), dtype=bool)
+    if terms and len(text):
+        lower = text.astype(str).str.lower()
+        any_hit = lower.str.contains(alt, regex=True, na=False).to_numpy(dtype=bool)
+        if any_hit.any():
+            scan = re.compile(f"(?=({alt}))")
+            pos = np.flatnonzero(any_hit)
+            for i, s in zip(pos, lower.iloc[pos].tolist()):
+                for t in set(scan.findall(s)):
+                    out[i, list(closure[t])] = True
+    return pd.DataFrame(out, index=text.index, columns=groups)
+
+@stage_timer.timed
+def spec_test8(gl: pd.DataFrame, keywords: dict | None = None) -> dict:
+    desc_col = "Гүйлгээний утга"
+    if desc_col not in gl.columns: raise ValueError("Гүйлгээний утга багана олдсонгүй")
+    keywords = TEST8_KEYWORDS if keywords is None else keywords
+
+    hits = keyword_hits(gl[desc_col], keywords)
+    acc = gl["Данс"] if "Данс" in gl.columns else pd.Series("", index=gl.index)
     summary, detail = [], []
-    for eng, mn in keywords:
-        terms = [eng.lower()] + [m.lower() for m in mn]
-        mask = gl[desc_col].astype(str).str.lower().apply(lambda s: any(t in s for t in terms))
-        m = gl[mask].copy()
+    for eng, mn in keywords.items():
+        mask = hits[eng]
         summary.append({"Keyword":eng,"Keyword /Mongolia/":", ".join(mn),"Number of entries Account Name":"-",
-                        "Number of entries Account Name ": len(m)})
-        for _, r in m.iterrows():
-            detail.append({"Данс":r.get(match_col("Данс",gl.columns),""),"Гүйлгээний утга":r.get(desc_col,""),"Per audit":eng})
+                        "Number of entries Account Name ": int(mask.sum())})
+        if mask.any():
+            detail.append(pd.DataFrame({"Данс":acc[mask],"Гүйлгээний утга":gl.loc[mask, desc_col],"Per audit":eng}))
 
     sdf = pd.DataFrame(summary)
     total = {"Keyword":"Total","Keyword /Mongolia/":"","Number of entries Account Name":"-",
              "Number of entries Account Name ": int(sdf["Number of entries Account Name "].sum())}
     sdf = pd.concat([sdf, pd.DataFrame([total])], ignore_index=True)
-    ddf = pd.DataFrame(detail)
-
-    ws.write("B1","Steppe Road of Development LLC",F["bold"]); ws.write("B2","Test 8",F["bold"]); ws.write("B3",TITLE_DATE,F["bold"])
-    ws.write("B5","Procedure",F["bold"]); ws.write("C6","Extract journal entries containing keywords of interest.")
-    ws.write("B8","Summary",F["bold"]); ws.write("B9","Testing by Audit Team?",F["header"]); ws.write("C9","No. of JE selected for testing",F["header"])
-    ws.write("B10","Yes",F["cell"]); ws.write_number("C10", int(total["Number of entries Account Name "]), F["cell"])
-    ws.write("B12","Comment",F["bold"]); ws.write("C13","Searched Onch guidance keywords.")
-
-    srow=17
-    for j,c in enumerate(sdf.columns): ws.write(srow, j+1, c, F["header"])
-    for i,row in enumerate(sdf.itertuples(index=False), start=srow+1):
-        for j,val in enumerate(row): ws.write(i, j+1, val, F["cell"])
-    ws.set_column(1,1,18); ws.set_column(2,2,35); ws.set_column(3,4,16)
+    ddf = pd.concat(detail, ignore_index=True) if detail else pd.DataFrame()
 
+    srow = 17
     dstart = srow + len(sdf) + 3
-    ws.write(dstart,1,"All entries:",F["bold"])
-    for j,c in enumerate(ddf.columns): ws.write(dstart+1, j+1, c, F["header"])
-    for i,row in enumerate(ddf.itertuples(index=False), start=dstart+2):
-        for j,val in enumerate(row): ws.write(i, j+1, val, F["cell"])
-    ws.set_column(1,1,16); ws.set_column(2,2,50); ws.set_column(3,3,16)
+    return {"sheet":"Test 8", "title":"Test 8",
+            "procedure":"Extract journal entries containing keywords of interest.",
+            "tested":"Yes", "count":total["Number of entries Account Name "],
+            "comment":"Searched Onch guidance keywords.",
+            "tables":[{"row":srow, "col":1, "frame":sdf},
+                      {"row":dstart+1, "col":1, "frame":ddf, "title":(dstart, "All entries:")}],
+            "widths":[(1,1,18),(2,2,35),(3,4,16),(1,1,16),(2,2,50),(3,3,16)]}
 
 # ---------------------------------------------------------------------
 # Test 9 – recurring 9s (>=6)
 # ---------------------------------------------------------------------
+@stage_timer.timed
+def spec_test9(gl: pd.DataFrame) -> dict:
+    assert "Transaction" in gl.columns, "Transaction багана олдсонгүй. ALIASES жагсаалтад өөр нэр нэмнэ үү."
 
-def sheet_test9(gl: pd.DataFrame, wb, writer):
-    sheet_name = clean_sheet_name("Test 9")
-    ws = wb.add_worksheet(sheet_name); writer.sheets[sheet_name] = ws
-
-    # formats
-    bold   = wb.add_format({'bold': True})
-    header = wb.add_format({'bold': True,'bg_color': '#D9D9D9','border': 1,'align': 'center','valign': 'vcenter'})
-    cell   = wb.add_format({'border': 1})
-    datef  = wb.add_format({'border': 1,'num_format': 'yyyy-mm-dd'})
-    money  = wb.add_format({'border': 1,'num_format': '#,##0'})
-
-    # alias mapping
-    ALIASES_LOCAL = {
-        "Данс": ["Данс","Account","GL Account","Account No","Account Number"],
-        "Дансны нэр": ["Дансны нэр","Account Name","GL Account Name","Name"],
-        "Огноо": ["Огноо","Posted Date","Posting Date","Date","GL Date","Үүсгэсэн огноо"],
-        "Гүйлгээний дугаар": ["Гүйлгээний дугаар","Document No","Voucher No","Entry No","Trans No"],
-        "Харьцсан дансны нэр": ["Харьцсан дансны нэр","Counter Account Name","Offset Account Name"],
-        "Харьцсан данс": ["Харьцсан данс","Counter Account","Offset Account"],
-        "Валют": ["Валют","Currency","Currency Code"],
-        "Ханш": ["Ханш","Exchange Rate","Rate"],
-        "Валютын дүн": ["Валютын дүн","Foreign Amount","FCY Amount","Amount (FCY)"],
-        "Дебет дүн": ["Дебет дүн","Debit","Debit Amount","Debit (MNT)"],
-        "Кредит дүн": ["Кредит дүн","Credit","Credit Amount","Credit (MNT)"],
-        "Transaction": ["Transaction","Amount","Transaction Amount","Гүйлгээний дүн"],
-        "Гүйлгээний утга": ["Гүйлгээний утга","Description","Memo","Narration"],
-        "ABS": ["ABS","Absolute"],
-        "Бүртгэсэн хэрэглэгч": ["Бүртгэсэн хэрэглэгч","User","Posted By","Created By"],
-    }
-    def mcol(target, available):
-        for c in available:
-            if c.strip().lower() == target.strip().lower(): return c
-        for alt in ALIASES_LOCAL.get(target, []):
-            for c in available:
-                if c.strip().lower() == alt.strip().lower(): return c
-        for alt in [target] + ALIASES_LOCAL.get(target, []):
-            for c in available:
-                if alt.lower() in c.lower(): return c
-        return None
-
-    cols = list(gl.columns)
-    sel = {}
-    for t in ALIASES_LOCAL:
-        m = mcol(t, cols)
-        if m: sel[t] = m
-    assert "Transaction" in sel, "Transaction багана олдсонгүй. ALIASES жагсаалтад өөр нэр нэмнэ үү."
-
-    import re as _re
-    def has_six_or_more_9(val):
-        s = _re.sub(r"[^\d]", "", str(val))
-        return _re.search(r"9{6,}", s) is not None
-
-    mask = gl[sel["Transaction"]].apply(has_six_or_more_9)
-    df_out = gl[mask].copy()
+    df_out = gl[gl["__NINES6__"]]
 
     order = ["Данс","Дансны нэр","Огноо","Гүйлгээний дугаар",
              "Харьцсан дансны нэр","Харьцсан данс","Валют","Ханш","Валютын дүн",
              "Дебет дүн","Кредит дүн","Transaction","Гүйлгээний утга","ABS","Бүртгэсэн хэрэглэгч"]
-    avail = [c for c in order if c in sel]
-    df_out = df_out[[sel[c] for c in avail]].copy()
-    df_out.columns = avail
-    if "Огноо" in df_out.columns:
-        df_out["Огноо"] = pd.to_datetime(df_out["Огноо"], errors="coerce")
-
-    ws.write("B1","Steppe Road of Development LLC",bold)
-    ws.write("B2","Journal entries containing recurring digits",bold)
-    ws.write("B3",TITLE_DATE,bold)
-    ws.write("B5","Procedure",bold)
-    ws.write("C6","Extract journal entries with more than a certain number of recurring digits")
-    ws.write("B8","Summary",bold)
-    ws.write("B9","Testing by Audit Team?",header)
-    ws.write("C9","Number of Journal Entries extracted in each test",header)
-    ws.write("B10","No",cell)
-    ws.write_number("C10", int(len(df_out)), cell)
-    ws.write("B12","Comment",bold)
-    ws.write("C13","We searched for entries with 6 or more consecutive '9' digits in Transaction (e.g., 232,999,999).")
-
-    start = 17
-    for j, name in enumerate(df_out.columns):
-        ws.write(start, j+1, name, header)
-
-    def write_safe(r, c, v, col):
-        if pd.isna(v):
-            ws.write(r, c, "", cell)
-        elif isinstance(v, pd.Timestamp):
-            ws.write_datetime(r, c, v.to_pydatetime(), datef)
-        else:
-            if col in {"Валютын дүн","Дебет дүн","Кредит дүн","Transaction","ABS"}:
-                try:
-                    n = float(str(v).replace(",", ""))
-                    ws.write_number(r, c, n, money); return
-                except Exception:
-                    pass
-            ws.write(r, c, v, cell)
-
-    for i, row in enumerate(df_out.itertuples(index=False), start=start+1):
-        for j, (col_name, v) in enumerate(zip(df_out.columns, row), start=1):
-            write_safe(i, j, v, col_name)
+    avail = [c for c in order if c in gl.columns]
+    df_out = df_out[avail].copy()
 
     widths = {"Данс":16,"Дансны нэр":28,"Огноо":12,"Гүйлгээний дугаар":14,
               "Харьцсан дансны нэр":26,"Харьцсан данс":16,"Валют":6,"Ханш":10,
               "Валютын дүн":16,"Дебет дүн":16,"Кредит дүн":16,"Transaction":16,
               "Гүйлгээний утга":32,"ABS":12,"Бүртгэсэн хэрэглэгч":18}
-    for idx, name in enumerate(df_out.columns):
-        ws.set_column(idx+1, idx+1, widths.get(name, 14))
-def sheet_test10(gl: pd.DataFrame, wb, writer):
-    sheet_name = clean_sheet_name("Test 10")
-    ws = wb.add_worksheet(sheet_name); writer.sheets[sheet_name] = ws
-    F=fmts(wb)
-    sel={k: match_col(k, list(gl.columns)) for k in ALIASES}
-    tr=sel["Transaction"]; assert tr
+    return {"sheet":"Test 9", "title":"Journal entries containing recurring digits",
+            "procedure":"Extract journal entries with more than a certain number of recurring digits",
+            "summary_label":JE_LABEL_LONG, "count":len(df_out),
+            "comment":"We searched for entries with 6 or more consecutive '9' digits in Transaction (e.g., 232,999,999).",
+            "tables":[{"row":17, "col":1, "frame":df_out}],
+            "widths":name_widths(df_out.columns, widths)}
 
-    def has_7plus0(x): return re.search(r"0{7,}", re.sub(r"[^\d]","",str(x))) is not None
-    df = gl[gl[tr].apply(has_7plus0)].copy()
+# ---------------------------------------------------------------------
+# Test 10 – 7+ consecutive zeros
+# ---------------------------------------------------------------------
+@stage_timer.timed
+def spec_test10(gl: pd.DataFrame) -> dict:
+    assert "Transaction" in gl.columns
+
+    df = gl[gl["__ZEROS7__"]]
 
     order=["Данс","Дансны нэр","Огноо","Гүйлгээний дугаар","Харьцсан дансны нэр","Харьцсан данс","Баримт дугаар",
            "Валют","Ханш","Валютын дүн","Дебет дүн","Кредит дүн","Transaction","Гүйлгээний утга","ABS","Бүртгэсэн хэрэглэгч","Type"]
-    av=[c for c in order if sel.get(c)]
-    df=df[[sel[c] for c in av]].copy(); df.columns=av
-    if "Огноо" in df.columns: df["Огноо"]=pd.to_datetime(df["Огноо"], errors="coerce")
-
-    ws.write("B1","Steppe Road of Development LLC",F["bold"]); ws.write("B2","Test 10",F["bold"]); ws.write("B3",TITLE_DATE,F["bold"])
-    ws.write("B5","Procedure",F["bold"]); ws.write("C6","Extract entries with 7+ consecutive zeros in Transaction.")
-    ws.write("B8","Summary",F["bold"]); ws.write("B9","Testing by Audit Team?",F["header"]); ws.write("C9","No. of JE selected for testing",F["header"])
-    ws.write("B10","No",F["cell"]); ws.write_number("C10", int(len(df)), F["cell"])
-    ws.write("B12","Comment",F["bold"]); ws.write("C13","Rounding/pretty numbers (e.g., 10,000,000).")
-
-    start=31; ws.write(start-2,1,"Transaction list:",F["bold"])
-    for j,c in enumerate(df.columns): ws.write(start, j+1, c, F["header"])
-    for i,row in enumerate(df.itertuples(index=False), start=start+1):
-        for j,(col,val) in enumerate(zip(df.columns,row),start=1): safe_write(ws,i,j,val,F,col)
+    av=[c for c in order if c in gl.columns]
+    df=df[av].copy()
+
     widths={"Данс":16,"Дансны нэр":28,"Огноо":12,"Гүйлгээний дугаар":14,"Харьцсан дансны нэр":26,"Харьцсан данс":16,
             "Баримт дугаар":14,"Валют":6,"Ханш":10,"Валютын дүн":16,"Дебет дүн":16,"Кредит дүн":16,
             "Transaction":16,"Гүйлгээний утга":40,"ABS":12,"Бүртгэсэн хэрэглэгч":18,"Type":14}
-    for idx,name in enumerate(df.columns): ws.set_column(idx+1, idx+1, widths.get(name,14))
+    start=31
+    return {"sheet":"Test 10", "title":"Test 10",
+            "procedure":"Extract entries with 7+ consecutive zeros in Transaction.",
+            "count":len(df), "comment":"Rounding/pretty numbers (e.g., 10,000,000).",
+            "tables":[{"row":start, "col":1, "frame":df, "title":(start-2, "Transaction list:")}],
+            "widths":name_widths(df.columns, widths)}
 
 # ---------------------------------------------------------------------
 # Test 11 – Top 40 by abs(Transaction)
 # ---------------------------------------------------------------------
-def sheet_test11(gl: pd.DataFrame, wb, writer):
-    sheet_name = clean_sheet_name("Test 11")
-    ws = wb.add_worksheet(sheet_name); writer.sheets[sheet_name] = ws
-    F=fmts(wb)
-    sel={k: match_col(k, list(gl.columns)) for k in ALIASES}
-    tr=sel["Transaction"]; assert tr
-    tx = gl[tr].apply(to_number)
-    df = gl.assign(__ABS__=tx.abs()).sort_values("__ABS__", ascending=False).head(40).copy()
+@stage_timer.timed
+def spec_test11(gl: pd.DataFrame) -> dict:
+    assert "Transaction" in gl.columns
+    df = top_rows(gl, "__TXN__", 40, absolute=True)
 
     order=["Данс","Дансны нэр","Огноо","Гүйлгээний дугаар","Харьцсан дансны нэр","Харьцсан данс",
            "Валют","Ханш","Валютын дүн","Дебет дүн","Кредит дүн","Transaction","Гүйлгээний утга","ABS","Бүртгэсэн хэрэглэгч"]
-    av=[c for c in order if sel.get(c)]
-    df=df[[sel[c] for c in av]].copy(); df.columns=av
-    if "Огноо" in df.columns: df["Огноо"]=pd.to_datetime(df["Огноо"], errors="coerce")
-
-    ws.write("B1","Steppe Road of Development LLC",F["bold"]); ws.write("B2","Test 11",F["bold"]); ws.write("B3",TITLE_DATE,F["bold"])
-    ws.write("B5","Procedure",F["bold"]); ws.write("C6","Extract journal entries with top X largest values by Transaction.")
-    ws.write("B8","Summary",F["bold"]); ws.write("B9","Testing by Audit Team?",F["header"]); ws.write("C9","No. of JE selected for testing",F["header"])
-    ws.write("B10","No",F["cell"]); ws.write_number("C10", int(len(df)), F["cell"])
-    ws.write("B12","Comment",F["bold"]); ws.write("C13","Transactions above MNT threshold / top ABS values.")
-
-    start=20; ws.write(start-2,1,"Transaction above – TOP 40",F["bold"])
-    for j,c in enumerate(df.columns): ws.write(start, j+1, c, F["header"])
-    for i,row in enumerate(df.itertuples(index=False), start=start+1):
-        for j,(col,val) in enumerate(zip(df.columns,row),start=1): safe_write(ws,i,j,val,F,col)
+    av=[c for c in order if c in gl.columns]
+    df=df[av]
+
     widths={"Данс":16,"Дансны нэр":28,"Огноо":12,"Гүйлгээний дугаар":14,"Харьцсан дансны нэр":26,"Харьцсан данс":16,
             "Валют":6,"Ханш":10,"Валютын дүн":16,"Дебет дүн":16,"Кредит дүн":16,
             "Transaction":16,"Гүйлгээний утга":40,"ABS":14,"Бүртгэсэн хэрэглэгч":18}
-    for idx,name in enumerate(df.columns): ws.set_column(idx+1, idx+1, widths.get(name,14))
+    start=20
+    return {"sheet":"Test 11", "title":"Test 11",
+            "procedure":"Extract journal entries with top X largest values by Transaction.",
+            "count":len(df), "comment":"Transactions above MNT threshold / top ABS values.",
+            "tables":[{"row":start, "col":1, "frame":df, "title":(start-2, "Transaction above – TOP 40")}],
+            "widths":name_widths(df.columns, widths)}
 
 # ---------------------------------------------------------------------
 # Test 15 – Revenue Top10 (5,13 debit) + график
 # ---------------------------------------------------------------------
-def sheet_test15_rev_top10(gl: pd.DataFrame, wb, writer, TOP_N=10):
-    sheet_name = clean_sheet_name("Test 15 – Rev Top10")
-    ws = wb.add_worksheet(sheet_name); writer.sheets[sheet_name] = ws
-    F=fmts(wb)
-    sel={k: match_col(k, list(gl.columns)) for k in ALIASES}
-    acc=sel["Данс"]; debit=sel["Дебет дүн"]; assert acc and debit
+PNL_ORDER = ["Данс","Дансны нэр","Огноо","Гүйлгээний дугаар","Харьцсан дансны нэр","Харьцсан данс",
+             "Валют","Ханш","Валютын дүн","Дебет дүн","Кредит дүн","Transaction","Гүйлгээний утга"]
+PNL_WIDTHS = {"Данс":16,"Дансны нэр":28,"Огноо":12,"Гүйлгээний дугаар":14,"Харьцсан дансны нэр":26,"Харьцсан данс":16,
+              "Валют":6,"Ханш":10,"Валютын дүн":16,"Дебет дүн":16,"Кредит дүн":16,"Transaction":16,"Гүйлгээний утга":40}
 
-    acc_digits = gl[acc].astype(str).str.replace(r"\D","",regex=True)
-    is_rev = acc_digits.str.startswith(("5","13"))
-    df = gl[is_rev].copy()
-    df["__DEBIT__"]=df[debit].apply(to_number)
-    top10 = df.sort_values("__DEBIT__", ascending=False).head(TOP_N)
+@stage_timer.timed
+def spec_test15_rev_top10(gl: pd.DataFrame, TOP_N=10) -> dict:
+    assert "Данс" in gl.columns and "Дебет дүн" in gl.columns
+
+    top10 = top_rows(gl, "__DEBIT__", TOP_N, classes=("revenue",))
+
+    av=[c for c in PNL_ORDER if c in gl.columns]
+    out = top10[av]
 
-    order=["Данс","Дансны нэр","Огноо","Гүйлгээний дугаар","Харьцсан дансны нэр","Харьцсан данс",
-           "Валют","Ханш","Валютын дүн","Дебет дүн","Кредит дүн","Transaction","Гүйлгээний утга"]
-    av=[c for c in order if sel.get(c)]
-    out = top10[[sel[c] for c in av]].copy(); out.columns=av
-    if "Огноо" in out.columns: out["Огноо"]=pd.to_datetime(out["Огноо"], errors="coerce")
-
-    ws.write("B1","Steppe Road of Development LLC",F["bold"]); ws.write("B2","Test 15",F["bold"]); ws.write("B3",TITLE_DATE,F["bold"])
-    ws.write("B5","Procedure",F["bold"]); ws.write("C6","Revenue (accounts starting 5 or 13) Top 10 by Debit.")
-    ws.write("B8","Summary",F["bold"]); ws.write("B9","Testing by Audit Team?",F["header"]); ws.write("C9","No. of JE selected for testing",F["header"])
-    ws.write("B10","No",F["cell"]); ws.write_number("C10",0,F["cell"])
-    ws.write("B12","Comment",F["bold"]); ws.write("C13","Scatter uses the debit amounts.")
-
-    # Chart data
     chart_row=19
-    ws.write(chart_row,1,"Rank",F["header"]); ws.write(chart_row,2,"Дебет дүн",F["header"])
-    for i,v in enumerate(top10["__DEBIT__"].tolist(), start=1):
-        ws.write_number(chart_row+i,1,i,F["cell"])
-        if pd.isna(v): ws.write(chart_row+i,2,"",F["cell"])
-        else: ws.write_number(chart_row+i,2,float(v),F["money"])
-    chart=wb.add_chart({'type':'scatter','subtype':'straight_with_markers'})
-    chart.set_title({'name':'Дебет дүн'}); chart.set_y_axis({'num_format':'#,##0'})
-    first,last = chart_row+1, chart_row+TOP_N
-    chart.add_series({'categories':[sheet_name,first,1,last,1],
-                      'values':    [sheet_name,first,2,last,2],
-                      'marker':{'type':'circle'}})
-    ws.insert_chart('B18', chart, {'x_scale':1.15,'y_scale':1.0})
-
-    # Table
-    t0=chart_row+TOP_N+4; ws.write(t0,1,"Debit entries to PnL in December 2024:",F["bold"])
-    h=t0+2
-    for j,c in enumerate(out.columns): ws.write(h, j+1, c, F["header"])
-    for i,row in enumerate(out.itertuples(index=False), start=h+1):
-        for j,(col,val) in enumerate(zip(out.columns,row),start=1): safe_write(ws,i,j,val,F,col)
-    widths={"Данс":16,"Дансны нэр":28,"Огноо":12,"Гүйлгээний дугаар":14,"Харьцсан дансны нэр":26,"Харьцсан данс":16,"Валют":6,"Ханш":10,"Валютын дүн":16,"Дебет дүн":16,"Кредит дүн":16,"Transaction":16,"Гүйлгээний утга":40}
-    for idx,name in enumerate(out.columns): ws.set_column(idx+1, idx+1, widths.get(name,14))
+    t0=chart_row+TOP_N+4
+    return {"sheet":"Test 15 – Rev Top10", "title":"Test 15",
+            "procedure":"Revenue (accounts starting 5 or 13) Top 10 by Debit.",
+            "count":0, "comment":"Scatter uses the debit amounts.",
+            "tables":[{"row":chart_row, "col":1, "frame":rank_frame(top10["__DEBIT__"], "Дебет дүн")},
+                      {"row":t0+2, "col":1, "frame":out, "title":(t0, "Debit entries to PnL in December 2024:")}],
+            "charts":[{"title":"Дебет дүн", "anchor":"B18", "rows":(chart_row+1, chart_row+TOP_N), "cols":(1, 2),
+                       "x":range(1, len(top10)+1), "y":top10["__DEBIT__"]}],
+            "widths":name_widths(out.columns, PNL_WIDTHS)}
 
 # ---------------------------------------------------------------------
 # Test 15 – Expenses list (6/7) + Transaction chart
 # ---------------------------------------------------------------------
+@stage_timer.timed
+def spec_test15_exp_list(gl: pd.DataFrame, max_points=200) -> dict:
+    assert "Данс" in gl.columns and "Transaction" in gl.columns, "‘Данс’ болон ‘Transaction’ багана шаардлагатай."
 
-def sheet_test15_exp_list(gl: pd.DataFrame, wb, writer, max_points=200):
-    sheet_name = clean_sheet_name("Test 15 – Exp 6-7 List")
-    ws = wb.add_worksheet(sheet_name); writer.sheets[sheet_name] = ws
-    F=fmts(wb)
+    exp_df = gl[gl["__CLASS__"] == "expense"]
+    available = [c for c in PNL_ORDER if c in gl.columns]
+    out = exp_df.sort_values("__TXN__", ascending=False, kind="stable")[available].copy()
 
-    sel = {t: match_col(t, list(gl.columns)) for t in ALIASES}
-    acc = sel.get("Данс"); tr = sel.get("Transaction")
-    assert acc and tr, "‘Данс’ болон ‘Transaction’ багана шаардлагатай."
-
-    digits = gl[acc].astype(str).str.replace(r"\D","",regex=True)
-    exp_df = gl[digits.str.startswith(("6","7"))].copy()
-
-    order = ["Данс","Дансны нэр","Огноо","Гүйлгээний дугаар","Харьцсан дансны нэр","Харьцсан данс",
-             "Валют","Ханш","Валютын дүн","Дебет дүн","Кредит дүн","Transaction","Гүйлгээний утга"]
-    available = [c for c in order if sel.get(c)]
-
-    exp_df["__TXN__"] = exp_df[tr].apply(to_number)
-    out = exp_df.sort_values("__TXN__", ascending=False)[[sel[c] for c in available]].copy()
-    out.columns = available
-    if "Огноо" in out.columns:
-        out["Огноо"] = pd.to_datetime(out["Огноо"], errors="coerce")
-
-    ws.write("B1","Steppe Road of Development LLC",F["bold"]) if False else None  # keep style consistent outside
-
-    ws.write("B1","Steppe Road of Development LLC",F["bold"]) ; ws.write("B2","Test 15",F["bold"]) ; ws.write("B3",TITLE_DATE,F["bold"]) 
-    ws.write("B5","Procedure",F["bold"]) ; ws.write("C6","Expense accounts (start with 6 or 7). Scatter uses Transaction from the table below.")
-    ws.write("B8","Summary",F["bold"]) ; ws.write("B9","Testing by Audit Team?",F["header"]) ; ws.write("C9","No. of JE selected for testing",F["header"]) 
-    ws.write("B10","No",F["cell"]) ; ws.write_number("C10", 0, F["cell"]) 
-    ws.write("B12","Comment",F["bold"]) ; ws.write("C13","Scatter uses the Transaction column from the detailed table (sorted).") 
-
-    title_row = 18; ws.write(title_row,1,"Debit entries to PnL in December 2024:",F["bold"]) 
+    title_row = 18
     head_row = title_row + 2
-    for j, name in enumerate(out.columns): ws.write(head_row, j+1, name, F["header"])
-
-    for i, row in enumerate(out.itertuples(index=False), start=head_row+1):
-        for j, (col_name, val) in enumerate(zip(out.columns, row), start=1):
-            safe_write(ws, i, j, val, F, col_name)
+    table = {"row":head_row, "col":1, "frame":out, "title":(title_row, "Debit entries to PnL in December 2024:")}
+    spec = {"sheet":"Test 15 – Exp 6-7 List", "title":"Test 15",
+            "procedure":"Expense accounts (start with 6 or 7). Scatter uses Transaction from the table below.",
+            "count":0, "comment":"Scatter uses the Transaction column from the detailed table (sorted).",
+            "tables":[table], "widths":[]}
 
     n_rows = min(max_points, len(out))
     if n_rows > 0 and "Transaction" in out.columns:
@@ -546,132 +816,216 @@ def sheet_test15_exp_list(gl: pd.DataFrame, wb, writer, max_points=200):
         rank_col_idx = txn_col_idx + 1
         first_row = head_row + 1
         last_row  = head_row + n_rows
+        # Rank нь Transaction-ий баруун талын нүднүүдэд хүснэгтийн мөртэй хамт бичигдэнэ
+        table["extra"] = {rank_col_idx: ("Rank (hidden)", pd.Series(np.arange(1, n_rows+1)))}
+        spec["charts"] = [{"title":"Transaction (Rank)", "anchor":"B15",
+                           "rows":(first_row, last_row), "cols":(rank_col_idx, txn_col_idx),
+                           "x":range(1, n_rows+1), "y":out["Transaction"], "money":True}]
+        spec["widths"].append((rank_col_idx, rank_col_idx, None, None, {'hidden': True}))
 
-        ws.write(first_row - 1, rank_col_idx, "Rank (hidden)", F["header"]) 
-        for i in range(n_rows): ws.write_number(first_row + i, rank_col_idx, i + 1, F["cell"]) 
-        ws.set_column(rank_col_idx, rank_col_idx, None, None, {'hidden': True})
-
-        chart = wb.add_chart({'type':'scatter','subtype':'straight_with_markers'})
-        chart.set_title({'name':'Transaction (Rank)'}) ; chart.set_y_axis({'num_format':'#,##0'})
-        chart.add_series({
-            'categories': [sheet_name, first_row, rank_col_idx, last_row, rank_col_idx],
-            'values':     [sheet_name, first_row, txn_col_idx,  last_row, txn_col_idx],
-            'marker': {'type': 'circle'},
-        })
-        ws.insert_chart('B15', chart, {'x_scale':1.15,'y_scale':1.0})
-
-    widths = {"Данс":16,"Дансны нэр":28,"Огноо":12,"Гүйлгээний дугаар":14,"Харьцсан дансны нэр":26,"Харьцсан данс":16,
-              "Валют":6,"Ханш":10,"Валютын дүн":16,"Дебет дүн":16,"Кредит дүн":16,"Transaction":16,"Гүйлгээний утга":40}
-    for idx, name in enumerate(out.columns): ws.set_column(idx+1, idx+1, widths.get(name, 14))
-def sheet_test16_revexp(gl: pd.DataFrame, wb, writer, TOP_N=10):
-    sheet_name = clean_sheet_name("Test 16 – RevExp Top10")
-    ws = wb.add_worksheet(sheet_name); writer.sheets[sheet_name] = ws
-    F=fmts(wb)
-    sel={k: match_col(k, list(gl.columns)) for k in ALIASES}
-    acc=sel["Данс"]; debit=sel["Дебет дүн"]; credit=sel["Кредит дүн"]
-    assert acc and debit and credit
-
-    acc_digits = gl[acc].astype(str).str.replace(r"\D","",regex=True)
-    rev_df = gl[acc_digits.str.startswith(("5","13"))].copy()
-    exp_df = gl[acc_digits.str.startswith(("6","7","8"))].copy()
-    rev_df["__DEBIT__"] = rev_df[debit].apply(to_number)
-    exp_df["__CREDIT__"]= exp_df[credit].apply(to_number)
-    top_rev = rev_df.sort_values("__DEBIT__", ascending=False).head(TOP_N)
-    top_exp = exp_df.sort_values("__CREDIT__", ascending=False).head(TOP_N)
-
-    order=["Данс","Дансны нэр","Огноо","Гүйлгээний дугаар","Харьцсан дансны нэр","Харьцсан данс",
-           "Валют","Ханш","Валютын дүн","Дебет дүн","Кредит дүн","Transaction","Гүйлгээний утга"]
-    av=[c for c in order if sel.get(c)]
-    rev_out=top_rev[[sel[c] for c in av]].copy(); rev_out.columns=av
-    exp_out=top_exp[[sel[c] for c in av]].copy(); exp_out.columns=av
-    if "Огноо" in rev_out.columns: rev_out["Огноо"]=pd.to_datetime(rev_out["Огноо"], errors="coerce")
-    if "Огноо" in exp_out.columns: exp_out["Огноо"]=pd.to_datetime(exp_out["Огноо"], errors="coerce")
-
-    ws.write("B1","Steppe Road of Development LLC",F["bold"]); ws.write("B2","Test 15",F["bold"]); ws.write("B3",TITLE_DATE,F["bold"])
-    ws.write("B5","Procedure",F["bold"]); ws.write("C6","Revenue (5,13) Top 10 by Debit and Expense (6,7,8) Top 10 by Credit.")
-    ws.write("B8","Summary",F["bold"]); ws.write("B9","Testing by Audit Team?",F["header"]); ws.write("C9","No. of JE selected for testing",F["header"])
-    ws.write("B10","No",F["cell"]); ws.write_number("C10",0,F["cell"])
-    ws.write("B12","Comment",F["bold"]); ws.write("C13","Two scatter plots: debit(Rev) and credit(Exp).")
-
-    # Revenue chart
-    row_rev=19
-    ws.write(row_rev,1,"Rank",F["header"]); ws.write(row_rev,2,"Дебет дүн",F["header"])
-    for i,v in enumerate(top_rev["__DEBIT__"].tolist(), start=1):
-        ws.write_number(row_rev+i,1,i,F["cell"])
-        if pd.isna(v): ws.write(row_rev+i,2,"",F["cell"])
-        else: ws.write_number(row_rev+i,2,float(v),F["money"])
-    chart_rev=wb.add_chart({'type':'scatter','subtype':'straight_with_markers'})
-    chart_rev.set_title({'name':'Орлого (5,13) — Дебет Top 10'}); chart_rev.set_y_axis({'num_format':'#,##0'})
-    first,last=row_rev+1,row_rev+TOP_N
-    chart_rev.add_series({'categories':[sheet_name,first,1,last,1],
-                          'values':    [sheet_name,first,2,last,2],
-                          'marker':{'type':'circle'}})
-    ws.insert_chart('B18', chart_rev, {'x_scale':1.15,'y_scale':1.0})
+    spec["widths"] += name_widths(out.columns, PNL_WIDTHS)
+    return spec
 
-    # Expense chart
-    row_exp = row_rev + TOP_N + 16
-    ws.write(row_exp,1,"Rank",F["header"]); ws.write(row_exp,2,"Кредит дүн",F["header"])
-    for i,v in enumerate(top_exp["__CREDIT__"].tolist(), start=1):
-        ws.write_number(row_exp+i,1,i,F["cell"])
-        if pd.isna(v): ws.write(row_exp+i,2,"",F["cell"])
-        else: ws.write_number(row_exp+i,2,float(v),F["money"])
-    chart_exp=wb.add_chart({'type':'scatter','subtype':'straight_with_markers'})
-    chart_exp.set_title({'name':'Зардал (6,7,8) — Кредит Top 10'}); chart_exp.set_y_axis({'num_format':'#,##0'})
-    first2,last2=row_exp+1,row_exp+TOP_N
-    chart_exp.add_series({'categories':[sheet_name,first2,1,last2,1],
-                          'values':    [sheet_name,first2,2,last2,2],
-                          'marker':{'type':'circle'}})
-    ws.insert_chart(f'B{row_exp-1}', chart_exp, {'x_scale':1.15,'y_scale':1.0})
+# ---------------------------------------------------------------------
+# Test 16 – Revenue / Expense Top10 + 2 график
+# ---------------------------------------------------------------------
+@stage_timer.timed
+def spec_test16_revexp(gl: pd.DataFrame, TOP_N=10) -> dict:
+    assert "Данс" in gl.columns and "Дебет дүн" in gl.columns and "Кредит дүн" in gl.columns
 
-    # Tables (rev, exp)
-    t1=row_exp+TOP_N+6; ws.write(t1,1,"Revenue (5,13) — Debit Top 10:",F["bold"])
-    h1=t1+2
-    for j,c in enumerate(rev_out.columns): ws.write(h1, j+1, c, F["header"])
-    for i,row in enumerate(rev_out.itertuples(index=False), start=h1+1):
-        for j,(col,val) in enumerate(zip(rev_out.columns,row),start=1): safe_write(ws,i,j,val,F,col)
+    top_rev = top_rows(gl, "__DEBIT__", TOP_N, classes=("revenue",))   # Test 15-тай нэг pass
+    top_exp = top_rows(gl, "__CREDIT__", TOP_N, classes=("expense","other_expense"))
 
-    t2=h1+TOP_N+5; ws.write(t2,1,"Expense (6,7,8) — Credit Top 10:",F["bold"])
-    h2=t2+2
-    for j,c in enumerate(exp_out.columns): ws.write(h2, j+1, c, F["header"])
-    for i,row in enumerate(exp_out.itertuples(index=False), start=h2+1):
-        for j,(col,val) in enumerate(zip(exp_out.columns,row),start=1): safe_write(ws,i,j,val,F,col)
+    av=[c for c in PNL_ORDER if c in gl.columns]
+    rev_out=top_rev[av]
+    exp_out=top_exp[av]
 
-    widths={"Данс":16,"Дансны нэр":28,"Огноо":12,"Гүйлгээний дугаар":14,"Харьцсан дансны нэр":26,"Харьцсан данс":16,"Валют":6,"Ханш":10,"Валютын дүн":16,"Дебет дүн":16,"Кредит дүн":16,"Transaction":16,"Гүйлгээний утга":40}
-    for nm,w in widths.items():
-        if nm in rev_out.columns: ws.set_column(list(rev_out.columns).index(nm)+1, list(rev_out.columns).index(nm)+1, w)
-        if nm in exp_out.columns: ws.set_column(list(exp_out.columns).index(nm)+1, list(exp_out.columns).index(nm)+1, w)
+    row_rev=19
+    row_exp = row_rev + TOP_N + 16
+    t1=row_exp+TOP_N+6; h1=t1+2
+    t2=h1+TOP_N+5; h2=t2+2
+    return {"sheet":"Test 16 – RevExp Top10", "title":"Test 15",
+            "procedure":"Revenue (5,13) Top 10 by Debit and Expense (6,7,8) Top 10 by Credit.",
+            "count":0, "comment":"Two scatter plots: debit(Rev) and credit(Exp).",
+            "tables":[{"row":row_rev, "col":1, "frame":rank_frame(top_rev["__DEBIT__"], "Дебет дүн")},
+                      {"row":row_exp, "col":1, "frame":rank_frame(top_exp["__CREDIT__"], "Кредит дүн")},
+                      {"row":h1, "col":1, "frame":rev_out, "title":(t1, "Revenue (5,13) — Debit Top 10:")},
+                      {"row":h2, "col":1, "frame":exp_out, "title":(t2, "Expense (6,7,8) — Credit Top 10:")}],
+            "charts":[{"title":"Орлого (5,13) — Дебет Top 10", "anchor":"B18",
+                       "rows":(row_rev+1, row_rev+TOP_N), "cols":(1, 2),
+                       "x":range(1, len(top_rev)+1), "y":top_rev["__DEBIT__"]},
+                      {"title":"Зардал (6,7,8) — Кредит Top 10", "anchor":f"B{row_exp-1}",
+                       "rows":(row_exp+1, row_exp+TOP_N), "cols":(1, 2),
+                       "x":range(1, len(top_exp)+1), "y":top_exp["__CREDIT__"]}],
+            "widths":name_widths(rev_out.columns, PNL_WIDTHS)}
+
+# 9 тест sheet – бичигдэх дарааллаар
+TEST_SPECS = [spec_test6_len, spec_non_business_day, spec_test8, spec_test9, spec_test10,
+              spec_test11, spec_test15_rev_top10, spec_test15_exp_list, spec_test16_revexp]
+
+def compute_specs(gl: pd.DataFrame, spec_fns=TEST_SPECS, workers: int | None = None):
+    """Yield the spec of every test in ``spec_fns`` order.
+
+    Tests run concurrently on a thread pool (they only read the canonical GL), so
+    the caller can render the first sheet while later tests are still computing.
+    """
+    workers = SPEC_WORKERS if workers is None else workers
+    if workers <= 1:
+        for fn in spec_fns:
+            yield fn(gl)
+        return
+    pool = ThreadPoolExecutor(max_workers=min(workers, len(spec_fns)), thread_name_prefix="jet-spec")
+    try:
+        futures = [pool.submit(stage_timer.in_context(fn), gl) for fn in spec_fns]
+        for f in futures:
+            yield f.result()
+    finally:
+        pool.shutdown(cancel_futures=True)
 
 # ---------------------------------------------------------------------
-# Main – add RAW sheets at the end
+# Report API – re-entrant: inputs in, workbook out (module global өөрчлөхгүй)
 # ---------------------------------------------------------------------
-def main():
-    # Load GL & TB
-    gl_raw, gl_src = load_gl(INPUT_XLSX_GL)
+def write_report(out, gl_raw: pd.DataFrame, gl_src: str, tb_raw: pd.DataFrame | None = None,
+                 tb_src: str = "(not found)", chart=None, company_name=COMPANY_NAME,
+                 title_date=TITLE_DATE, low_memory=LOW_MEMORY, workers: int | None = None,
+                 row_budget: int = ROW_BUDGET, sheet_budgets: dict | None = None,
+                 sidecar_dir: Path | None = None, results_dir: Path | None = None) -> list[Path]:
+    """Write the full test workbook for the loaded GL/TB to ``out`` (path or binary file object).
+
+    ``chart`` is a client chart of accounts (see chart_of_accounts.load_chart).
+    A table keeps at most ``row_budget`` rows (``sheet_budgets`` overrides it per
+    sheet name) on its sheet; the rest are written to ``sidecar_dir`` and the
+    sidecar paths are returned (see report_bundle.write_bundle).
+    With ``results_dir`` every test's tables also go there as Parquet plus a
+    manifest.json (see results_export); ``out=None`` skips the workbook entirely.
+    A path ``out`` is written to a temporary file beside it and renamed only on
+    success, so a failed or interrupted run leaves no truncated workbook behind.
+    Everything the run needs is passed in, so concurrent calls do not interfere.
+    """
+    if out is None and results_dir is None:
+        raise ValueError("Nothing to write: give out and/or results_dir")
+    budgets = sheet_budgets or {}
+    sidecars, tests = [], []
+    raw_sheets = 0 if out is None else 1 + (tb_raw is not None and not tb_raw.empty) + 1
+    stage_timer.expect(1 + 2 * len(TEST_SPECS) + raw_sheets)
+    # Canonical GL – бүх тест үүнээс уншина
+    gl = build_canonical_gl(gl_raw, chart)
+
+    # low_memory үед sheet бүрийг мөрийн дарааллаар (дээрээс доош) бичих ёстой
+    options = {"constant_memory": True} if low_memory else {}
+    part = None  # path out-ийн түр файл: амжилттай болсны дараа л out болж нэрлэгдэнэ
+    if isinstance(out, (str, os.PathLike)):
+        fd, part = tempfile.mkstemp(dir=Path(out).parent, prefix=f".{Path(out).stem}-", suffix=".xlsx")
+        os.close(fd)
+    writer = None if out is None else pd.ExcelWriter(part or out, engine="xlsxwriter",
+                                                     engine_kwargs={"options": options})
     try:
-        tb_raw, tb_src = load_tb(INPUT_XLSX_TB)
-    except Exception:
-        tb_raw, tb_src = pd.DataFrame(), "(not found)"
-
-    with pd.ExcelWriter(OUTPUT_XLSX, engine="xlsxwriter") as writer:
-        wb = writer.book
-
         # ======== 1) 9 TEST SHEETS ========
-        sheet_test6_len(gl_raw, wb, writer)
-        sheet_non_business_day(gl_raw, wb, writer)
-        sheet_test8(gl_raw, wb, writer)
-        sheet_test9(gl_raw, wb, writer)
-        sheet_test10(gl_raw, wb, writer)
-        sheet_test11(gl_raw, wb, writer)
-        sheet_test15_rev_top10(gl_raw, wb, writer)
-        sheet_test15_exp_list(gl_raw, wb, writer)
-        sheet_test16_revexp(gl_raw, wb, writer)
+        # тооцоолол thread pool-д, бичилт энд – sheet-ийн тогтмол дарааллаар
+        for spec in compute_specs(gl, workers=workers):
+            kind = "results" if writer is None else "sheet"
+            with stage_timer.stage(f"{kind}:{spec['sheet']}", stage_timer.rows(spec)):
+                if results_dir is not None:
+                    tests.append(export_spec(spec, results_dir))
+                if writer is not None:
+                    spec, paths = budget_spec(spec, budgets.get(spec["sheet"], row_budget), sidecar_dir)
+                    render_sheet(spec, writer.book, writer, company_name, title_date)
+                    sidecars += paths
 
         # ======== 2) RAW SHEETS (always at the back) ========
-        sheet_gl_raw(gl_raw, wb, writer, gl_src)
-        if not tb_raw.empty:
-            sheet_tb_raw(tb_raw, wb, writer, tb_src)
+        if writer is not None:
+            wb = writer.book
+            sidecars += sheet_gl_raw(gl_raw, wb, writer, gl_src, budgets.get("GL - Raw", row_budget), sidecar_dir)
+            if tb_raw is not None and not tb_raw.empty:
+                sidecars += sheet_tb_raw(tb_raw, wb, writer, tb_src, budgets.get("TB - Raw", row_budget), sidecar_dir)
+        if results_dir is not None:
+            results_export.write_manifest(results_dir, "all_reports_master", {
+                "company_name": company_name, "title_date": title_date, "gl_source": gl_src,
+                "gl_rows": len(gl_raw), "tb_source": tb_src, "tb_rows": 0 if tb_raw is None else len(tb_raw),
+                "chart": chart, "row_budget": row_budget, "sheet_budgets": budgets}, tests)
+        if writer is not None:
+            with stage_timer.stage("save"):
+                writer.close()
+            if part is not None:
+                os.replace(part, out)
+    except BaseException:
+        if writer is not None and not writer.book.fileclosed:
+            writer.close()  # xlsxwriter-ийн түр файлуудыг цэвэрлэнэ
+        if part is not None:
+            Path(part).unlink(missing_ok=True)
+        raise
+    return sidecars
+
+def load_inputs(gl_path: Path, tb_path: Path | None = None):
+    """``(gl_raw, gl_src, tb_raw, tb_src)``; without ``tb_path`` the TB is looked up in the GL workbook."""
+    stage_timer.expect(2)
+    gl_raw, gl_src = load_gl(gl_path)
+    try:
+        tb_raw, tb_src = load_tb(tb_path or gl_path)
+    except Exception:
+        tb_raw, tb_src = pd.DataFrame(), "(not found)"
+    return gl_raw, gl_src, tb_raw, tb_src
+
+def build_report(gl_path: Path, tb_path: Path | None = None, chart=None, **options) -> bytes:
+    """The full test workbook for the given GL/TB files, as xlsx bytes – or, when
+    some sheet ran over its row budget, a zip bundle of the workbook and its sidecars
+    (see report_bundle.is_bundle).
+
+    ``options`` go to write_report (company_name, title_date, low_memory, workers,
+    row_budget, sheet_budgets).
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        xlsx = Path(temp_dir) / report_bundle.REPORT_NAME
+        with stage_timer.run("all_reports_master", gl=Path(gl_path).name, **options):
+            sidecars = write_report(xlsx, *load_inputs(gl_path, tb_path), chart=chart,
+                                    sidecar_dir=Path(temp_dir) / report_bundle.SIDECAR_DIR, **options)
+        if not sidecars:
+            return xlsx.read_bytes()
+        buf = io.BytesIO()
+        report_bundle.write_bundle(buf, xlsx, sidecars)
+        return buf.getvalue()
+
+def report_from_bytes(gl_data: bytes, tb_data: bytes | None = None, chart=None, **options) -> bytes:
+    """build_report() for uploaded file contents (e.g. as a job_queue job)."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        gl_path = Path(temp_dir) / "gl.xlsx"
+        gl_path.write_bytes(gl_data)
+        tb_path = None
+        if tb_data is not None:
+            tb_path = Path(temp_dir) / "tb.xlsx"
+            tb_path.write_bytes(tb_data)
+        return build_report(gl_path, tb_path, chart, **options)
 
-    print(f"✔ Done. Workbook written to: {OUTPUT_XLSX}")
+# ---------------------------------------------------------------------
+# Main – add RAW sheets at the end
+# ---------------------------------------------------------------------
+def main():
+    if HEADLESS and RESULTS_DIR is None:
+        raise ValueError("HEADLESS needs RESULTS_DIR")
+    with tempfile.TemporaryDirectory() as temp_dir, \
+         stage_timer.run("all_reports_master", gl=INPUT_XLSX_GL.name, low_memory=LOW_MEMORY) as run:
+        gl_raw, gl_src, tb_raw, tb_src = load_inputs(INPUT_XLSX_GL, INPUT_XLSX_TB)
+        chart = coa.load_chart(CHART_OF_ACCOUNTS) if CHART_OF_ACCOUNTS else None
+        out = None if HEADLESS else OUTPUT_XLSX
+        sidecars = write_report(out, gl_raw, gl_src, tb_raw, tb_src, chart,
+                                COMPANY_NAME, TITLE_DATE, LOW_MEMORY, SPEC_WORKERS,
+                                ROW_BUDGET, SHEET_ROW_BUDGETS, Path(temp_dir), RESULTS_DIR)
+        if sidecars:  # xlsx + илүүдэл мөрүүд нэг zip-д
+            bundle = OUTPUT_XLSX.with_suffix(".zip")
+            report_bundle.write_bundle(bundle, OUTPUT_XLSX, sidecars, OUTPUT_XLSX.name)
+            OUTPUT_XLSX.unlink()
+    if HEADLESS:
+        print("✔ Done (headless, no workbook).")
+    elif sidecars:
+        print(f"✔ Done. Workbook and {len(sidecars)} sidecar(s) written to: {bundle}")
+    else:
+        print(f"✔ Done. Workbook written to: {OUTPUT_XLSX}")
+    if RESULTS_DIR is not None:
+        print(f"  Results: {Path(RESULTS_DIR) / results_export.MANIFEST}")
+    for s in run["stages"]:
+        if "mem_before" in s:
+            print(f"  {s['stage']}: {s['mem_before'] / 2**20:.1f} MB -> {s['mem_after'] / 2**20:.1f} MB in memory")
+    print(f"  Timings: {stage_timer.log_path(run['id'])}")
 
 if __name__ == "__main__":
     main()
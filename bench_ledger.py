@@ -0,0 +1,234 @@
+# bench_ledger.py
+# -*- coding: utf-8 -*-
+# Синтетик GL/TB дээрх гүйцэтгэлийн хэмжилт.
+# Seed-тэй generator 10k–5M мөрийн GL (монгол эсвэл англи баганын нэртэй) үүсгэж,
+# хоёр тайланг санах ойд бүтнээр нь үүсгэнэ; stage_timer-ийн үе шат бүрийн
+# (spec_*/sheet_*/build_*/save) хугацаа болон нийт хугацааг JSON файлд бичнэ.
+# --baseline өгвөл өмнөх үр дүнтэй харьцуулж, tolerance-ээс их удааширсныг тэмдэглэнэ.
+#
+#   python bench_ledger.py --sizes 10k,100k --out bench.json
+#   python bench_ledger.py --sizes 10k,100k --baseline bench.json --tolerance 0.2
+
+import argparse
+import io
+import json
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import all_reports_master_merged as master
+import build_full_report_pretty as stat
+import stage_timer
+
+# ---------------------------------------------------------------------
+# Config
+# ---------------------------------------------------------------------
+SIZES = ["10k", "100k", "1M", "5M"]
+EXCEL_MAX_ROWS = 1_048_576
+
+# Монгол нэр -> англи нэр (ALIASES болон statistical SOURCES хоёуланд танигдана)
+GL_HEADERS_EN = {
+    "Данс": "Account Number", "Дансны нэр": "Account Name", "Огноо": "Date",
+    "Гүйлгээний дугаар": "Document No", "Харьцсан дансны нэр": "Counter Account Name",
+    "Харьцсан данс": "Counter Account", "Day": "Day", "Day of the week": "Day of the week",
+    "Баримтын дугаар": "Invoice No", "Валют": "Currency", "Ханш": "Exchange Rate",
+    "Валютын дүн": "Foreign Amount", "Дебет дүн": "Debit", "Кредит дүн": "Credit",
+    "Transaction": "Transaction", "Гүйлгээний утга": "Description", "ABS": "ABS",
+    "Үүсгэсэн огноо": "Creation date", "Бүртгэсэн хэрэглэгч": "User", "Цонхны нэр": "Window Name",
+}
+TB_HEADERS_EN = {"Данс": "Account No", "Дансны нэр": "Account name"}
+
+# дансны эхний цифр (chart_of_accounts-ийн ангилал) ба магадлал
+ACCOUNT_PREFIXES = [("1", .30), ("2", .10), ("3", .10), ("4", .05), ("5", .15),
+                    ("6", .15), ("7", .08), ("8", .05), ("9", .02)]
+DESCRIPTIONS = ["ГЭРЭЭНИЙ ДАГУУ", "Кассын орлого", "Цалингийн шилжүүлэг", "Бараа худалдан авалт",
+                "Үйлчилгээний төлбөр", "Ханшийн тэгшитгэл", "Payment", "Invoice settlement",
+                "Тохируулга", "Алдаа засах", "Буцаалт", "Гүйлгээ цуцлах", "Adjust entry", None]
+DESCRIPTION_WEIGHTS = [.25, .15, .12, .12, .10, .08, .06, .06, .015, .01, .01, .005, .005, .015]
+WEEKDAYS = ["Monday","Tuesday","Wednesday","Thursday","Friday","Saturday","Sunday"]
+
+# ---------------------------------------------------------------------
+# Synthetic ledger
+# ---------------------------------------------------------------------
+def parse_size(text: str) -> int:
+    text = text.strip().lower()
+    mult = {"k": 1_000, "m": 1_000_000}.get(text[-1], 1)
+    return int(float(text.rstrip("km")) * mult)
+
+def _accounts(rng, n_accounts: int) -> tuple[np.ndarray, np.ndarray]:
+    prefixes, weights = zip(*ACCOUNT_PREFIXES)
+    first = rng.choice(prefixes, size=n_accounts, p=weights)
+    codes = np.array([f"{p}{i % 1000:03d}-00-000-{i // 1000:03d}" for i, p in enumerate(first)])
+    names = np.array([f"Данс {c[:4]} #{i}" for i, c in enumerate(codes)])
+    return codes, names
+
+def synthetic_ledger(n: int, seed: int = 0, headers: str = "mn") -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """``(TB, GL, MAT_RAW)``: a seeded GL of ``n`` lines, its TB and a materiality sheet.
+
+    ``headers="en"`` renames the columns to English aliases.
+    """
+    rng = np.random.default_rng(seed)
+    codes, names = _accounts(rng, int(min(2_000, max(50, n // 2_000))))
+    acc = rng.integers(0, len(codes), n)
+    cnt = rng.integers(0, len(codes), n)
+
+    date = np.datetime64("2024-01-01") + rng.integers(0, 366, n).astype("timedelta64[D]")
+    created = date.astype("datetime64[ms]") + rng.integers(0, 30 * 86_400_000, n).astype("timedelta64[ms]")
+    date = pd.DatetimeIndex(date)
+
+    amount = np.round(rng.lognormal(13, 2.5, n))
+    rnd = rng.random(n) < 0.1  # "гоё тоо"-ны тестэд: сая хүртэл бүхэлчилсэн дүн
+    amount[rnd] = np.maximum(np.round(amount[rnd], -6), 1_000_000)
+    is_debit = rng.random(n) < 0.5
+    debit = np.where(is_debit, amount, np.nan)
+    credit = np.where(is_debit, np.nan, amount)
+    usd = rng.random(n) < 0.05
+    rate = np.where(usd, 3_400.0, 1.0)
+
+    users = np.array([f"Х.ХЭРЭГЛЭГЧ{i}" for i in range(20)])
+    windows = np.array([f"Цонх {i}" for i in range(15)])
+    desc = np.array(DESCRIPTIONS, dtype=object)[rng.choice(len(DESCRIPTIONS), size=n, p=DESCRIPTION_WEIGHTS)]
+
+    GL = pd.DataFrame({
+        "Данс": pd.array(codes[acc], dtype="str"),
+        "Дансны нэр": pd.array(names[acc], dtype="str"),
+        "Огноо": date,
+        "Гүйлгээний дугаар": rng.integers(10**17, 10**18, n),
+        "Харьцсан дансны нэр": pd.array(names[cnt], dtype="str"),
+        "Харьцсан данс": pd.array(codes[cnt], dtype="str"),
+        "Day": date.day.to_numpy(),
+        "Day of the week": pd.array(np.array(WEEKDAYS)[date.weekday], dtype="str"),
+        "Баримтын дугаар": rng.integers(1, 10_000, n).astype(float),
+        "Валют": pd.array(np.where(usd, "USD", "MNT"), dtype="str"),
+        "Ханш": rate,
+        "Валютын дүн": amount / rate,
+        "Дебет дүн": debit,
+        "Кредит дүн": credit,
+        "Transaction": np.where(is_debit, amount, -amount).astype(np.int64),
+        "Гүйлгээний утга": desc,
+        "ABS": amount.astype(np.int64),
+        "Үүсгэсэн огноо": created,
+        "Бүртгэсэн хэрэглэгч": pd.array(users[rng.integers(0, len(users), n)], dtype="str"),
+        "Цонхны нэр": pd.array(windows[rng.integers(0, len(windows), n)], dtype="str"),
+    })
+    TB = pd.DataFrame({
+        "Данс": pd.array(codes, dtype="str"),
+        "Дансны нэр": pd.array(names, dtype="str"),
+        "2023": rng.integers(-10**10, 10**10, len(codes)),
+        "2024": rng.integers(-10**10, 10**10, len(codes)),
+    })
+    MAT_RAW = pd.DataFrame({"Name": ["Materiality", "Performance materiality", "CTT"],
+                            "Value": [2_701_000_000, stat.PM, stat.CTT]})
+    if headers == "en":
+        GL = GL.rename(columns=GL_HEADERS_EN)
+        TB = TB.rename(columns=TB_HEADERS_EN)
+    return TB, GL, MAT_RAW
+
+# ---------------------------------------------------------------------
+# Runs
+# ---------------------------------------------------------------------
+def _run_master(TB, GL, MAT_RAW, workers):
+    with tempfile.TemporaryDirectory() as temp_dir:  # budget-ээс илүү мөр sidecar болно
+        master.write_report(io.BytesIO(), GL, "GL", TB, "TB", workers=workers, sidecar_dir=Path(temp_dir))
+
+def _run_statistical(TB, GL, MAT_RAW, workers):
+    stat.build_report(TB, GL, MAT_RAW)
+
+REPORTS = {"master": _run_master, "statistical": _run_statistical}
+
+def bench_one(report: str, TB, GL, MAT_RAW, workers: int = 1) -> list[dict]:
+    """Stage timings plus an end-to-end "total" row for one report build."""
+    with stage_timer.run(f"bench-{report}") as rec:
+        REPORTS[report](TB, GL, MAT_RAW, workers)
+    out = [{"stage": s["stage"], "wall": s["wall"], "rows_in": s["rows_in"],
+            "rows_out": s["rows_out"], "cells": s["cells"]} for s in rec["stages"]]
+    out.append({"stage": "total", "wall": rec["wall"], "rows_in": len(GL), "rows_out": None,
+                "cells": sum(s["cells"] for s in rec["stages"])})
+    return out
+
+def run_suite(sizes, headers=("mn", "en"), reports=tuple(REPORTS), seed=0, workers=1, repeat=1, log=print) -> dict:
+    """Every (size, headers, report) combination; per stage the fastest of ``repeat`` runs."""
+    results = []
+    for size in sizes:
+        n = parse_size(size)
+        for h in headers:
+            t0 = time.perf_counter()
+            TB, GL, MAT_RAW = synthetic_ledger(n, seed, h)
+            log(f"{size:>5} {h}: ledger generated in {time.perf_counter() - t0:.1f}s")
+            for report in reports:
+                best = {}
+                for _ in range(repeat):
+                    for row in bench_one(report, TB, GL, MAT_RAW, workers):
+                        if row["stage"] not in best or row["wall"] < best[row["stage"]]["wall"]:
+                            best[row["stage"]] = row
+                for row in best.values():
+                    results.append({"report": report, "size": size, "rows": n, "headers": h,
+                                    "over_excel_limit": n + 3 > EXCEL_MAX_ROWS, **row})
+                log(f"{size:>5} {h} {report:<12} total {best['total']['wall']:.2f}s")
+            del TB, GL, MAT_RAW
+    return {"meta": {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "seed": seed, "workers": workers,
+                     "repeat": repeat, "python": platform.python_version(), "pandas": pd.__version__,
+                     "numpy": np.__version__, "platform": platform.platform()},
+            "results": results}
+
+# ---------------------------------------------------------------------
+# Regression compare
+# ---------------------------------------------------------------------
+def compare(baseline: dict, current: dict, tolerance: float = 0.2, min_seconds: float = 0.05) -> list[dict]:
+    """Stages slower than the baseline by more than ``tolerance`` (relative).
+
+    Stages under ``min_seconds`` in both runs are ignored as timer noise.
+    """
+    key = lambda r: (r["report"], r["size"], r["headers"], r["stage"])
+    base = {key(r): r["wall"] for r in baseline["results"]}
+    out = []
+    for r in current["results"]:
+        old = base.get(key(r))
+        if old is None or max(old, r["wall"]) < min_seconds:
+            continue
+        change = (r["wall"] - old) / old if old else float("inf")
+        if change > tolerance:
+            out.append({"report": r["report"], "size": r["size"], "headers": r["headers"],
+                        "stage": r["stage"], "baseline": old, "current": r["wall"], "change": round(change, 3)})
+    return out
+
+# ---------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="JET report benchmark on synthetic ledgers")
+    ap.add_argument("--sizes", default=",".join(SIZES), help="comma-separated line counts, e.g. 10k,100k,1M,5M")
+    ap.add_argument("--headers", default="mn,en", help="header variants: mn, en or both")
+    ap.add_argument("--reports", default=",".join(REPORTS), help="master, statistical or both")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--workers", type=int, default=1, help="test spec threads (1 = clean per-stage timings)")
+    ap.add_argument("--repeat", type=int, default=1, help="runs per case; the fastest is kept")
+    ap.add_argument("--out", default="bench_results.json")
+    ap.add_argument("--baseline", help="earlier results file to compare against")
+    ap.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown")
+    ap.add_argument("--min-seconds", type=float, default=0.05, help="ignore stages faster than this")
+    args = ap.parse_args(argv)
+
+    split = lambda s: [x.strip() for x in s.split(",") if x.strip()]
+    current = run_suite(split(args.sizes), split(args.headers), split(args.reports),
+                        args.seed, args.workers, args.repeat)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(current, f, ensure_ascii=False, indent=1)
+    print(f"Results -> {args.out}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        slower = compare(baseline, current, args.tolerance, args.min_seconds)
+        for r in slower:
+            print(f"REGRESSION {r['report']} {r['size']} {r['headers']} {r['stage']}: "
+                  f"{r['baseline']:.3f}s -> {r['current']:.3f}s (+{r['change']:.0%})")
+        print(f"{len(slower)} regression(s) beyond {args.tolerance:.0%}")
+        return 1 if slower else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,449 +1,898 @@
-# build_full_report_with_materiality.py
-import calendar
-from pathlib import Path
-import pandas as pd
-from openpyxl import Workbook
-from openpyxl.styles import Alignment, Font, Border, Side, PatternFill
-from openpyxl.utils import get_column_letter
-
-# ========= SETTINGS =========
-SRC_PATH = r"steppe road data.xlsx"      # <-- таны эх файл
-TB_SHEET = "TB"
-GL_SHEET = "GL"
-MAT_SHEET = "Materiality"                # raw sheet байвал төгсгөлд оруулна
-OUT_PATH = r"Full_JE_Report_with_Materiality.xlsx"
-
-# Materiality inputs
-CTT = 135_050_000     # Threshold (CT)
-PM  = 1_620_600_000   # Performance Materiality (PM)
-# ===========================
-
-# ---------- helpers ----------
-def pick(columns, options):
-    norm = {str(c).strip().lower(): c for c in columns}
-    for o in options:
-        k = str(o).strip().lower()
-        if k in norm: return norm[k]
-    return None
-
-THIN = Side(style="thin", color="A0A0A0")
-BORDER = Border(left=THIN, right=THIN, top=THIN, bottom=THIN)
-HDR_FILL = PatternFill("solid", fgColor="F3F4F6")
-BOLD = Font(bold=True)
-
-def write_table(ws, df, start_row=1, start_col=1,
-                money_cols=None, int_cols=None, percent_cols=None,
-                freeze=True, show_grid=False, title_text=None, title_cell="B9"):
-    money_cols   = set(money_cols   or [])
-    int_cols     = set(int_cols     or [])
-    percent_cols = set(percent_cols or [])
-    # optional title (like “Testing:”)
-    if title_text:
-        t = ws[title_cell]
-        t.value = title_text
-        t.font  = Font(bold=True, color="CC0000")
-
-    r = start_row
-    # header
-    for j, col in enumerate(df.columns, start=start_col):
-        c = ws.cell(r, j, col); c.font=BOLD; c.fill=HDR_FILL
-        c.alignment = Alignment(horizontal="center", vertical="center")
-        c.border = BORDER
-    r += 1
-    # body
-    for _, row in df.iterrows():
-        for j, col in enumerate(df.columns, start=start_col):
-            v = row[col]
-            c = ws.cell(r, j, v); c.border = BORDER
-            if col in money_cols:   c.number_format = '#,##0'
-            if col in int_cols:     c.number_format = '0'
-            if col in percent_cols: c.number_format = '0.0"%"'
-        r += 1
-    # autosize
-    for j, col in enumerate(df.columns, start=start_col):
-        w = min(max(12, max(len(str(col)), *(len(str(x)) for x in df[col])) + 2), 60)
-        ws.column_dimensions[get_column_letter(j)].width = w
-    if freeze:
-        ws.freeze_panes = ws.cell(start_row+1, start_col)
-    ws.sheet_view.showGridLines = show_grid
-    return r-1
-
-def ensure_abs(gl_df):
-    g = gl_df.copy()
-    if "ABS" in g.columns:
-        g["ABS"] = pd.to_numeric(g["ABS"], errors="coerce").fillna(0)
-    else:
-        d = pick(g.columns, ["Debit","Дебет","Дебет дүн"])
-        c = pick(g.columns, ["Credit","Кредит","Кредит дүн"])
-        g["ABS"] = pd.to_numeric(g[d], errors="coerce").fillna(0).abs() + \
-                   pd.to_numeric(g[c], errors="coerce").fillna(0).abs()
-    return g
-
-# ---------- load raw ----------
-xls = pd.ExcelFile(SRC_PATH)
-TB  = pd.read_excel(SRC_PATH, sheet_name=TB_SHEET) if TB_SHEET in xls.sheet_names else pd.DataFrame()
-GL  = pd.read_excel(SRC_PATH, sheet_name=GL_SHEET) if GL_SHEET in xls.sheet_names else pd.DataFrame()
-MAT_RAW = pd.read_excel(SRC_PATH, sheet_name=MAT_SHEET) if MAT_SHEET in xls.sheet_names else pd.DataFrame()
-
-# ---------- 1) Reconciliation ----------
-def build_reconciliation(TB, GL):
-    if TB.empty or GL.empty: return pd.DataFrame()
-    acc_tb = pick(TB.columns, ["Account No","Account number","Данс","Данс код"])
-    c2023  = pick(TB.columns, ["2023", 2023])
-    c2024  = pick(TB.columns, ["2024", 2024])
-
-    tb = TB.copy()
-    tb[acc_tb] = tb[acc_tb].astype(str).str.strip()
-    tb[c2023]  = pd.to_numeric(tb[c2023], errors="coerce").fillna(0)
-    tb[c2024]  = pd.to_numeric(tb[c2024], errors="coerce").fillna(0)
-    tb_grp = (tb.groupby(acc_tb, as_index=False)
-                .agg(Opening_TB=(c2023,"sum"), Ending_TB=(c2024,"sum")))
-
-    first_digit = tb_grp[acc_tb].str[0]
-    tb_grp["Movement_TB1"] = tb_grp["Ending_TB"].where(
-        first_digit.isin(list("56789")),
-        tb_grp["Ending_TB"] - tb_grp["Opening_TB"]
-    )
-
-    gl = GL.copy()
-    acc_gl = pick(gl.columns, ["Account number","Данс"])
-    txn    = pick(gl.columns, ["Transaction","Currency amount","Amount","Гүйлгээ","Дүн"])
-    if txn is None:
-        d = pick(gl.columns, ["Debit","Дебет","Дебет дүн"])
-        c = pick(gl.columns, ["Credit","Кредит","Кредит дүн"])
-        gl["__Transaction"] = pd.to_numeric(gl[d], errors="coerce").fillna(0) - \
-                              pd.to_numeric(gl[c], errors="coerce").fillna(0)
-        txn = "__Transaction"
-
-    gl[acc_gl] = gl[acc_gl].astype(str).str.strip()
-    gl[txn]    = pd.to_numeric(gl[txn], errors="coerce").fillna(0)
-    gl_grp = (gl.groupby(acc_gl, as_index=False)
-                .agg(Movement_GL=(txn,"sum"))
-                .rename(columns={acc_gl: acc_tb}))
-
-    df = (tb_grp.merge(gl_grp, how="left", on=acc_tb).fillna({"Movement_GL":0.0}))
-    df["Difference Rounded"] = (df["Movement_TB1"] - df["Movement_GL"]).round(1)
-
-    out = df.rename(columns={
-        acc_tb: "Account No",
-        "Opening_TB": "Opening Balance per TB",
-        "Ending_TB": "Ending balance per TB (Total Correct)",
-        "Movement_TB1": "Movement per TB 1",
-        "Movement_GL": "Movement per GL"
-    })
-    total = {
-        "Account No": "Total",
-        "Opening Balance per TB": out["Opening Balance per TB"].sum(),
-        "Ending balance per TB (Total Correct)": out["Ending balance per TB (Total Correct)"].sum(),
-        "Movement per TB 1": out["Movement per TB 1"].sum(),
-        "Movement per GL": out["Movement per GL"].sum(),
-        "Difference Rounded": out["Difference Rounded"].sum()
-    }
-    return pd.concat([out, pd.DataFrame([total])], ignore_index=True)
-
-# ---------- 2) Materiality (pretty, account_pivot_one_sheet style) ----------
-def build_materiality(GL, CTT, PM):
-    if GL.empty: return pd.DataFrame()
-    g = ensure_abs(GL)
-
-    intervals_info = [
-        ("< 0", None, None),
-        ("0 - 10% of Threshold",   "CTT", 0.10),
-        ("10% - 20% of Threshold", "CTT", 0.20),
-        ("20% - 30% of Threshold", "CTT", 0.30),
-        ("30% - 40% of Threshold", "CTT", 0.40),
-        ("40% - 50% of Threshold", "CTT", 0.50),
-        ("50% - 60% of Threshold", "CTT", 0.60),
-        ("60% - 70% of Threshold", "CTT", 0.70),
-        ("70% - 80% of Threshold", "CTT", 0.80),
-        ("80% - 90% of Threshold", "CTT", 0.90),
-        ("90% of Threshold - Threshold", "CTT", 1.00),
-        ("Threshold - 10% of PM",  "PM",  0.10),
-        ("10% - 20% of PM",        "PM",  0.20),
-        ("20% - 30% of PM",        "PM",  0.30),
-        ("30% - 40% of PM",        "PM",  0.40),
-        ("40% - 50% of PM",        "PM",  0.50),
-        ("50% - 60% of PM",        "PM",  0.60),
-        ("60% - 70% of PM",        "PM",  0.70),
-        ("70% - 80% of PM",        "PM",  0.80),
-        ("80% - 90% of PM",        "PM",  0.90),
-        ("90% - 100% of PM",       "PM",  1.00),
-        ("> 100% of PM",           "PM",  1.00)
-    ]
-
-    # interval numeric ranges (right edge values)
-    interval_edges = []
-    for _, ttype, pct in intervals_info:
-        if ttype == "CTT":
-            interval_edges.append(CTT * pct)
-        elif ttype == "PM":
-            interval_edges.append(PM * pct)
-        else:
-            interval_edges.append(None)
-
-    # label for Amount Interval
-    amount_labels = []
-    for i, edge in enumerate(interval_edges):
-        if i == 0:
-            amount_labels.append("<0")
-        else:
-            prev = interval_edges[i-1] or 0
-            curr = edge if edge is not None else prev
-            amount_labels.append(f"{int(prev):,} - {int(curr):,}")
-
-    # counts & totals
-    counts, totals = [], []
-    abs_series = pd.to_numeric(g["ABS"], errors="coerce")
-    for i in range(len(intervals_info)):
-        if i == 0:
-            # exactly 0 (Excel COUNTIF "=" орчуулга)
-            cnt = (abs_series == 0).sum()
-            tot = abs_series[abs_series == 0].sum()
-        elif i == len(intervals_info) - 1:
-            lower = interval_edges[i-1]
-            cnt = (abs_series > lower).sum()
-            tot = abs_series[abs_series > lower].sum()
-        else:
-            lower = interval_edges[i-1] or 0
-            upper = interval_edges[i]   or lower
-            mask = ((abs_series > lower) & (abs_series < upper)) | (abs_series == upper)
-            cnt = mask.sum()
-            tot = abs_series[mask].sum()
-        counts.append(int(cnt))
-        totals.append(float(tot))
-
-    total_count = sum(counts)
-    total_amount = sum(totals)
-    pct_count  = [ (c/total_count*100) if total_count else 0 for c in counts ]
-    pct_amount = [ (t/total_amount*100) if total_amount else 0 for t in totals ]
-
-    df = pd.DataFrame({
-        "Materiality": [x[0] for x in intervals_info],
-        "Amount Interval (in MNT)": amount_labels,
-        "Interval range": interval_edges,
-        "Number of Line Items Involved": counts,
-        "Percentage": [round(x,1) for x in pct_count],
-        "Total Amount (in MNT)": totals,
-        "Amount Percentage": [round(x,1) for x in pct_amount]
-    })
-    # Total row
-    df.loc[len(df)] = ["Total","", "", total_count, 100.0, total_amount, 100.0]
-    return df
-
-# ---------- 3) JE_by_Account (your pivot-one-sheet layout) ----------
-def build_je_by_account_like_pivot(GL):
-    g = ensure_abs(GL)
-    col_accno = next(c for c in g.columns if c.lower() in
-                     ["account number","данс","account number ".lower()])
-    col_accnm = next(c for c in g.columns if c.lower() in
-                     ["account name","дансны нэр","account name ".lower()])
-
-    pivot = (g.groupby([col_accno, col_accnm], as_index=False)
-               .agg(**{"Total Number of Entries": ("ABS","count"),
-                       "Value of transactions": ("ABS","sum")})
-               .rename(columns={col_accno:"Account Number", col_accnm:"Account Name"})
-               .sort_values(["Account Number","Account Name"]).reset_index(drop=True))
-
-    # totals
-    total_entries = int(pivot["Total Number of Entries"].sum())
-    total_value   = float(pivot["Value of transactions"].sum())
-
-    # most / least
-    max_entries = int(pivot["Total Number of Entries"].max())
-    min_entries = int(pivot["Total Number of Entries"].min())
-    most_list  = (pivot[pivot["Total Number of Entries"]==max_entries]
-                  [["Account Name","Value of transactions"]]
-                  .rename(columns={"Value of transactions":"Amount"})
-                  .sort_values("Account Name").reset_index(drop=True))
-    least_list = (pivot[pivot["Total Number of Entries"]==min_entries]
-                  [["Account Name","Value of transactions"]]
-                  .rename(columns={"Value of transactions":"Amount"})
-                  .sort_values("Account Name").reset_index(drop=True))
-    return pivot, total_entries, total_value, max_entries, min_entries, most_list, least_list
-
-# ---------- 4) by month ----------
-def build_by_month(GL):
-    if GL.empty: return pd.DataFrame()
-    g = ensure_abs(GL)
-    dt = pick(g.columns, ["Date","Огноо"])
-    g[dt] = pd.to_datetime(g[dt], errors="coerce"); g = g.dropna(subset=[dt])
-    g["MonthNum"] = g[dt].dt.month; g["Month"] = g["MonthNum"].apply(lambda m: calendar.month_abbr[m])
-    k = (g.groupby(["MonthNum","Month"], as_index=False)
-          .agg(**{"Total Number of Line Items":("ABS","count"),
-                  "Total Amount (in MNT)":("ABS","sum")})
-          .sort_values("MonthNum"))
-    df = k[["Month","Total Number of Line Items","Total Amount (in MNT)"]].reset_index(drop=True)
-    df.loc[len(df)] = ["Total", df["Total Number of Line Items"].sum(), df["Total Amount (in MNT)"].sum()]
-    return df
-
-# ---------- 5) day group ----------
-def build_day_group(GL):
-    if GL.empty: return pd.DataFrame()
-    g = ensure_abs(GL)
-    day = pick(g.columns, ["Day","Өдөр"]); g["DayNum"] = pd.to_numeric(g[day], errors="coerce")
-    def grp(x):
-        if pd.isna(x): return None
-        if 1 <= x <= 3:  return "<= 3 Days before M.E."
-        if 4 <= x < 7:  return "4-7 Days before M.E."
-        if 7 <= x < 14: return "8-14 Days before M.E."
-        if x >= 14:     return "> 14 Days"
-        return None
-    g["Day Group"] = g["DayNum"].apply(grp)
-    df = (g.groupby("Day Group", as_index=False)
-            .agg(**{"Total Number of Line Items":("ABS","count"),
-                    "Total Amount (in MNT)":("ABS","sum")}))
-    total_items = df["Total Number of Line Items"].sum()
-    df["%"] = (df["Total Number of Line Items"]/total_items*100).round(0).astype(int).astype(str)+"%"
-    total = pd.DataFrame({"Day Group":["Total"],
-                          "Total Number of Line Items":[total_items],
-                          "%":["100%"],
-                          "Total Amount (in MNT)":[df["Total Amount (in MNT)"].sum()]})
-    return pd.concat([df,total], ignore_index=True)
-
-# ---------- 6) by user ----------
-def build_by_user(GL):
-    if GL.empty: return pd.DataFrame()
-    g = ensure_abs(GL)
-    user = pick(g.columns, ["User","Бүртгэсэн хэрэглэгч"]); g[user] = g[user].fillna("(blank)")
-    df = (g.groupby(user, as_index=False)
-            .agg(**{"Total Number of Line Items":("ABS","count"),
-                    "Total Amount (in MNT)":("ABS","sum")})
-            .rename(columns={user:"User"})
-            .reset_index(drop=True))
-    tot = pd.DataFrame({"User":["Grand Total"],
-                        "Total Number of Line Items":[df["Total Number of Line Items"].sum()],
-                        "Total Amount (in MNT)":[df["Total Amount (in MNT)"].sum()]})
-    return pd.concat([df,tot], ignore_index=True)
-
-# ---------- 7) day of week ----------
-def build_by_dow(GL):
-    if GL.empty: return pd.DataFrame()
-    g = GL.copy()
-    dt = pick(g.columns, ["Үүсгэсэн огноо","Creation date"])
-    g[dt] = pd.to_datetime(g[dt], errors="coerce"); g = g.dropna(subset=[dt])
-    year = int(g[dt].dt.year.mode()[0]); days = 366 if calendar.isleap(year) else 365
-    g["__wk"] = g[dt].dt.weekday + 1
-    order = [(1,"Monday"),(2,"Tuesday"),(3,"Wednesday"),(4,"Thursday"),(5,"Friday"),(6,"Saturday"),(7,"Sunday")]
-    rows=[]
-    for k,name in order:
-        cnt = int((g["__wk"]==k).sum()); rows.append([name,cnt,days,round(cnt/days,2)])
-    df = pd.DataFrame(rows, columns=["Day","Total Number of Line Items","Days in the year","Average per day"])
-    tot = pd.DataFrame({"Day":["Total"],
-                        "Total Number of Line Items":[df["Total Number of Line Items"].sum()],
-                        "Days in the year":[days],
-                        "Average per day":[round(df["Total Number of Line Items"].sum()/days,0)]})
-    return pd.concat([df,tot], ignore_index=True)
-
-# ---------- 8) net to zero ----------
-def build_net_to_zero(GL):
-    if GL.empty: return pd.DataFrame()
-    gl = GL.copy()
-    acc = pick(gl.columns, ["Account number","Данс"])
-    d   = pick(gl.columns, ["Debit","Дебет","Дебет дүн"])
-    c   = pick(gl.columns, ["Credit","Кредит","Кредит дүн"])
-    gl["__amt"] = pd.to_numeric(gl[d], errors="coerce").fillna(0) - pd.to_numeric(gl[c], errors="coerce").fillna(0)
-    df = (gl.groupby(acc, as_index=False)["__amt"].sum()
-            .rename(columns={acc:"Row Labels","__amt":"Sum of Transaction"}))
-    return df[df["Sum of Transaction"]!=0].sort_values("Row Labels").reset_index(drop=True)
-
-# ---------- build data ----------
-recon            = build_reconciliation(TB, GL)
-materiality_df   = build_materiality(GL, CTT, PM)     # 2-р sheet
-pivot, total_entries, total_value, max_entries, min_entries, most_list, least_list = build_je_by_account_like_pivot(GL)
-by_month         = build_by_month(GL)
-by_day_group     = build_day_group(GL)
-by_user          = build_by_user(GL)
-by_dow           = build_by_dow(GL)
-net_zero         = build_net_to_zero(GL)
-
-# ---------- write excel ----------
-wb = Workbook()
-
-# 1) Reconcilation
-ws = wb.active; ws.title = "Reconcilation"
-write_table(ws, recon,
-            money_cols={"Opening Balance per TB","Ending balance per TB (Total Correct)",
-                        "Movement per TB 1","Movement per GL","Difference Rounded"})
-
-# 2) Materiality (nice format)
-ws = wb.create_sheet("Materiality")
-last_r = write_table(
-    ws, materiality_df,
-    start_row=10, start_col=2,
-    money_cols={"Total Amount (in MNT)"},
-    int_cols={"Number of Line Items Involved"},
-    percent_cols={"Percentage","Amount Percentage"},
-    freeze=True, show_grid=False, title_text="Testing:"  # title style like your pivot
-)
-
-# 3) JE_by_Account (your one-sheet pivot layout)
-ws = wb.create_sheet("JE_by_Account")
-# Title
-ws["B9"] = "Testing:"; ws["B9"].font = Font(bold=True, color="CC0000")
-# Main pivot table
-pivot_cols = ["Account Number","Account Name","Total Number of Entries","Value of transactions"]
-end_r = write_table(ws, pivot[pivot_cols], start_row=10, start_col=2,
-                    money_cols={"Value of transactions"},
-                    int_cols={"Total Number of Entries"})
-# Total row
-tot_r = end_r + 1
-ws.cell(tot_r, 4, "Total").font=BOLD; ws.cell(tot_r, 4).alignment=Alignment(horizontal="right")
-ws.cell(tot_r, 5, total_entries).number_format='0'; ws.cell(tot_r,5).border=BORDER
-ws.cell(tot_r, 6, total_value).number_format='#,##0'; ws.cell(tot_r,6).border=BORDER
-# Comments
-ws.cell(tot_r+2, 2, "Comments:").font=BOLD
-# Summary header
-hdr_r = tot_r + 4
-for j, txt in enumerate(["Number of entries","Number of accounts","Account name","Amount"], start=3):
-    c = ws.cell(hdr_r, j, txt); c.font=BOLD; c.fill=HDR_FILL
-    c.alignment=Alignment(horizontal="center"); c.border=BORDER
-# Most used
-row = hdr_r + 2
-ws.cell(row, 2, "Most used account").font=BOLD
-ws.cell(row, 3, max_entries).number_format='0'; ws.cell(row,3).border=BORDER
-ws.cell(row, 4, len(most_list)).number_format='0'; ws.cell(row,4).border=BORDER
-for i, rec in most_list.iterrows():
-    r = row + i
-    ws.cell(r, 5, rec["Account Name"]).border=BORDER
-    cc = ws.cell(r, 6, float(rec["Amount"])); cc.number_format='#,##0'; cc.border=BORDER
-# Least used
-row = hdr_r + 2 + max(1, len(most_list)) + 3
-ws.cell(row, 2, "Least used accounts").font=BOLD
-ws.cell(row, 3, min_entries).number_format='0'; ws.cell(row,3).border=BORDER
-ws.cell(row, 4, len(least_list)).number_format='0'; ws.cell(row,4).border=BORDER
-for i, rec in least_list.iterrows():
-    r = row + i
-    ws.cell(r, 5, rec["Account Name"]).border=BORDER
-    cc = ws.cell(r, 6, float(rec["Amount"])); cc.number_format='#,##0'; cc.border=BORDER
-ws.freeze_panes = "B11"; ws.sheet_view.showGridLines = False
-
-# 4) JE_by_Month
-ws = wb.create_sheet("JE_by_Month")
-write_table(ws, by_month, money_cols={"Total Amount (in MNT)"},
-            int_cols={"Total Number of Line Items"})
-
-# 5) JE_by_Day_of_Month
-ws = wb.create_sheet("JE_by_Day_of_Month")
-write_table(ws, by_day_group, money_cols={"Total Amount (in MNT)"},
-            int_cols={"Total Number of Line Items"})
-
-# 6) JE Distribution by User
-ws = wb.create_sheet("JE Distribution by User")
-write_table(ws, by_user, money_cols={"Total Amount (in MNT)"},
-            int_cols={"Total Number of Line Items"})
-
-# 7) JE_by_Day_of_Week
-ws = wb.create_sheet("JE_by_Day_of_Week")
-write_table(ws, by_dow, int_cols={"Total Number of Line Items","Days in the year"})
-
-# 8) Net_to_Zero_Test
-ws = wb.create_sheet("Net_to_Zero_Test")
-write_table(ws, net_zero, money_cols={"Sum of Transaction"})
-
-# RAW sheets
-ws = wb.create_sheet("TB");  write_table(ws, TB,  freeze=False, show_grid=True)
-ws = wb.create_sheet("GL");  write_table(ws, GL,  freeze=False, show_grid=True)
-ws = wb.create_sheet("materiality_raw"); write_table(ws, MAT_RAW, freeze=False, show_grid=True)
-
-wb.save(OUT_PATH)
-print(f"Done! Saved -> {Path(OUT_PATH).resolve()}")
+# build_full_report_with_materiality.py
+import calendar
+import datetime as dt
+import io
+import tempfile
+import weakref
+import zipfile
+from types import SimpleNamespace
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Font, Border, Side, PatternFill, NamedStyle
+from openpyxl.styles.fonts import DEFAULT_FONT
+from openpyxl.utils import get_column_letter, column_index_from_string
+from openpyxl.utils.cell import coordinate_from_string
+import chart_of_accounts as coa
+import result_cache
+import results_export
+import stage_timer
+import xlsx_cache
+
+# ========= SETTINGS =========
+SRC_PATH = r"steppe road data.xlsx"      # <-- таны эх файл
+TB_SHEET = "TB"
+GL_SHEET = "GL"
+MAT_SHEET = "Materiality"                # raw sheet байвал төгсгөлд оруулна
+OUT_PATH = r"Full_JE_Report_with_Materiality.xlsx"
+
+# Materiality inputs
+CTT = 135_050_000     # Threshold (CT)
+PM  = 1_620_600_000   # Performance Materiality (PM)
+# ===========================
+
+# ---------- helpers ----------
+def pick(columns, options):
+    norm = {str(c).strip().lower(): c for c in columns}
+    for o in options:
+        k = str(o).strip().lower()
+        if k in norm: return norm[k]
+    return None
+
+THIN = Side(style="thin", color="A0A0A0")
+BORDER = Border(left=THIN, right=THIN, top=THIN, bottom=THIN)
+HDR_FILL = PatternFill("solid", fgColor="F3F4F6")
+BOLD = Font(bold=True)
+
+# Named style-ууд workbook-д нэг удаа бүртгэгдэж, нүд бүр зөвхөн нэрээр нь заана
+def named_styles():
+    return [
+        NamedStyle("jet_header", font=BOLD, fill=HDR_FILL, border=BORDER,
+                   alignment=Alignment(horizontal="center", vertical="center")),
+        NamedStyle("jet_subheader", font=BOLD, fill=HDR_FILL, border=BORDER,
+                   alignment=Alignment(horizontal="center")),
+        NamedStyle("jet_cell", font=DEFAULT_FONT, border=BORDER),
+        NamedStyle("jet_money", font=DEFAULT_FONT, border=BORDER, number_format='#,##0'),
+        NamedStyle("jet_int", font=DEFAULT_FONT, border=BORDER, number_format='0'),
+        NamedStyle("jet_percent", font=DEFAULT_FONT, border=BORDER, number_format='0.0"%"'),
+        NamedStyle("jet_bold", font=BOLD),
+        NamedStyle("jet_total", font=BOLD, alignment=Alignment(horizontal="right")),
+        NamedStyle("jet_title", font=Font(bold=True, color="CC0000")),
+    ]
+
+ROW_BLOCK = 100_000  # өргөн тооцох, мөр бичих нэг блокийн мөрийн тоо
+
+# Огноо/цаг утга нүдэнд орохдоо openpyxl-ийн автоматаар өгдөг number format-ууд
+DATE_PROBES = [dt.datetime(2000, 1, 1), dt.date(2000, 1, 1), dt.time(), dt.timedelta()]
+
+def new_workbook():
+    """Write-only workbook: every sheet is streamed top to bottom.
+
+    Every cell style a sheet can use (named style, alone or with a date format)
+    is registered up front in a fixed order, so a sheet's XML does not depend on
+    which sheets were written before it and can be reused from the cache.
+    """
+    wb = Workbook(write_only=True)
+    probe = SimpleNamespace(parent=wb)
+    for st in named_styles():
+        wb.add_named_style(st)
+        for v in [None] + DATE_PROBES:
+            c = WriteOnlyCell(probe)
+            c.style = st.name
+            c.value = v
+            c.style_id  # бүртгэнэ
+    return wb
+
+def _cell(ws, value, style):
+    # style эхэлж: огноо утга named style-ийн дээр огнооны format авна (ws.cell шиг)
+    c = WriteOnlyCell(ws)
+    c.style = style
+    c.value = value
+    return c
+
+def emit_rows(ws, rows: dict, next_row: int) -> int:
+    """Append ``{row: {col: cell}}`` in row order starting at ``next_row``; returns the next free row."""
+    stage_timer.add_cells(sum(len(cells) for cells in rows.values()), len(rows))
+    for r in sorted(rows):
+        while next_row < r:
+            ws.append([]); next_row += 1
+        cells = rows[r]
+        ws.append([cells.get(c) for c in range(1, max(cells)+1)])
+        next_row += 1
+    return next_row
+
+def text_width(s: pd.Series) -> int:
+    """``max(len(str(x)) for x in s)`` without calling str() on numeric/date columns."""
+    if s.empty:
+        return 0
+    kind = s.dtype.kind if isinstance(s.dtype, np.dtype) else None
+    if kind in ("i", "u"):
+        return max(len(str(s.min())), len(str(s.max())))
+    if kind == "b":
+        return 5 if not s.all() else 4
+    if kind == "f":
+        a = s.to_numpy()
+        return max(int(np.char.str_len(a[i:i+ROW_BLOCK].astype(str)).max()) for i in range(0, len(a), ROW_BLOCK))
+    if kind == "M":
+        ns = s.dropna().to_numpy().astype("datetime64[ns]").astype(np.int64)
+        if len(ns) == 0:
+            return 3  # "NaT"
+        return 29 if (ns % 1000).any() else 26 if (ns % 10**9).any() else 19
+    if pd.api.types.infer_dtype(s, skipna=True) in ("string", "empty"):
+        n = s.str.len()
+        na = n.isna()
+        # хоосон нүд: str(None)="None", str(nan)="nan"
+        w_na = max(map(len, map(str, set(s[na].tolist())))) if na.any() else 0
+        return int(max(n.max() if not na.all() else 0, w_na))
+    return max(map(len, map(str, s.tolist())))
+
+def _body_style(col, money_cols, int_cols, percent_cols):
+    if col in percent_cols: return "jet_percent"
+    if col in int_cols:     return "jet_int"
+    if col in money_cols:   return "jet_money"
+    return "jet_cell"
+
+def write_table(ws, df, start_row=1, start_col=1,
+                money_cols=None, int_cols=None, percent_cols=None,
+                freeze=True, show_grid=False, title_text=None, title_cell="B9"):
+    """Stream ``df`` (header + body) into a fresh write-only sheet; returns the last row written.
+
+    Widths, panes and the optional title (above ``start_row``) go first, since a
+    write-only sheet cannot be revisited; callers may append rows below it.
+    """
+    money_cols   = set(money_cols   or [])
+    int_cols     = set(int_cols     or [])
+    percent_cols = set(percent_cols or [])
+    # autosize (багана бүрээр, мөр бичихээс өмнө)
+    for j, col in enumerate(df.columns, start=start_col):
+        w = min(max(12, max(len(str(col)), text_width(df.iloc[:, j-start_col])) + 2), 60)
+        ws.column_dimensions[get_column_letter(j)].width = w
+    if freeze:
+        ws.freeze_panes = f"{get_column_letter(start_col)}{start_row+1}"
+    ws.sheet_view.showGridLines = show_grid
+
+    # optional title (like “Testing:”)
+    pre = {}
+    if title_text:
+        col, row = coordinate_from_string(title_cell)
+        pre[row] = {column_index_from_string(col): _cell(ws, title_text, "jet_title")}
+    next_row = emit_rows(ws, pre, 1)
+    while next_row < start_row:
+        ws.append([]); next_row += 1
+
+    lead = [None] * (start_col - 1)
+    stage_timer.add_cells((len(df) + 1) * df.shape[1], len(df))
+    # header
+    ws.append(lead + [_cell(ws, col, "jet_header") for col in df.columns])
+    # body – баганын загвар нүдийг мөр бүрт дахин ашиглана (append нь шууд бичдэг).
+    # Огноо оноох нь нүдний number_format-ийг өөрчилдөг тул огноо бусад утгатай
+    # холилдсон баганад нүд бүрийг шинээр үүсгэнэ.
+    styles = [_body_style(col, money_cols, int_cols, percent_cols) for col in df.columns]
+    reuse = [_uniform_format(df.iloc[:, k]) for k in range(df.shape[1])]
+    tmpl = [_cell(ws, None, st) for st in styles]
+    for a in range(0, len(df), ROW_BLOCK):
+        block = df.iloc[a:a+ROW_BLOCK]
+        for row in zip(*(block.iloc[:, k].tolist() for k in range(block.shape[1]))):
+            cells = lead[:]
+            for k, (c, v) in enumerate(zip(tmpl, row)):
+                if reuse[k]:
+                    c.value = v
+                else:
+                    c = _cell(ws, v, styles[k])
+                cells.append(c)
+            ws.append(cells)
+    return start_row + len(df)
+
+def _uniform_format(s: pd.Series) -> bool:
+    """True when assigning any value of ``s`` leaves a cell's number format as the
+    first one did (no dates, or dates only), so one template cell can be reused."""
+    kind = s.dtype.kind if isinstance(s.dtype, np.dtype) else None
+    if kind in ("i", "u", "f", "b"):
+        return True
+    if kind == "M":
+        return bool(s.notna().all())
+    return pd.api.types.infer_dtype(s, skipna=True) in ("string", "empty")
+
+# ---------- prepared GL ----------
+DAY_GROUPS = ["<= 3 Days before M.E.", "4-7 Days before M.E.", "8-14 Days before M.E.", "> 14 Days"]
+
+def day_group(day: pd.Series) -> np.ndarray:
+    """Day-of-month bucket per row (None outside every bucket or blank)."""
+    x = day.to_numpy(dtype=float, na_value=np.nan)
+    return np.select([(1 <= x) & (x <= 3), (4 <= x) & (x < 7), (7 <= x) & (x < 14), x >= 14],
+                     DAY_GROUPS, default=None)
+
+# prepare_gl-ийн уншдаг түүхий баганууд (pick-ийн сонголтууд)
+SOURCES = {
+    "debit":   ["Debit","Дебет","Дебет дүн"],
+    "credit":  ["Credit","Кредит","Кредит дүн"],
+    "abs":     ["ABS"],
+    "acc":     ["Account number","Данс"],
+    "date":    ["Date","Огноо"],
+    "day":     ["Day","Өдөр"],
+    "user":    ["User","Бүртгэсэн хэрэглэгч"],
+    "created": ["Үүсгэсэн огноо","Creation date"],
+    "txn":     ["Transaction","Currency amount","Amount","Гүйлгээ","Дүн"],   # reconciliation
+}
+
+def _first_named(columns, names):
+    """First column (in column order) whose lower-cased name is in ``names``."""
+    return next((c for c in columns if str(c).lower() in names), None)
+
+def prepare_gl(GL):
+    """Narrow frame with every per-row value the statistical builders group by.
+
+    Raw columns are referenced, not copied; only the derived ones (ABS, dates,
+    month, day group, weekday, user, net amount) are new arrays. A column whose
+    source is missing in GL is left out.
+    """
+    cols = {}
+    d = pick(GL.columns, SOURCES["debit"])
+    c = pick(GL.columns, SOURCES["credit"])
+    debit  = pd.to_numeric(GL[d], errors="coerce").fillna(0) if d is not None else None
+    credit = pd.to_numeric(GL[c], errors="coerce").fillna(0) if c is not None else None
+    if "ABS" in GL.columns:
+        cols["ABS"] = pd.to_numeric(GL["ABS"], errors="coerce").fillna(0)
+    elif debit is not None and credit is not None:
+        cols["ABS"] = debit.abs() + credit.abs()
+    if debit is not None and credit is not None:
+        cols["NetAmt"] = debit - credit
+    acc = pick(GL.columns, SOURCES["acc"])
+    if acc is not None: cols["Acc"] = GL[acc]
+    # JE_by_Account: эхний таарсан багана (баганын дарааллаар)
+    accno = _first_named(GL.columns, ["account number","данс"])
+    accnm = _first_named(GL.columns, ["account name","дансны нэр"])
+    if accno is not None: cols["AccNo"] = GL[accno]
+    if accnm is not None: cols["AccName"] = GL[accnm]
+    dt = pick(GL.columns, SOURCES["date"])
+    if dt is not None: cols["MonthNum"] = pd.to_datetime(GL[dt], errors="coerce").dt.month
+    day = pick(GL.columns, SOURCES["day"])
+    if day is not None: cols["DayGroup"] = day_group(pd.to_numeric(GL[day], errors="coerce"))
+    user = pick(GL.columns, SOURCES["user"])
+    if user is not None: cols["User"] = GL[user].fillna("(blank)")
+    created = pick(GL.columns, SOURCES["created"])
+    if created is not None:
+        created = pd.to_datetime(GL[created], errors="coerce")
+        cols["Year"] = created.dt.year
+        cols["Weekday"] = created.dt.weekday + 1
+    return pd.DataFrame(cols, index=GL.index, copy=False)
+
+_GL_MEMO = {}  # id(GL) -> (weakref, {key: value})
+
+def gl_memo(GL) -> dict:
+    """Scratch dict tied to GL's lifetime: prepared frame, aggregates, partial settings."""
+    key = id(GL)
+    ent = _GL_MEMO.get(key)
+    if ent is None or ent[0]() is not GL:
+        ent = _GL_MEMO[key] = (weakref.ref(GL, lambda _, k=key: _GL_MEMO.pop(k, None)), {})
+    return ent[1]
+
+def prepared(GL):
+    """prepare_gl(GL), computed once per GL object for all builders."""
+    memo = gl_memo(GL)
+    if "prepared" not in memo:
+        memo["prepared"] = prepare_gl(GL)
+    return memo["prepared"]
+
+# ---------- aggregates ----------
+# Builder бүр GL-ийн мөрөөс биш, эдгээр жижиг count/sum хүснэгтээс уншина.
+# Хүснэгт бүр нэмэгддэг (additive) тул сар бүрээр тооцоод нийлүүлж болно.
+def _count_sum(keys: dict, value: pd.Series) -> pd.DataFrame:
+    """``n`` (count) and ``s`` (sum) of ``value`` per key combination; NaN keys drop out."""
+    df = pd.DataFrame({**keys, "__v": value}, copy=False)
+    return df.groupby(list(keys), as_index=False).agg(n=("__v","count"), s=("__v","sum"))
+
+def _by(*keys, value="ABS"):
+    def agg(GL):
+        g = prepared(GL)
+        return _count_sum({k: g[k] for k in keys}, g[value])
+    return agg
+
+def _recon_agg(GL):
+    acc_gl = pick(GL.columns, SOURCES["acc"])
+    txn    = pick(GL.columns, SOURCES["txn"])
+    amount = prepared(GL)["NetAmt"] if txn is None else pd.to_numeric(GL[txn], errors="coerce").fillna(0)
+    return _count_sum({"acc": GL[acc_gl].astype(str).str.strip()}, amount)
+
+def _materiality_agg(GL, lowers, uppers):
+    stats = band_stats(prepared(GL)["ABS"], lowers, uppers)
+    return pd.DataFrame({"band": range(len(stats)), "n": [c for c, _ in stats], "s": [t for _, t in stats]})
+
+AGGREGATES = {
+    "account":     _by("AccNo", "AccName"),
+    "month":       _by("MonthNum"),
+    "day":         _by("DayGroup"),
+    "user":        _by("User"),
+    "weekday":     _by("Weekday", value="Weekday"),
+    "year":        _by("Year", value="Year"),
+    "net":         _by("Acc", value="NetAmt"),
+    "recon":       _recon_agg,
+    "materiality": _materiality_agg,
+}
+
+def merge_aggregates(parts: list) -> pd.DataFrame:
+    """Sum partial AGGREGATES frames (e.g. one per month) into one."""
+    df = pd.concat(parts, ignore_index=True)
+    keys = [c for c in df.columns if c not in ("n", "s")]
+    return df.groupby(keys, as_index=False)[["n", "s"]].sum()
+
+def aggregate(GL, name: str, *args) -> pd.DataFrame:
+    """AGGREGATES[name] over GL, once per GL; from month partials after use_partials()."""
+    memo = gl_memo(GL)
+    key = ("agg", name, args)
+    if key not in memo:
+        client = memo.get("client")
+        memo[key] = AGGREGATES[name](GL, *args) if client is None else _monthly_aggregate(GL, client, name, args)
+    return memo[key]
+
+# ---------- incremental re-run (month partials) ----------
+def use_partials(GL, client: str) -> None:
+    """Aggregate GL month by month, reusing partials cached for ``client``.
+
+    A month whose source rows hash the same as in an earlier run of the same
+    client is read back from the cache; only new or changed months are computed.
+    """
+    gl_memo(GL)["client"] = client
+
+def _source_columns(GL) -> list:
+    used = {pick(GL.columns, names) for names in SOURCES.values()}
+    used |= {_first_named(GL.columns, ["account number","данс"]), _first_named(GL.columns, ["account name","дансны нэр"])}
+    return [c for c in GL.columns if c in used]
+
+def _months(GL) -> list:
+    """[(period "YYYY-MM", content hash, month's source rows)] by posting month."""
+    memo = gl_memo(GL)
+    if "months" not in memo:
+        dt = pick(GL.columns, SOURCES["date"])
+        if dt is None:
+            ym = np.zeros(len(GL), dtype=np.int64)
+        else:
+            d = pd.to_datetime(GL[dt], errors="coerce")
+            ym = (d.dt.year * 100 + d.dt.month).fillna(0).to_numpy(dtype=np.int64)
+        codes, labels = pd.factorize(ym, sort=True)
+        src = GL[_source_columns(GL)]
+        if len(codes) and (np.diff(codes) < 0).any():
+            order = np.argsort(codes, kind="stable")  # огноогоор эрэмбэлээгүй GL: нэг take
+            src, codes = src.take(order), codes[order]
+        bounds = np.searchsorted(codes, np.arange(len(labels) + 1))
+        memo["months"] = []
+        for i, ym_i in enumerate(labels):
+            rows = src.iloc[bounds[i]:bounds[i + 1]]
+            period = f"{ym_i // 100}-{ym_i % 100:02d}" if ym_i else "none"
+            memo["months"].append((period, xlsx_cache.frame_hash(rows), rows))
+    return memo["months"]
+
+def _monthly_aggregate(GL, client: str, name: str, args: tuple) -> pd.DataFrame:
+    key = "partials-" + xlsx_cache.content_hash(client.encode("utf-8"))[:16]
+    sig = name + (":" + xlsx_cache.content_hash(repr(args).encode("utf-8"))[:12] if args else "")
+    parts, want, periods = [], set(), set()
+    for period, h, rows in _months(GL):
+        fname = f"{sig}|{period}|{h[:32]}"
+        want.add(fname); periods.add(period)
+        part = xlsx_cache.get_frame(key, fname)
+        if part is None:
+            part = AGGREGATES[name](rows, *args)
+            xlsx_cache.put_frame(key, fname, part)
+        parts.append(part)
+    # тухайн сарын хуучин хувилбарыг устгана (бусад сар/жилийг үлдээнэ)
+    stale = [n for n in xlsx_cache.frame_names(key)
+             if n.startswith(sig + "|") and n.split("|")[1] in periods and n not in want]
+    xlsx_cache.drop_frames(key, stale)
+    return merge_aggregates(parts)
+
+# ---------- load raw ----------
+def load_frames(src_path, tb_sheet=TB_SHEET, gl_sheet=GL_SHEET, mat_sheet=MAT_SHEET):
+    """(TB, GL, MAT_RAW) from one workbook; a missing sheet comes back empty."""
+    frames = xlsx_cache.read_sheets(src_path, [tb_sheet, gl_sheet, mat_sheet])
+    return frames[tb_sheet], frames[gl_sheet], frames[mat_sheet]
+
+# ---------- 1) Reconciliation ----------
+@stage_timer.timed
+def build_reconciliation(TB, GL, chart=None):
+    if TB.empty or GL.empty: return pd.DataFrame()
+    acc_tb = pick(TB.columns, ["Account No","Account number","Данс","Данс код"])
+    c2023  = pick(TB.columns, ["2023", 2023])
+    c2024  = pick(TB.columns, ["2024", 2024])
+
+    tb = TB.copy()
+    tb[acc_tb] = tb[acc_tb].astype(str).str.strip()
+    tb[c2023]  = pd.to_numeric(tb[c2023], errors="coerce").fillna(0)
+    tb[c2024]  = pd.to_numeric(tb[c2024], errors="coerce").fillna(0)
+    tb_grp = (tb.groupby(acc_tb, as_index=False)
+                .agg(Opening_TB=(c2023,"sum"), Ending_TB=(c2024,"sum")))
+
+    # орлого/зардлын данс (chart-ийн "PL") – movement нь эцсийн үлдэгдэл
+    statement = coa.classify(coa.account_key(tb_grp[acc_tb]), chart, "statement")
+    tb_grp["Movement_TB1"] = tb_grp["Ending_TB"].where(
+        (statement == "PL").to_numpy(),
+        tb_grp["Ending_TB"] - tb_grp["Opening_TB"]
+    )
+
+    gl_grp = aggregate(GL, "recon")[["acc","s"]].rename(columns={"acc": acc_tb, "s": "Movement_GL"})
+
+    df = (tb_grp.merge(gl_grp, how="left", on=acc_tb).fillna({"Movement_GL":0.0}))
+    df["Difference Rounded"] = (df["Movement_TB1"] - df["Movement_GL"]).round(1)
+
+    out = df.rename(columns={
+        acc_tb: "Account No",
+        "Opening_TB": "Opening Balance per TB",
+        "Ending_TB": "Ending balance per TB (Total Correct)",
+        "Movement_TB1": "Movement per TB 1",
+        "Movement_GL": "Movement per GL"
+    })
+    total = {
+        "Account No": "Total",
+        "Opening Balance per TB": out["Opening Balance per TB"].sum(),
+        "Ending balance per TB (Total Correct)": out["Ending balance per TB (Total Correct)"].sum(),
+        "Movement per TB 1": out["Movement per TB 1"].sum(),
+        "Movement per GL": out["Movement per GL"].sum(),
+        "Difference Rounded": out["Difference Rounded"].sum()
+    }
+    return pd.concat([out, pd.DataFrame([total])], ignore_index=True)
+
+# ---------- 2) Materiality (pretty, account_pivot_one_sheet style) ----------
+# (label, суурь, хувь): эхний мөр – яг 0 дүнтэй мөрүүд, сүүлийн мөр – өмнөх
+# хязгаараас их; бусад нь (өмнөх хязгаар, суурь*хувь] (дээд хязгаар орно)
+MATERIALITY_BANDS = [
+    ("< 0", None, None),
+    ("0 - 10% of Threshold",   "CTT", 0.10),
+    ("10% - 20% of Threshold", "CTT", 0.20),
+    ("20% - 30% of Threshold", "CTT", 0.30),
+    ("30% - 40% of Threshold", "CTT", 0.40),
+    ("40% - 50% of Threshold", "CTT", 0.50),
+    ("50% - 60% of Threshold", "CTT", 0.60),
+    ("60% - 70% of Threshold", "CTT", 0.70),
+    ("70% - 80% of Threshold", "CTT", 0.80),
+    ("80% - 90% of Threshold", "CTT", 0.90),
+    ("90% of Threshold - Threshold", "CTT", 1.00),
+    ("Threshold - 10% of PM",  "PM",  0.10),
+    ("10% - 20% of PM",        "PM",  0.20),
+    ("20% - 30% of PM",        "PM",  0.30),
+    ("30% - 40% of PM",        "PM",  0.40),
+    ("40% - 50% of PM",        "PM",  0.50),
+    ("50% - 60% of PM",        "PM",  0.60),
+    ("60% - 70% of PM",        "PM",  0.70),
+    ("70% - 80% of PM",        "PM",  0.80),
+    ("80% - 90% of PM",        "PM",  0.90),
+    ("90% - 100% of PM",       "PM",  1.00),
+    ("> 100% of PM",           "PM",  1.00)
+]
+
+def band_stats(values, lowers, uppers):
+    """(count, sum) per band, where band i is ``lowers[i] < x < uppers[i] or x == uppers[i]``.
+
+    ``lowers[i] is None`` means ``x == uppers[i]`` only and ``uppers[i] is None`` means
+    ``x > lowers[i]``. Edges may repeat or overlap; every value is binned once
+    against the distinct edges and the bands are read off the bins.
+    """
+    x = pd.Series(values).dropna().to_numpy()
+    edges = np.unique([e for e in list(lowers) + list(uppers) if e is not None])
+    j = np.searchsorted(edges, x, side="left")
+    on_edge = (j < len(edges)) & (edges[np.minimum(j, len(edges) - 1)] == x)
+    # bin 2j – (edges[j-1], edges[j]) нээлттэй завсар, 2j+1 – яг edges[j]
+    cells = 2 * j + on_edge
+    grp = pd.Series(x).groupby(cells).agg(["size", "sum"]).reindex(range(2 * len(edges) + 1), fill_value=0)
+    size, total = grp["size"].to_numpy(), grp["sum"].to_numpy()
+
+    out = []
+    for lo, up in zip(lowers, uppers):
+        if up is None:                                   # x > lo
+            k = slice(2 * int(np.searchsorted(edges, lo)) + 2, None)
+            out.append((int(size[k].sum()), total[k].sum()))
+            continue
+        ju = int(np.searchsorted(edges, up))
+        cnt, tot = size[2 * ju + 1], total[2 * ju + 1]   # x == up
+        if lo is not None and lo < up:                   # lo < x < up
+            k = slice(2 * int(np.searchsorted(edges, lo)) + 2, 2 * ju + 1)
+            cnt, tot = cnt + size[k].sum(), tot + total[k].sum()
+        out.append((int(cnt), tot))
+    return out
+
+@stage_timer.timed
+def build_materiality(GL, CTT, PM, bands=None):
+    """Line-item counts and amounts of ABS per materiality band (MATERIALITY_BANDS by default)."""
+    if GL.empty: return pd.DataFrame()
+    intervals_info = MATERIALITY_BANDS if bands is None else bands
+
+    # interval numeric ranges (right edge values)
+    base = {"CTT": CTT, "PM": PM}
+    interval_edges = [base[t] * pct if t in base else None for _, t, pct in intervals_info]
+
+    # label for Amount Interval
+    amount_labels = []
+    for i, edge in enumerate(interval_edges):
+        if i == 0:
+            amount_labels.append("<0")
+        else:
+            prev = interval_edges[i-1] or 0
+            curr = edge if edge is not None else prev
+            amount_labels.append(f"{int(prev):,} - {int(curr):,}")
+
+    # counts & totals – нэг binning: эхний band нь яг 0 (Excel COUNTIF "="),
+    # сүүлийнх нь өмнөх хязгаараас их, бусад нь (өмнөх, дээд]
+    last = len(intervals_info) - 1
+    lowers = [None] + [interval_edges[i-1] or 0 for i in range(1, last + 1)]
+    uppers = [0] + [None if i == last else (interval_edges[i] or lowers[i]) for i in range(1, last + 1)]
+    stats = aggregate(GL, "materiality", tuple(lowers), tuple(uppers))
+    counts = [int(c) for c in stats["n"]]
+    totals = [float(t) for t in stats["s"]]
+
+    total_count = sum(counts)
+    total_amount = sum(totals)
+    pct_count  = [ (c/total_count*100) if total_count else 0 for c in counts ]
+    pct_amount = [ (t/total_amount*100) if total_amount else 0 for t in totals ]
+
+    df = pd.DataFrame({
+        "Materiality": [x[0] for x in intervals_info],
+        "Amount Interval (in MNT)": amount_labels,
+        "Interval range": interval_edges,
+        "Number of Line Items Involved": counts,
+        "Percentage": [round(x,1) for x in pct_count],
+        "Total Amount (in MNT)": totals,
+        "Amount Percentage": [round(x,1) for x in pct_amount]
+    })
+    # Total row
+    df.loc[len(df)] = ["Total","", "", total_count, 100.0, total_amount, 100.0]
+    return df
+
+# ---------- 3) JE_by_Account (your pivot-one-sheet layout) ----------
+@stage_timer.timed
+def build_je_by_account_like_pivot(GL):
+    pivot = (aggregate(GL, "account")
+               .rename(columns={"AccNo":"Account Number", "AccName":"Account Name",
+                                "n":"Total Number of Entries", "s":"Value of transactions"})
+               .sort_values(["Account Number","Account Name"]).reset_index(drop=True))
+
+    # totals
+    total_entries = int(pivot["Total Number of Entries"].sum())
+    total_value   = float(pivot["Value of transactions"].sum())
+
+    # most / least
+    max_entries = int(pivot["Total Number of Entries"].max())
+    min_entries = int(pivot["Total Number of Entries"].min())
+    most_list  = (pivot[pivot["Total Number of Entries"]==max_entries]
+                  [["Account Name","Value of transactions"]]
+                  .rename(columns={"Value of transactions":"Amount"})
+                  .sort_values("Account Name").reset_index(drop=True))
+    least_list = (pivot[pivot["Total Number of Entries"]==min_entries]
+                  [["Account Name","Value of transactions"]]
+                  .rename(columns={"Value of transactions":"Amount"})
+                  .sort_values("Account Name").reset_index(drop=True))
+    return pivot, total_entries, total_value, max_entries, min_entries, most_list, least_list
+
+# ---------- 4) by month ----------
+@stage_timer.timed
+def build_by_month(GL):
+    if GL.empty: return pd.DataFrame()
+    k = aggregate(GL, "month").rename(columns={"n":"Total Number of Line Items", "s":"Total Amount (in MNT)"})
+    k.insert(0, "Month", [calendar.month_abbr[int(m)] for m in k["MonthNum"]])
+    df = k[["Month","Total Number of Line Items","Total Amount (in MNT)"]].reset_index(drop=True)
+    df.loc[len(df)] = ["Total", df["Total Number of Line Items"].sum(), df["Total Amount (in MNT)"].sum()]
+    return df
+
+# ---------- 5) day group ----------
+@stage_timer.timed
+def build_day_group(GL):
+    if GL.empty: return pd.DataFrame()
+    df = aggregate(GL, "day").rename(columns={"DayGroup":"Day Group", "n":"Total Number of Line Items",
+                                              "s":"Total Amount (in MNT)"})
+    total_items = df["Total Number of Line Items"].sum()
+    df["%"] = (df["Total Number of Line Items"]/total_items*100).round(0).astype(int).astype(str)+"%"
+    total = pd.DataFrame({"Day Group":["Total"],
+                          "Total Number of Line Items":[total_items],
+                          "%":["100%"],
+                          "Total Amount (in MNT)":[df["Total Amount (in MNT)"].sum()]})
+    return pd.concat([df,total], ignore_index=True)
+
+# ---------- 6) by user ----------
+@stage_timer.timed
+def build_by_user(GL):
+    if GL.empty: return pd.DataFrame()
+    df = aggregate(GL, "user").rename(columns={"n":"Total Number of Line Items", "s":"Total Amount (in MNT)"})
+    tot = pd.DataFrame({"User":["Grand Total"],
+                        "Total Number of Line Items":[df["Total Number of Line Items"].sum()],
+                        "Total Amount (in MNT)":[df["Total Amount (in MNT)"].sum()]})
+    return pd.concat([df,tot], ignore_index=True)
+
+# ---------- 7) day of week ----------
+@stage_timer.timed
+def build_by_dow(GL):
+    if GL.empty: return pd.DataFrame()
+    years = aggregate(GL, "year")  # mode: хамгийн олон мөртэй (тэнцвэл бага) он
+    year = int(years["Year"][years["n"].idxmax()]); days = 366 if calendar.isleap(year) else 365
+    wk = aggregate(GL, "weekday")
+    counts = dict(zip(wk["Weekday"].astype(int), wk["n"]))
+    order = [(1,"Monday"),(2,"Tuesday"),(3,"Wednesday"),(4,"Thursday"),(5,"Friday"),(6,"Saturday"),(7,"Sunday")]
+    rows=[]
+    for k,name in order:
+        cnt = int(counts.get(k, 0)); rows.append([name,cnt,days,round(cnt/days,2)])
+    df = pd.DataFrame(rows, columns=["Day","Total Number of Line Items","Days in the year","Average per day"])
+    tot = pd.DataFrame({"Day":["Total"],
+                        "Total Number of Line Items":[df["Total Number of Line Items"].sum()],
+                        "Days in the year":[days],
+                        "Average per day":[round(df["Total Number of Line Items"].sum()/days,0)]})
+    return pd.concat([df,tot], ignore_index=True)
+
+# ---------- 8) net to zero ----------
+@stage_timer.timed
+def build_net_to_zero(GL):
+    if GL.empty: return pd.DataFrame()
+    df = aggregate(GL, "net")[["Acc","s"]].rename(columns={"Acc":"Row Labels","s":"Sum of Transaction"})
+    return df[df["Sum of Transaction"]!=0].sort_values("Row Labels").reset_index(drop=True)
+
+# ---------- JE_by_Account sheet ----------
+def write_je_by_account(ws, pivot, total_entries, total_value, max_entries, min_entries, most_list, least_list):
+    # Title + main pivot table
+    pivot_cols = ["Account Number","Account Name","Total Number of Entries","Value of transactions"]
+    end_r = write_table(ws, pivot[pivot_cols], start_row=10, start_col=2,
+                        money_cols={"Value of transactions"},
+                        int_cols={"Total Number of Entries"}, title_text="Testing:")
+    rows = {}
+    def put(r, c, v, style): rows.setdefault(r, {})[c] = _cell(ws, v, style)
+    # Total row
+    tot_r = end_r + 1
+    put(tot_r, 4, "Total", "jet_total")
+    put(tot_r, 5, total_entries, "jet_int")
+    put(tot_r, 6, total_value, "jet_money")
+    # Comments
+    put(tot_r+2, 2, "Comments:", "jet_bold")
+    # Summary header
+    hdr_r = tot_r + 4
+    for j, txt in enumerate(["Number of entries","Number of accounts","Account name","Amount"], start=3):
+        put(hdr_r, j, txt, "jet_subheader")
+    # Most used / least used
+    for row, label, n, lst in [(hdr_r + 2, "Most used account", max_entries, most_list),
+                               (hdr_r + 2 + max(1, len(most_list)) + 3, "Least used accounts", min_entries, least_list)]:
+        put(row, 2, label, "jet_bold")
+        put(row, 3, n, "jet_int")
+        put(row, 4, len(lst), "jet_int")
+        for i, rec in enumerate(lst.itertuples(index=False)):
+            put(row + i, 5, rec[0], "jet_cell")
+            put(row + i, 6, float(rec[1]), "jet_money")
+    emit_rows(ws, rows, end_r + 1)
+
+# ---------- pipeline ----------
+def _param(x):
+    """Hashable form of a chart/bands list for cache keys."""
+    return None if x is None else tuple(map(tuple, x))
+
+def _cached_build(key, name, params, build):
+    """``build`` itself, or with ``key`` a call that keeps its output in result_cache."""
+    if key is None:
+        return build
+    return lambda: result_cache.cached((key, "build", name, params), build)
+
+def report_sheets(TB, GL, MAT_RAW, ctt=CTT, pm=PM, chart=None, bands=None, client=None, key=None):
+    """``(title, params, write)`` for every sheet, in workbook order.
+
+    ``params`` are the settings a sheet depends on besides the input frames and
+    ``write(ws)`` builds its data and streams it into ``ws``. With ``key`` (the
+    hash of the uploaded file) builder outputs are kept in result_cache.
+    """
+    if client:
+        use_partials(GL, client)
+
+    def stage(name, params, build):
+        return _cached_build(key, name, params, build)
+
+    def table(build, **fmt):
+        return lambda ws: write_table(ws, build(), **fmt)
+
+    chart_p, mat_p = (_param(chart),), (ctt, pm, _param(bands))
+    counts = dict(money_cols={"Total Amount (in MNT)"}, int_cols={"Total Number of Line Items"})
+    raw = dict(freeze=False, show_grid=True)
+    return [
+        ("Reconcilation", chart_p,
+         table(stage("recon", chart_p, lambda: build_reconciliation(TB, GL, chart)),
+               money_cols={"Opening Balance per TB","Ending balance per TB (Total Correct)",
+                           "Movement per TB 1","Movement per GL","Difference Rounded"})),
+        # nice format, title style like your pivot
+        ("Materiality", mat_p,
+         table(stage("materiality", mat_p, lambda: build_materiality(GL, ctt, pm, bands)),
+               start_row=10, start_col=2,
+               money_cols={"Total Amount (in MNT)"},
+               int_cols={"Number of Line Items Involved"},
+               percent_cols={"Percentage","Amount Percentage"},
+               freeze=True, show_grid=False, title_text="Testing:")),
+        # your one-sheet pivot layout
+        ("JE_by_Account", (),
+         lambda ws: write_je_by_account(ws, *stage("account", (), lambda: build_je_by_account_like_pivot(GL))())),
+        ("JE_by_Month", (), table(stage("month", (), lambda: build_by_month(GL)), **counts)),
+        ("JE_by_Day_of_Month", (), table(stage("day", (), lambda: build_day_group(GL)), **counts)),
+        ("JE Distribution by User", (), table(stage("user", (), lambda: build_by_user(GL)), **counts)),
+        ("JE_by_Day_of_Week", (),
+         table(stage("dow", (), lambda: build_by_dow(GL)), int_cols={"Total Number of Line Items","Days in the year"})),
+        ("Net_to_Zero_Test", (),
+         table(stage("net", (), lambda: build_net_to_zero(GL)), money_cols={"Sum of Transaction"})),
+        # RAW sheets
+        ("TB", (), table(lambda: TB, **raw)),
+        ("GL", (), table(lambda: GL, **raw)),
+        ("materiality_raw", (), table(lambda: MAT_RAW, **raw)),
+    ]
+
+# ---------- machine-readable results ----------
+def _totals(df) -> dict:
+    """The builder's Total / Grand Total row as ``{column: value}`` (empty if it has none)."""
+    if df.empty or str(df.iloc[-1, 0]) not in ("Total", "Grand Total"):
+        return {}
+    return {str(c): v for c, v in df.iloc[-1, 1:].items() if v != ""}
+
+def report_results(TB, GL, MAT_RAW, ctt=CTT, pm=PM, chart=None, bands=None, client=None, key=None):
+    """``(test id, title, build)`` for every statistical test, in workbook order.
+
+    ``build()`` returns ``(frames, summary)``: the builder's tables by name and
+    its headline figures. Builders are shared with report_sheets (same cache keys).
+    """
+    if client:
+        use_partials(GL, client)
+    chart_p, mat_p = (_param(chart),), (ctt, pm, _param(bands))
+
+    def table(name, params, build, summary=_totals):
+        build = _cached_build(key, name, params, build)
+        def run():
+            df = build()
+            return {name: df}, summary(df)
+        return run
+
+    def account():
+        pivot, total_entries, total_value, max_entries, min_entries, most, least = \
+            _cached_build(key, "account", (), lambda: build_je_by_account_like_pivot(GL))()
+        return ({"account": pivot, "most_used": most, "least_used": least},
+                {"Total Number of Entries": total_entries, "Value of transactions": total_value,
+                 "Most entries": max_entries, "Least entries": min_entries})
+
+    def recon_summary(df):
+        body = df.iloc[:-1] if not df.empty else df
+        return {**_totals(df), "Accounts": len(body),
+                "Accounts with difference": int((body.get("Difference Rounded", pd.Series(dtype=float)) != 0).sum())}
+
+    def net_summary(df):
+        return {"Accounts": len(df), "Sum of Transaction": float(df["Sum of Transaction"].sum()) if len(df) else 0.0}
+
+    return [
+        ("Reconcilation", "Reconciliation of TB and GL movements",
+         table("recon", chart_p, lambda: build_reconciliation(TB, GL, chart), recon_summary)),
+        ("Materiality", "Line items by materiality band",
+         table("materiality", mat_p, lambda: build_materiality(GL, ctt, pm, bands),
+               lambda df: {**_totals(df), "CTT": ctt, "PM": pm})),
+        ("JE_by_Account", "Journal entries by account", account),
+        ("JE_by_Month", "Journal entries by month", table("month", (), lambda: build_by_month(GL))),
+        ("JE_by_Day_of_Month", "Journal entries by days before month end",
+         table("day", (), lambda: build_day_group(GL))),
+        ("JE Distribution by User", "Journal entries by user", table("user", (), lambda: build_by_user(GL))),
+        ("JE_by_Day_of_Week", "Journal entries by day of week", table("dow", (), lambda: build_by_dow(GL))),
+        ("Net_to_Zero_Test", "Accounts whose transactions do not net to zero",
+         table("net", (), lambda: build_net_to_zero(GL), net_summary)),
+    ]
+
+def export_results(directory, TB, GL, MAT_RAW, ctt=CTT, pm=PM, chart=None, bands=None, client=None, key=None) -> Path:
+    """Every statistical test as Parquet tables plus manifest.json in ``directory`` – no workbook.
+
+    Returns the manifest path (see results_export).
+    """
+    tests = report_results(TB, GL, MAT_RAW, ctt, pm, chart, bands, client, key)
+    stage_timer.expect(len(tests))
+    entries = []
+    for test_id, title, build in tests:
+        with stage_timer.stage(f"results:{test_id}"):
+            frames, summary = build()
+            entries.append(results_export.write_test(directory, test_id, title, frames, summary))
+    params = {"CTT": ctt, "PM": pm, "bands": bands if bands is not None else MATERIALITY_BANDS,
+              "chart": chart, "client": client, "gl_rows": len(GL), "tb_rows": len(TB)}
+    return results_export.write_manifest(directory, "statistical", params, entries)
+
+def build_workbook(TB, GL, MAT_RAW, ctt=CTT, pm=PM, chart=None, bands=None, client=None):
+    """Every statistical sheet for the given frames, as a write-only openpyxl Workbook.
+
+    ``chart`` is a client chart of accounts (see chart_of_accounts.load_chart) and
+    ``bands`` an engagement-specific MATERIALITY_BANDS list. With ``client`` the GL
+    aggregates are built month by month and reused across runs (see use_partials).
+    """
+    wb = new_workbook()
+    sheets = report_sheets(TB, GL, MAT_RAW, ctt, pm, chart, bands, client)
+    stage_timer.expect(len(sheets))
+    for title, _, write in sheets:
+        _write_sheet(wb.create_sheet(title), title, write)
+    return wb
+
+def _write_sheet(ws, title, write):
+    with stage_timer.stage(f"sheet:{title}"):
+        write(ws)
+
+def build_report(TB, GL, MAT_RAW, ctt=CTT, pm=PM, chart=None, bands=None, client=None, key=None) -> bytes:
+    """The full statistical report for the given frames, as xlsx bytes.
+
+    With ``key`` (the hash of the uploaded file) every sheet's XML is kept in
+    result_cache under the settings it depends on; a re-run that only changes
+    CTT/PM rewrites the Materiality sheet and copies the rest from the cache.
+    """
+    with stage_timer.run("statistical", ctt=ctt, pm=pm, client=client):
+        return _build_report(TB, GL, MAT_RAW, ctt, pm, chart, bands, client, key)
+
+def _build_report(TB, GL, MAT_RAW, ctt, pm, chart, bands, client, key) -> bytes:
+    buf = io.BytesIO()
+    if key is None:
+        wb = build_workbook(TB, GL, MAT_RAW, ctt, pm, chart, bands, client)
+        stage_timer.expect(1)
+        with stage_timer.stage("save"):
+            wb.save(buf)
+        return buf.getvalue()
+    sheets = [(f"xl/worksheets/sheet{i}.xml", (key, "sheet", title, params), title, write)
+              for i, (title, params, write) in
+              enumerate(report_sheets(TB, GL, MAT_RAW, ctt, pm, chart, bands, client, key), start=1)]
+    cached = {part: m for part, ck, _, _ in sheets if (m := result_cache.get(ck)) is not None}
+    stage_timer.expect(len(sheets) - len(cached) + 1)
+    wb = new_workbook()
+    fresh = {}
+    for part, ck, title, write in sheets:
+        ws = wb.create_sheet(title)
+        if part not in cached:  # cache-тай sheet-ийг хоосон бичээд доор солино
+            _write_sheet(ws, title, write); fresh[part] = ck
+    with stage_timer.stage("save"):
+        wb.save(buf)
+        with zipfile.ZipFile(buf) as src:
+            for part, ck in fresh.items():
+                result_cache.put(ck, src.read(part))
+            if not cached:
+                return buf.getvalue()
+            # cache-тай sheet-ийн хоосон XML-ийг хадгалсан XML-ээр солино
+            out = io.BytesIO()
+            with zipfile.ZipFile(out, "w") as dst:
+                for info in src.infolist():
+                    data = cached[info.filename] if info.filename in cached else src.read(info)
+                    dst.writestr(info.filename, data, compress_type=info.compress_type)
+    return out.getvalue()
+
+def report_from_bytes(data: bytes, ctt=CTT, pm=PM, chart=None, bands=None, client=None) -> bytes:
+    """build_report() for an uploaded workbook's contents (e.g. as a job_queue job).
+
+    Frames, builder outputs and sheets are kept in result_cache under the
+    upload's hash, so a re-run in the same process only redoes what changed
+    (submit it with ``affinity=key`` so job_queue runs it on the same worker).
+    """
+    key = xlsx_cache.content_hash(data)
+
+    def load():
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "upload.xlsx"
+            path.write_bytes(data)
+            TB, GL, MAT_RAW = load_frames(path)
+            return TB, GL, MAT_RAW, gl_memo(GL)
+    with stage_timer.run("statistical", ctt=ctt, pm=pm, client=client):
+        stage_timer.expect(1)
+        # ижил frame объект буцдаг тул prepared GL, нийлбэрүүд дахин ашиглагдана.
+        # GL-ийн memo (prepared, нийлбэр, сарын хэсгүүд) entry-д хамт тоологдоно.
+        with stage_timer.stage("load_frames") as rec:
+            TB, GL, MAT_RAW, _ = result_cache.cached(("frames", key), load)
+            rec["rows_out"] = len(GL)
+        try:
+            return build_report(TB, GL, MAT_RAW, ctt, pm, chart, bands, client, key)
+        finally:
+            result_cache.resize(("frames", key))
+
+def main(src_path=SRC_PATH, out_path=OUT_PATH, ctt=CTT, pm=PM, chart_path=None, bands=None, client=None,
+         results_dir=None):
+    """Write the report to ``out_path``; with ``results_dir`` also Parquet + manifest.json
+    (see export_results). ``out_path=None`` skips the workbook (headless run)."""
+    if out_path is None and results_dir is None:
+        raise ValueError("Nothing to write: give out_path and/or results_dir")
+    with stage_timer.run("statistical", src=Path(src_path).name, ctt=ctt, pm=pm, client=client) as run:
+        stage_timer.expect(1)
+        with stage_timer.stage("load_frames") as rec:
+            TB, GL, MAT_RAW = load_frames(src_path)
+            rec["rows_out"] = len(GL)
+        chart = coa.load_chart(chart_path) if chart_path else None
+        if results_dir is not None:
+            manifest = export_results(results_dir, TB, GL, MAT_RAW, ctt, pm, chart, bands, client)
+        if out_path is not None:
+            Path(out_path).write_bytes(build_report(TB, GL, MAT_RAW, ctt, pm, chart, bands, client))
+    if out_path is not None:
+        print(f"Done! Saved -> {Path(out_path).resolve()}")
+    if results_dir is not None:
+        print(f"Results -> {Path(manifest).resolve()}")
+    print(f"Timings: {stage_timer.log_path(run['id'])}")
+
+if __name__ == "__main__":
+    main()
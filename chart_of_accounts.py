@@ -0,0 +1,90 @@
+# chart_of_accounts.py
+# -*- coding: utf-8 -*-
+# Дансны ангилал: дансны кодын цифрүүдийн эхлэл (prefix) -> ангилал.
+# Тест бүр дансны текстийг regex-ээр дахин дахин шүүхийн оронд GL-д нэг удаа
+# categorical багана болгон тооцоод, ангиллын кодоор шүүнэ.
+# Харилцагч бүр өөрийн дансны төлөвлөгөөг Excel/CSV хүснэгтээр өгч болно.
+
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import frame_compact
+
+# ---------------------------------------------------------------------
+# Default mapping
+# ---------------------------------------------------------------------
+# (prefix, class, statement) – хамгийн урт таарсан prefix ялна.
+# statement: "PL" – орлого/зардлын данс (TB-ийн movement = эцсийн үлдэгдэл),
+#            "BS" – балансын данс (movement = эцсийн - эхний үлдэгдэл)
+DEFAULT_CHART = [
+    ("1", "balance_sheet", "BS"),
+    ("2", "balance_sheet", "BS"),
+    ("3", "balance_sheet", "BS"),
+    ("4", "balance_sheet", "BS"),
+    ("13", "revenue", "BS"),       # Test 15/16 орлоготой хамт шалгана, TB-д балансын данс хэвээр
+    ("5", "revenue", "PL"),
+    ("6", "expense", "PL"),
+    ("7", "expense", "PL"),
+    ("8", "other_expense", "PL"),
+    ("9", "tax", "PL"),
+]
+OTHER = "other"  # аль ч prefix-д таарахгүй данс
+
+# Харилцагчийн хүснэгтийн баганын нэрс
+CHART_COLUMNS = {
+    "prefix": ["Prefix","Account prefix","Данс","Дансны эхлэл"],
+    "class": ["Class","Account class","Ангилал"],
+    "statement": ["Statement","Тайлан"],
+}
+
+# ---------------------------------------------------------------------
+# Loading
+# ---------------------------------------------------------------------
+def _pick(columns, options):
+    low = {str(c).strip().lower(): c for c in columns}
+    for o in options:
+        if o.lower() in low:
+            return low[o.lower()]
+    return None
+
+def load_chart(src) -> list[tuple]:
+    """Client chart from an .xlsx/.csv path or named file object (an upload) or a
+    DataFrame, as DEFAULT_CHART-style tuples.
+
+    "Statement" is optional; without it revenue/expense/tax classes count as "PL".
+    """
+    df = src if isinstance(src, pd.DataFrame) else \
+         pd.read_csv(src, dtype=str) if Path(getattr(src, "name", src)).suffix.lower() == ".csv" else pd.read_excel(src, dtype=str)
+    cols = {k: _pick(df.columns, v) for k, v in CHART_COLUMNS.items()}
+    if cols["prefix"] is None or cols["class"] is None:
+        raise ValueError("Дансны төлөвлөгөөнд 'Prefix' болон 'Class' багана шаардлагатай.")
+    prefix = account_key(df[cols["prefix"]])
+    klass = df[cols["class"]].astype(str).str.strip()
+    if cols["statement"] is not None:
+        stmt = df[cols["statement"]].astype(str).str.strip().str.upper()
+    else:
+        stmt = np.where(klass.isin(["revenue","expense","other_expense","tax"]), "PL", "BS")
+    ok = prefix != ""
+    return list(zip(prefix[ok], klass[ok], pd.Series(stmt, index=df.index)[ok]))
+
+# ---------------------------------------------------------------------
+# Classification
+# ---------------------------------------------------------------------
+def account_key(s: pd.Series) -> pd.Series:
+    """Digits of the account code ("1101-00" -> "110100")."""
+    return frame_compact.per_value(s, lambda v: v.astype(str).str.replace(r"\D", "", regex=True))
+
+def classify(keys: pd.Series, chart=None, field: str = "class") -> pd.Series:
+    """Categorical ``class`` (or ``statement``) of every digit-normalised account key.
+
+    Prefixes are matched once per distinct account, not once per GL row.
+    """
+    chart = DEFAULT_CHART if chart is None else chart
+    pos = {"class": 1, "statement": 2}[field]
+    by_len = sorted(chart, key=lambda r: -len(r[0]))
+    codes, uniq = pd.factorize(keys, use_na_sentinel=False)
+    labels = [next((r[pos] for r in by_len if str(k).startswith(r[0])), OTHER) for k in uniq]
+    cats = list(dict.fromkeys([r[pos] for r in chart] + [OTHER]))
+    lookup = np.array([cats.index(l) for l in labels], dtype=np.int16)
+    return pd.Series(pd.Categorical.from_codes(lookup[codes], cats),
+                     index=keys.index, name=keys.name)
@@ -0,0 +1,80 @@
+# frame_compact.py
+# -*- coding: utf-8 -*-
+# Уншсан GL/TB-ийн санах ойг багасгана: давтагддаг текст багана (данс, дансны
+# нэр, харьцсан данс, валют, хэрэглэгч, цонхны нэр, гүйлгээний утга) categorical
+# болж, бүхэл тоон багана хамгийн бага int төрөлд шилжинэ. Утга өөрчлөгдөхгүй.
+# Текстийн үйлдлийг (astype(str), .str...) per_value-аар мөр бүрт биш, ялгаатай
+# утга бүрт нэг удаа хийнэ; бичих үед л categorical-ийг буцааж задална.
+
+import numpy as np
+import pandas as pd
+
+# ---------------------------------------------------------------------
+# Config
+# ---------------------------------------------------------------------
+# ялгаатай утгын тоо / мөрийн тоо үүнээс бага текст багана categorical болно
+CATEGORY_RATIO = 0.5
+# үүнээс цөөн мөртэй frame-ийг шахахгүй (ашиггүй)
+MIN_ROWS = 64
+# categorical болгож болох текст баганын infer_dtype (текст + бүхэл тоо хүртэл)
+TEXT_KINDS = ("string", "mixed-integer")
+
+# ---------------------------------------------------------------------
+# Compaction
+# ---------------------------------------------------------------------
+def _compact_column(s: pd.Series) -> pd.Series:
+    kind = s.dtype.kind
+    if kind in "iu":
+        return pd.to_numeric(s, downcast="integer" if kind == "i" else "unsigned")
+    if not (pd.api.types.is_string_dtype(s) or kind == "O") or isinstance(s.dtype, pd.CategoricalDtype):
+        return s
+    inferred = pd.api.types.infer_dtype(s, skipna=True)
+    if inferred not in TEXT_KINDS:
+        return s
+    if inferred == "mixed-integer":  # текстээс бусад нь зөвхөн int байх ёстой (1 ба 1.0 / True нийлэхгүй)
+        other = s[~s.map(lambda v: isinstance(v, str), na_action="ignore").fillna(True).astype(bool)]
+        if pd.api.types.infer_dtype(other, skipna=True) != "integer":
+            return s
+    codes, uniq = pd.factorize(s)
+    if len(uniq) > CATEGORY_RATIO * len(s):
+        return s
+    cat = pd.Categorical.from_codes(codes, dtype=pd.CategoricalDtype(pd.Index(uniq, dtype=s.dtype)))
+    return pd.Series(cat, index=s.index, name=s.name)
+
+def compact_frame(df: pd.DataFrame) -> tuple[pd.DataFrame, dict]:
+    """``df`` with low-cardinality text columns as categoricals and integer columns
+    downcast, plus ``{"bytes_before", "bytes_after", "columns": {name: new dtype}}``.
+
+    Values are unchanged: the categories keep the column's own dtype, so
+    ``s.astype(s.cat.categories.dtype)`` gives back the original column.
+    """
+    before = int(df.memory_usage(deep=True).sum())
+    if len(df) < MIN_ROWS:
+        return df, {"bytes_before": before, "bytes_after": before, "columns": {}}
+    cols = {c: _compact_column(df[c]) for c in df.columns}
+    out = pd.DataFrame(cols, index=df.index)
+    changed = {str(c): str(s.dtype) for c, s in cols.items() if s.dtype != df[c].dtype}
+    return out, {"bytes_before": before, "bytes_after": int(out.memory_usage(deep=True).sum()),
+                 "columns": changed}
+
+def expand(s: pd.Series) -> pd.Series:
+    """A categorical column back in its original dtype; other columns as they are."""
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        return s.astype(s.cat.categories.dtype)
+    return s
+
+# ---------------------------------------------------------------------
+# Deferred text work
+# ---------------------------------------------------------------------
+def per_value(s: pd.Series, fn):
+    """``fn(s)`` (a Series or frame aligned to ``s``), computed once per distinct value
+    when ``s`` is categorical and spread back to the rows by category code.
+    """
+    if not isinstance(s.dtype, pd.CategoricalDtype):
+        return fn(s)
+    cats = s.cat.categories
+    # сүүлийн мөр нь хоосон утга: code -1 түүнийг заана
+    base = pd.concat([pd.Series(cats, dtype=cats.dtype), pd.Series([np.nan], dtype=cats.dtype)],
+                     ignore_index=True)
+    out = fn(base).iloc[s.cat.codes.to_numpy()]
+    return out.set_axis(s.index)
@@ -0,0 +1,76 @@
+# job_panel.py
+# -*- coding: utf-8 -*-
+# Streamlit апп-уудын job_queue-ийн хэсэг: ажлын төлөв, дараалал, цуцлах товч,
+# бэлэн болсон тайланг татах товч. Job ID нь URL-д (?job=...) хадгалагдах тул
+# browser refresh хийсэн ч ажил тасрахгүй.
+
+import time
+from pathlib import Path
+import streamlit as st
+import job_queue
+import report_bundle
+import stage_timer
+
+POLL_SECONDS = 1.0
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+STATE_TEXT = {
+    job_queue.QUEUED:    "⏳ Дараалалд хүлээж байна",
+    job_queue.RUNNING:   "⚙️ Тайлан үүсгэж байна...",
+    job_queue.DONE:      "🎉 Тайлан амжилттай боловсрууллаа!",
+    job_queue.FAILED:    "Тайлан үүсгэхэд алдаа гарлаа",
+    job_queue.CANCELLED: "Ажил цуцлагдсан",
+}
+
+def start(fn, *args, label: str = "", affinity=None, **kwargs) -> None:
+    """Submit a report build and remember its id in the page URL.
+
+    Builds of the same upload should pass its hash as ``affinity`` (see job_queue.submit).
+    """
+    st.query_params["job"] = job_queue.submit(fn, *args, label=label, affinity=affinity, **kwargs)
+
+def show(file_name: str, mime: str = XLSX_MIME) -> None:
+    """Status of the page's job; polls (reruns the script) until it finishes."""
+    job_id = st.query_params.get("job")
+    if not job_id:
+        return
+    info = job_queue.status(job_id)
+    if info is None:
+        st.warning("Ажлын хугацаа дууссан эсвэл олдсонгүй. Тайланг дахин үүсгэнэ үү.")
+        del st.query_params["job"]
+        return
+
+    state = info["state"]
+    depth = job_queue.queue_depth()
+    if state == job_queue.DONE:
+        st.success(STATE_TEXT[state])
+        log = stage_timer.progress(job_id)
+        if log:
+            with st.expander(f"Үе шатын хугацаа ({log['wall']} сек)"):
+                st.dataframe(log["stages"], use_container_width=True)
+        data = job_queue.result(job_id)
+        if report_bundle.is_bundle(data):  # мөрийн хязгаар хэтэрсэн: xlsx + sidecar-ууд zip-ээр
+            st.caption("Зарим sheet-ийн мөр хязгаараас хэтэрсэн тул илүүдэл мөрүүд zip доторх sidecars/ хавтаст байна.")
+            file_name, mime = Path(file_name).with_suffix(".zip").name, report_bundle.ZIP_MIME
+        st.download_button(label="📥 Тайлан татах", data=data,
+                           file_name=file_name, mime=mime, use_container_width=True)
+    elif state == job_queue.FAILED:
+        st.error(f"{STATE_TEXT[state]}: {info['error']}")
+        if info["traceback"]:
+            with st.expander("Алдааны дэлгэрэнгүй"):
+                st.code(info["traceback"])
+    elif state == job_queue.CANCELLED:
+        st.info(STATE_TEXT[state])
+    else:
+        ahead = f" (таны өмнө {info['position']} ажил)" if state == job_queue.QUEUED else ""
+        st.info(f"{STATE_TEXT[state]}{ahead} – {int(time.time() - info['submitted'])} сек")
+        log = stage_timer.progress(job_id)
+        if log and log["expected"]:
+            st.progress(min(log["done"] / log["expected"], 1.0),
+                        text=f"{log['done']}/{log['expected']} · {log['current'] or ''}")
+        st.caption(f"Ажиллаж буй: {depth['running']}/{depth['workers']} · дараалалд: {depth['queued']}")
+        if st.button("✖ Цуцлах"):
+            job_queue.cancel(job_id)
+            st.rerun()
+        time.sleep(POLL_SECONDS)
+        st.rerun()
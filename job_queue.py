@@ -0,0 +1,205 @@
+# job_queue.py
+# -*- coding: utf-8 -*-
+# Тайлан үүсгэх ажлыг Streamlit-ийн script thread-ээс гаргаж, хязгаартай
+# process pool дээр дараалалд ажиллуулна. Ажил бүр ID-тай; төлөв, дарааллын
+# урт, цуцлалтыг хэн ч (browser refresh хийсэн session ч) ID-аар нь асууж болно.
+# Дууссан ажлын үр дүн (bytes) worker дотроо JOB_DIR-т файлаар бичигдэж,
+# JOB_TTL секунд хадгалагдана; санах ойд зөвхөн замыг нь барина.
+# Worker бүр өөрийн дараалалтай (нэг process-тэй pool); ижил affinity-тэй
+# ажил (жишээ нь upload-ийн hash) ижил worker дээр очиж, түүний санах ойн
+# cache-ийг (result_cache) дахин ашиглана.
+
+import os
+import threading
+import time
+import uuid
+import multiprocessing as mp
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+import stage_timer
+import xlsx_cache
+
+# ---------------------------------------------------------------------
+# Config
+# ---------------------------------------------------------------------
+MAX_JOBS = int(os.getenv("JET_MAX_JOBS", "2"))        # зэрэг ажиллах build-ийн дээд тоо
+JOB_TTL = int(os.getenv("JET_JOB_TTL_S", "3600"))     # дууссан ажлыг хадгалах хугацаа (сек)
+# дууссан ажлын үр дүнгийн файлууд (хэрэглэгчийн 0700 хавтас, xlsx_cache.private_dir)
+JOB_DIR = Path(os.getenv("JET_JOB_DIR", f"{xlsx_cache.CACHE_DIR}-jobs"))
+MAX_AFFINITIES = 256                                  # санах affinity -> worker холбоосын тоо
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+
+_JOBS = {}  # job id -> {"label", "slot", "future", "submitted", "finished", "cancelled", "result", "result_file", "error", "traceback"}
+_LOCK = threading.RLock()  # Future.cancel() done-callback-ийг шууд дуудна
+_POOLS = [None] * MAX_JOBS  # slot -> нэг worker-тэй pool
+_AFFINITY = OrderedDict()   # affinity -> slot
+
+# ---------------------------------------------------------------------
+# Pool
+# ---------------------------------------------------------------------
+def _pool(slot: int) -> ProcessPoolExecutor:
+    # spawn: web server-ийн thread-үүдийг fork хийхгүй; worker нь module-уудаа дахин import хийнэ
+    if _POOLS[slot] is None:
+        _POOLS[slot] = ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context("spawn"))
+    return _POOLS[slot]
+
+def _slot(affinity) -> int:
+    """Worker for a new job: the one that ran ``affinity`` before, else the least busy."""
+    if affinity is not None and affinity in _AFFINITY:
+        _AFFINITY.move_to_end(affinity)
+        return _AFFINITY[affinity]
+    busy = [0] * MAX_JOBS
+    for j in _JOBS.values():
+        if not j["finished"]:
+            busy[j["slot"]] += 1
+    slot = busy.index(min(busy))
+    if affinity is not None:
+        _AFFINITY[affinity] = slot
+        while len(_AFFINITY) > MAX_AFFINITIES:
+            _AFFINITY.popitem(last=False)
+    return slot
+
+def _result_path(job_id: str) -> Path:
+    return JOB_DIR / f"{job_id}.bin"
+
+def _run_job(job_id, label, fn, args, kwargs):
+    """``(result file, None)`` for a bytes result written to JOB_DIR, else ``(None, value)``."""
+    # worker process дотор: үе шатуудын лог нь job ID-аар (stage_timer.progress)
+    with stage_timer.run(label or fn.__name__, run_id=job_id):
+        value = fn(*args, **kwargs)
+    if isinstance(value, (bytes, bytearray)):
+        try:
+            xlsx_cache.private_dir(JOB_DIR, create=True)
+            path = _result_path(job_id)
+            path.write_bytes(value)
+            return str(path), None
+        except OSError:
+            pass  # бичиж чадахгүй бол санах ойгоор буцаана
+    return None, value
+
+def _discard(job: dict) -> None:
+    if job.get("result_file"):
+        Path(job["result_file"]).unlink(missing_ok=True)
+        job["result_file"] = None
+
+def _finished(job_id, future) -> None:
+    with _LOCK:
+        job = _JOBS.get(job_id)
+        if job is None:
+            return
+        job["finished"] = time.time()
+        if future.cancelled():
+            return
+        exc = future.exception()
+        if exc is None:
+            job["result_file"], job["result"] = future.result()
+            if job["cancelled"]:  # ажиллаж байхад цуцлагдсан: үр дүнг хаяна
+                _discard(job)
+                job["result"] = None
+        else:
+            job["error"] = f"{type(exc).__name__}: {exc}"
+            job["traceback"] = str(exc.__cause__ or "")  # worker-ийн traceback (_RemoteTraceback)
+
+def _purge(now: float) -> None:
+    for job_id in [k for k, j in _JOBS.items() if j["finished"] and now - j["finished"] > JOB_TTL]:
+        _discard(_JOBS.pop(job_id))
+
+def _sweep(now: float) -> None:
+    # өмнөх process-ийн (restart) үлдээсэн хугацаа хэтэрсэн файлууд
+    try:
+        for p in xlsx_cache.private_dir(JOB_DIR).glob("*.bin"):
+            if now - p.stat().st_mtime > JOB_TTL:
+                p.unlink(missing_ok=True)
+    except OSError:
+        pass
+
+def _state(job: dict) -> str:
+    f = job["future"]
+    if job["cancelled"] or f.cancelled():
+        return CANCELLED
+    if job["finished"]:
+        return FAILED if job["error"] else DONE
+    return RUNNING if f.running() else QUEUED
+
+# ---------------------------------------------------------------------
+# API
+# ---------------------------------------------------------------------
+def submit(fn, *args, label: str = "", affinity=None, **kwargs) -> str:
+    """Queue ``fn(*args, **kwargs)`` (a picklable top-level function) and return its job id.
+
+    Jobs with the same ``affinity`` (e.g. the upload's content hash) run on the
+    same worker, so they share its in-process caches. The job's stage timings
+    are logged under its id (see stage_timer.progress).
+    """
+    job_id = uuid.uuid4().hex
+    with _LOCK:
+        _purge(time.time())
+        _sweep(time.time())
+        slot = _slot(affinity)
+        try:
+            future = _pool(slot).submit(_run_job, job_id, label, fn, args, kwargs)
+        except BrokenProcessPool:  # worker унасан (жишээ нь санах ой дууссан) – шинэ pool
+            _POOLS[slot] = None
+            future = _pool(slot).submit(_run_job, job_id, label, fn, args, kwargs)
+        _JOBS[job_id] = {"label": label, "slot": slot, "future": future, "submitted": time.time(),
+                         "finished": None, "cancelled": False, "result": None, "result_file": None,
+                         "error": None, "traceback": ""}
+    future.add_done_callback(lambda f: _finished(job_id, f))
+    return job_id
+
+def status(job_id: str) -> dict | None:
+    """``{"id", "label", "state", "position", "submitted", "finished", "error", "traceback"}``,
+    or None once expired.
+
+    ``position`` is the number of queued jobs ahead of this one on its worker
+    (0 when it is not queued).
+    """
+    with _LOCK:
+        _purge(time.time())
+        job = _JOBS.get(job_id)
+        if job is None:
+            return None
+        state = _state(job)
+        ahead = 0
+        if state == QUEUED:
+            ahead = sum(1 for j in _JOBS.values() if j["slot"] == job["slot"]
+                        and j["submitted"] < job["submitted"] and _state(j) == QUEUED)
+        return {"id": job_id, "label": job["label"], "state": state, "position": ahead,
+                "submitted": job["submitted"], "finished": job["finished"],
+                "error": job["error"], "traceback": job["traceback"]}
+
+def result(job_id: str):
+    """Return value of a finished job; None while it is queued/running or after it failed or expired."""
+    with _LOCK:
+        _purge(time.time())
+        job = _JOBS.get(job_id)
+        if job is None:
+            return None
+        path = job["result_file"]
+        if path is None:
+            return job["result"]
+    try:
+        return Path(path).read_bytes()
+    except OSError:  # хавтсыг гаднаас цэвэрлэсэн
+        return None
+
+def cancel(job_id: str) -> bool:
+    """Cancel a job. A queued job never starts; a running one finishes in its
+    worker, but its result is discarded. Returns False for unknown/finished jobs."""
+    with _LOCK:
+        job = _JOBS.get(job_id)
+        if job is None or job["finished"]:
+            return False
+        job["future"].cancel()
+        job["cancelled"] = True
+        return True
+
+def queue_depth() -> dict:
+    """``{"queued", "running", "workers"}`` across all sessions of this process."""
+    with _LOCK:
+        _purge(time.time())
+        states = [_state(j) for j in _JOBS.values()]
+    return {"queued": states.count(QUEUED), "running": states.count(RUNNING), "workers": MAX_JOBS}
@@ -0,0 +1,89 @@
+# report_bundle.py
+# -*- coding: utf-8 -*-
+# Sheet-ийн мөрийн хязгаараас (эсвэл Excel-ийн 1,048,576 мөрөөс) хэтэрсэн
+# мөрүүдийг шахсан CSV / Parquet "sidecar" файлд бичиж, тайлангийн xlsx-тэй
+# нэг zip болгон багцална. Sheet дээр эхний хэсэг, хураангуй, sidecar-ийн нэр үлдэнэ.
+
+import io
+import os
+import zipfile
+from pathlib import Path
+import pandas as pd
+import frame_compact
+
+# ---------------------------------------------------------------------
+# Config
+# ---------------------------------------------------------------------
+EXCEL_MAX_ROWS = 1_048_576
+SIDECAR_FORMAT = os.getenv("JET_SIDECAR_FORMAT", "csv")  # "csv" (gzip) эсвэл "parquet"
+SIDECAR_DIR = "sidecars"                                  # багц доторх хавтас
+REPORT_NAME = "report.xlsx"                               # багц доторх тайлангийн нэр
+ZIP_MIME = "application/zip"
+
+_SUFFIX = {"csv": ".csv.gz", "parquet": ".parquet"}
+
+# ---------------------------------------------------------------------
+# Sidecars
+# ---------------------------------------------------------------------
+def _arrow_frame(df: pd.DataFrame) -> pd.DataFrame:
+    # Parquet нэг баганад нэг төрөл шаардана: холимог (текст + тоо) баганыг текст болгоно
+    cols = {}
+    for c in df.columns:
+        s = frame_compact.expand(df[c])
+        if s.dtype == object and pd.api.types.infer_dtype(s, skipna=True) not in ("string", "empty"):
+            s = s.map(str, na_action="ignore")
+        cols[str(c)] = s
+    return pd.DataFrame(cols, index=df.index)
+
+def write_sidecar(df: pd.DataFrame, directory: Path, stem: str, fmt: str = SIDECAR_FORMAT) -> Path:
+    """Write ``df`` to ``directory/<stem>.csv.gz`` (or ``.parquet``) and return the path."""
+    if fmt not in _SUFFIX:
+        raise ValueError(f"Unknown sidecar format: {fmt}")
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{stem}{_SUFFIX[fmt]}"
+    if fmt == "parquet":
+        _arrow_frame(df).to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False, compression="gzip")
+    return path
+
+def split_rows(df: pd.DataFrame, budget: int, first_row: int, sidecar_dir: Path | None,
+               stem: str, fmt: str = SIDECAR_FORMAT) -> tuple[pd.DataFrame, str | None, Path | None]:
+    """``(rows for the sheet, note, sidecar path)`` for a table starting at sheet row ``first_row``.
+
+    At most ``budget`` rows stay on the sheet (fewer if the sheet would pass
+    EXCEL_MAX_ROWS, keeping one row for the note); the rest go to a sidecar.
+    Tables within budget come back unchanged with no note.
+    """
+    keep = max(0, min(budget, EXCEL_MAX_ROWS - first_row - 1))
+    if len(df) <= keep:
+        return df, None, None
+    if sidecar_dir is None:
+        raise ValueError(f"{stem}: {len(df):,} rows exceed the sheet budget of {keep:,}; sidecar_dir is required")
+    path = write_sidecar(df.iloc[keep:], sidecar_dir, stem, fmt)
+    note = (f"Showing the first {keep:,} of {len(df):,} rows; the remaining {len(df) - keep:,} "
+            f"are in {SIDECAR_DIR}/{path.name} of the report bundle.")
+    return df.iloc[:keep], note, path
+
+# ---------------------------------------------------------------------
+# Bundle
+# ---------------------------------------------------------------------
+def write_bundle(out, report: Path, sidecars: list[Path], report_name: str = REPORT_NAME) -> None:
+    """Zip the report and its sidecars into ``out`` (path or binary file object).
+
+    Members are stored, not deflated again: xlsx, gzip and Parquet are compressed already.
+    """
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_STORED) as z:
+        z.write(report, report_name)
+        for p in sidecars:
+            z.write(p, f"{SIDECAR_DIR}/{Path(p).name}")
+
+def is_bundle(data: bytes) -> bool:
+    """True for a report bundle, False for a plain xlsx (or anything else)."""
+    try:
+        with zipfile.ZipFile(io.BytesIO(data)) as z:
+            names = set(z.namelist())
+    except zipfile.BadZipFile:
+        return False
+    return "[Content_Types].xml" not in names and any(n.endswith(".xlsx") for n in names)
@@ -0,0 +1,103 @@
+# result_cache.py
+# -*- coding: utf-8 -*-
+# Streamlit-ийн rerun хооронд үе шат бүрийн үр дүнг (parse хийсэн frame,
+# builder-ийн хүснэгт, бичигдсэн sheet-ийн XML) санах ойд хадгална.
+# Түлхүүр нь upload-ийн hash + тухайн үе шатанд нөлөөлөх параметрүүд тул
+# зөвхөн CTT/PM өөрчлөгдөхөд Materiality л дахин тооцогдоно.
+# Нийт хэмжээ RESULT_CACHE_MAX_BYTES-ээс хэтрэхэд хамгийн удаан ашиглагдаагүй
+# entry-г хасна (process дахь бүх session хуваалцана).
+
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+# ---------------------------------------------------------------------
+# Config
+# ---------------------------------------------------------------------
+RESULT_CACHE_MAX_BYTES = int(os.getenv("JET_RESULT_CACHE_MB", "512")) * 1024 * 1024
+
+_ENTRIES = OrderedDict()  # key -> (value, size)
+_LOCK = threading.Lock()
+_total = 0
+
+# ---------------------------------------------------------------------
+# Size
+# ---------------------------------------------------------------------
+def sizeof(value) -> int:
+    """Approximate resident bytes of a cached value."""
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sum(sizeof(v) for v in value)
+    if isinstance(value, dict):
+        return sum(sizeof(v) for v in value.values())
+    return 64
+
+# ---------------------------------------------------------------------
+# Get / put
+# ---------------------------------------------------------------------
+def get(key):
+    """Cached value for ``key`` (marked most recently used), or None."""
+    with _LOCK:
+        ent = _ENTRIES.get(key)
+        if ent is None:
+            return None
+        _ENTRIES.move_to_end(key)
+        return ent[0]
+
+def put(key, value) -> None:
+    """Store ``value`` and evict least-recently-used entries beyond the byte budget."""
+    global _total
+    size = sizeof(value)
+    with _LOCK:
+        old = _ENTRIES.pop(key, None)
+        if old is not None:
+            _total -= old[1]
+        if size > RESULT_CACHE_MAX_BYTES:  # ганц entry төсвөөс их бол хадгалахгүй
+            return
+        _ENTRIES[key] = (value, size)
+        _total += size
+        while _total > RESULT_CACHE_MAX_BYTES:
+            _, (_, s) = _ENTRIES.popitem(last=False)
+            _total -= s
+
+def resize(key) -> None:
+    """Re-measure ``key``'s value after it grew in place (e.g. a memo dict inside it)."""
+    global _total
+    with _LOCK:
+        ent = _ENTRIES.get(key)
+        if ent is None:
+            return
+        size = sizeof(ent[0])
+        _total += size - ent[1]
+        if size > RESULT_CACHE_MAX_BYTES:
+            del _ENTRIES[key]
+            _total -= size
+            return
+        _ENTRIES[key] = (ent[0], size)
+        _ENTRIES.move_to_end(key)
+        while _total > RESULT_CACHE_MAX_BYTES:
+            _, (_, s) = _ENTRIES.popitem(last=False)
+            _total -= s
+
+def cached(key, compute):
+    """``compute()`` once per ``key``; later calls return the stored value."""
+    value = get(key)
+    if value is None:
+        value = compute()
+        put(key, value)
+    return value
+
+def clear() -> None:
+    global _total
+    with _LOCK:
+        _ENTRIES.clear()
+        _total = 0
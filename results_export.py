@@ -0,0 +1,61 @@
+# results_export.py
+# -*- coding: utf-8 -*-
+# Тестүүдийн үр дүнг xlsx-ээс гадна машинд уншигдах хэлбэрээр гаргана:
+# хүснэгт бүр Parquet файл, нийт нь нэг manifest.json (тест, мөрийн тоо,
+# хураангуй дүн, CTT/PM зэрэг параметр). Engagement-ийн хэрэгслүүд xlsx-ийг
+# дахин parse хийх шаардлагагүй; Excel-гүй (headless) ажиллуулахад мөн хэрэглэнэ.
+
+import json
+import re
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import report_bundle
+
+# ---------------------------------------------------------------------
+# Config
+# ---------------------------------------------------------------------
+MANIFEST = "manifest.json"
+MANIFEST_VERSION = 1
+
+# ---------------------------------------------------------------------
+# Writers
+# ---------------------------------------------------------------------
+def _stem(text: str) -> str:
+    return re.sub(r"[^\w\-]+", "_", str(text)).strip("_") or "table"
+
+def _json_value(v):
+    # numpy / pandas scalar, огноо -> JSON-д бичигдэх утга
+    if isinstance(v, np.generic):
+        return v.item()
+    if isinstance(v, (pd.Timestamp, np.datetime64)):
+        return pd.Timestamp(v).isoformat()
+    if isinstance(v, (set, tuple)):
+        return list(v)
+    return str(v)
+
+def write_test(directory: Path, test_id: str, title: str, frames: dict, summary: dict) -> dict:
+    """Write every frame of one test as ``<test>__<name>.parquet`` and return its manifest entry.
+
+    ``frames`` maps a table name to its DataFrame (in sheet order); ``summary``
+    holds the test's headline figures (counts, totals) as JSON-able values.
+    """
+    tables = []
+    for name, df in frames.items():
+        path = report_bundle.write_sidecar(df, directory, f"{_stem(test_id)}__{_stem(name)}", "parquet")
+        tables.append({"name": name, "file": path.name, "rows": len(df), "columns": [str(c) for c in df.columns]})
+    return {"id": test_id, "title": title, "rows": sum(t["rows"] for t in tables),
+            "summary": summary, "tables": tables}
+
+def write_manifest(directory: Path, report: str, params: dict, tests: list[dict]) -> Path:
+    """``directory/manifest.json`` for the entries of write_test, in report order."""
+    doc = {"version": MANIFEST_VERSION, "report": report,
+           "created": time.strftime("%Y-%m-%dT%H:%M:%S"), "params": params, "tests": tests}
+    path = Path(directory) / MANIFEST
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(doc, ensure_ascii=False, indent=1, default=_json_value), encoding="utf-8")
+    return path
+
+def read_manifest(directory: Path) -> dict:
+    return json.loads((Path(directory) / MANIFEST).read_text(encoding="utf-8"))
@@ -0,0 +1,156 @@
+# stage_timer.py
+# -*- coding: utf-8 -*-
+# Тайлан үүсгэх үе шат бүрийн (уншилт, тест/builder, sheet бичилт, save)
+# хугацаа, орсон/гарсан мөр, бичсэн нүдний тоог бүртгэнэ.
+# Run бүр TIMING_DIR/<run id>.json лог үүсгэж, үе шат дуусах бүрт шинэчилнэ –
+# Streamlit апп үүнийг уншиж progress bar харуулна.
+# Идэвхтэй run байхгүй үед hook-ууд юу ч хийхгүй.
+
+import contextvars
+import functools
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+import pandas as pd
+
+# ---------------------------------------------------------------------
+# Config
+# ---------------------------------------------------------------------
+TIMING_DIR = Path(os.getenv("JET_TIMING_DIR", Path(tempfile.gettempdir()) / "jet_timings"))
+
+_RUN = contextvars.ContextVar("jet_run", default=None)      # идэвхтэй run
+_STAGE = contextvars.ContextVar("jet_stage", default=None)  # хамгийн дотор талын stage
+
+# ---------------------------------------------------------------------
+# Run
+# ---------------------------------------------------------------------
+def log_path(run_id: str) -> Path:
+    return TIMING_DIR / f"{run_id}.json"
+
+def _write(run: dict) -> None:
+    with run["lock"]:
+        doc = {k: v for k, v in run.items() if k != "lock"}
+        data = json.dumps(doc, ensure_ascii=False, indent=1, default=str)
+    try:
+        TIMING_DIR.mkdir(parents=True, exist_ok=True)
+        path = log_path(run["id"])
+        tmp = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        tmp.write_text(data, encoding="utf-8")
+        os.replace(tmp, path)
+    except OSError:
+        pass  # лог бичигдээгүй нь тайланг зогсоохгүй
+
+@contextmanager
+def run(name: str, run_id: str | None = None, **params):
+    """Record the stages of one report run; nested calls join the outer run.
+
+    ``params`` (CTT, file name, ...) are stored in the log as given.
+    """
+    outer = _RUN.get()
+    if outer is not None:
+        yield outer
+        return
+    rec = {"id": run_id or f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}",
+           "name": name, "params": params, "started": time.time(), "finished": None,
+           "wall": None, "status": "running", "expected": 0, "done": 0, "current": None,
+           "stages": [], "lock": threading.Lock()}
+    token = _RUN.set(rec)
+    t0 = time.perf_counter()
+    try:
+        yield rec
+        rec["status"] = "done"
+    except BaseException as e:
+        rec["status"] = f"failed: {type(e).__name__}"
+        raise
+    finally:
+        _RUN.reset(token)
+        rec["finished"], rec["wall"] = time.time(), round(time.perf_counter() - t0, 4)
+        _write(rec)
+
+def expect(n: int) -> None:
+    """Announce ``n`` more top-level stages (the progress denominator)."""
+    rec = _RUN.get()
+    if rec is not None:
+        with rec["lock"]:
+            rec["expected"] += n
+
+def progress(run_id: str) -> dict | None:
+    """The run's log as last written (``done``/``expected``, ``current``, ``stages``), or None."""
+    try:
+        return json.loads(log_path(run_id).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+# ---------------------------------------------------------------------
+# Stages
+# ---------------------------------------------------------------------
+@contextmanager
+def stage(name: str, rows_in: int | None = None):
+    """Time one stage; the caller may set ``rec["rows_out"]`` on the yielded record."""
+    run_rec = _RUN.get()
+    if run_rec is None:
+        yield {}
+        return
+    parent = _STAGE.get()
+    rec = {"stage": name, "depth": 0 if parent is None else parent["depth"] + 1,
+           "rows_in": rows_in, "rows_out": None, "cells": 0, "wall": None}
+    token = _STAGE.set(rec)
+    with run_rec["lock"]:
+        run_rec["current"] = name
+    t0 = time.perf_counter()
+    try:
+        yield rec
+    finally:
+        rec["wall"] = round(time.perf_counter() - t0, 4)
+        _STAGE.reset(token)
+        with run_rec["lock"]:
+            run_rec["stages"].append(rec)
+            if rec["depth"] == 0:
+                run_rec["done"] += 1
+        _write(run_rec)
+
+def add_cells(n: int, rows: int = 0) -> None:
+    """Count ``n`` cells (in ``rows`` rows) written by the current stage."""
+    rec = _STAGE.get()
+    if rec is not None:
+        rec["cells"] += int(n)
+        rec["rows_out"] = (rec["rows_out"] or 0) + int(rows)
+
+def note(**fields) -> None:
+    """Extra fields (e.g. memory before/after) for the current stage's log record."""
+    rec = _STAGE.get()
+    if rec is not None:
+        rec.update(fields)
+
+def rows(value) -> int | None:
+    """Row count of a stage input/output: a frame, a (frame, ...) tuple or a test spec."""
+    if isinstance(value, pd.DataFrame):
+        return len(value)
+    if isinstance(value, tuple) and value and isinstance(value[0], pd.DataFrame):
+        return len(value[0])
+    if isinstance(value, dict) and "tables" in value:
+        return sum(len(t["frame"]) for t in value["tables"])
+    return None
+
+def timed(fn):
+    """Decorator: run ``fn`` as a stage named after it; rows in/out from its first frame argument and result."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if _RUN.get() is None:
+            return fn(*args, **kwargs)
+        first = next((a for a in args if isinstance(a, pd.DataFrame)), None)
+        with stage(fn.__name__, None if first is None else len(first)) as rec:
+            out = fn(*args, **kwargs)
+            if rows(out) is not None:
+                rec["rows_out"] = rows(out)
+        return out
+    return wrapper
+
+def in_context(fn):
+    """``fn`` bound to a copy of the caller's context (run/stage), for a worker thread."""
+    return functools.partial(contextvars.copy_context().run, fn)
@@ -0,0 +1,89 @@
+# tests/test_aggregates.py
+# -*- coding: utf-8 -*-
+# band_stats-ийн хязгаар (яг хязгаар дээрх утга аль band-д орох) ба сарын
+# хэсгүүдээс (use_partials) нийлүүлсэн нийлбэр шинээр тооцсонтой ижил эсэх
+
+import sys
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import build_full_report_pretty as report
+import xlsx_cache
+
+SAMPLE = Path(__file__).resolve().parents[1] / "steppe road data.xlsx"
+
+# ---------------------------------------------------------------------
+# band_stats
+# ---------------------------------------------------------------------
+def _naive(values, lowers, uppers):
+    x = pd.Series(values).dropna()
+    out = []
+    for lo, up in zip(lowers, uppers):
+        if up is None:
+            m = x > lo
+        elif lo is None:
+            m = x == up
+        else:
+            m = ((x > lo) & (x < up)) | (x == up)
+        out.append((int(m.sum()), x[m].sum()))
+    return out
+
+def test_band_edges_belong_to_the_lower_band():
+    lowers, uppers = [None, 0, 10, 20], [0, 10, 20, None]
+    stats = report.band_stats([0, 0.5, 10, 10.0001, 20, 25, np.nan, -3], lowers, uppers)
+    assert [c for c, _ in stats] == [1, 2, 2, 1]
+    assert stats[1][1] == pytest.approx(10.5)
+    assert stats[3][1] == pytest.approx(25)
+
+def test_repeated_and_overlapping_edges_match_masks():
+    rng = np.random.default_rng(0)
+    edges = [0, 5, 5, 10, 12]
+    values = np.concatenate([rng.integers(-2, 15, 300).astype(float), edges, [np.nan]])
+    lowers, uppers = [None, 0, 5, 5, 4, 10], [0, 5, 5, 10, 12, None]
+    got = report.band_stats(values, lowers, uppers)
+    want = _naive(values, lowers, uppers)
+    assert [c for c, _ in got] == [c for c, _ in want]
+    assert [t for _, t in got] == pytest.approx([t for _, t in want])
+
+# ---------------------------------------------------------------------
+# Month partials
+# ---------------------------------------------------------------------
+@pytest.fixture
+def frames(tmp_path, monkeypatch):
+    monkeypatch.setattr(xlsx_cache, "CACHE_DIR", tmp_path / "cache")
+    _, GL, _ = report.load_frames(SAMPLE)
+    return GL
+
+def _args(name):
+    return ((None, 0, 1e6), (0, 1e6, None)) if name == "materiality" else ()
+
+def _assert_same(fresh, partial):
+    keys = [c for c in fresh.columns if c not in ("n", "s")]
+    a = fresh.sort_values(keys, ignore_index=True)
+    b = partial.sort_values(keys, ignore_index=True)[list(fresh.columns)]
+    pd.testing.assert_frame_equal(a, b, check_dtype=False, rtol=1e-9)
+
+def test_partials_match_fresh_aggregates(frames):
+    for run in range(2):  # 2 дахь удаа сарын хэсгүүдийг cache-аас уншина
+        GL = frames.copy()
+        report.use_partials(GL, "acme")
+        for name in report.AGGREGATES:
+            _assert_same(report.AGGREGATES[name](frames.copy(), *_args(name)),
+                         report.aggregate(GL, name, *_args(name)))
+
+def test_changed_month_is_recomputed(frames):
+    GL = frames.copy()
+    report.use_partials(GL, "acme")
+    report.aggregate(GL, "net")
+    changed = frames.copy()
+    col = report.pick(changed.columns, report.SOURCES["debit"])
+    changed.loc[changed.index[0], col] = changed[col].iloc[0] + 1000
+    fresh = report.AGGREGATES["net"](changed.copy())
+    with pytest.raises(AssertionError):  # өөрчлөлт нийлбэрт нөлөөлнө
+        _assert_same(report.AGGREGATES["net"](frames.copy()), fresh)
+    GL = changed.copy()
+    report.use_partials(GL, "acme")
+    _assert_same(fresh, report.aggregate(GL, "net"))
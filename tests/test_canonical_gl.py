@@ -0,0 +1,54 @@
+# tests/test_canonical_gl.py
+# -*- coding: utf-8 -*-
+# build_canonical_gl: текст дүн float болж, эрэмбэлсэн sheet тэнцүү дүнг мөрийн дарааллаар жагсаана;
+# to_numbers нь to_number-тэй ижил, classify-д хамгийн урт prefix ялна
+
+import sys
+from pathlib import Path
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import all_reports_master_merged as master
+import chart_of_accounts as coa
+
+def _ledger():
+    return pd.DataFrame({"Данс": ["6101-01", "6101-01", "5101", "7001", "6101-02"],
+                         "Дансны нэр": list("abcde"),
+                         "Transaction": ["1,000.00", "(250)", 1000, "MNT 1000", "1000"],
+                         "Дебет дүн": [1, 2, 3, 4, 5], "Кредит дүн": [0] * 5})
+
+def test_text_amounts_parse_to_float():
+    gl = master.build_canonical_gl(_ledger())
+    assert gl["__TXN__"].dtype == float
+    assert gl["__TXN__"].tolist() == [1000.0, -250.0, 1000.0, 1000.0, 1000.0]
+
+def test_expense_list_keeps_row_order_for_equal_amounts():
+    gl = master.build_canonical_gl(_ledger())
+    out = master.spec_test15_exp_list(gl)["tables"][0]["frame"]
+    assert out.index.tolist() == [0, 3, 4, 1]
+
+def _scalar(s):  # мөр бүрд to_number, NA -> NaN
+    return s.map(lambda v: float("nan") if master.to_number(v) is pd.NA else master.to_number(v)).astype(float)
+
+def test_to_numbers_matches_to_number():
+    raw = pd.Series(["1,000.00", "(250)", "MNT 1000", " 12 ", "-3.5", "", "abc", None, float("nan"),
+                     1000, 2.5, 1e20, 1e-7, True, "１２３", "1.2.3", "(1,5)"], dtype=object)
+    got = master.to_numbers(raw)
+    pd.testing.assert_series_equal(got, _scalar(raw), check_names=False)
+
+def test_to_numbers_numeric_column():
+    s = pd.Series([1.0, None, -2.5, 1e17, 3e-5])
+    pd.testing.assert_series_equal(master.to_numbers(s), _scalar(s), check_names=False)
+
+def test_classify_longest_prefix_wins():
+    keys = coa.account_key(pd.Series(["1301-00", "1101", "5101", "6201", "8001", "9999", "0123", None]))
+    got = coa.classify(keys)
+    assert got.tolist() == ["revenue", "balance_sheet", "revenue", "expense", "other_expense", "tax",
+                            coa.OTHER, coa.OTHER]
+    assert coa.classify(keys, field="statement").tolist()[:3] == ["BS", "BS", "PL"]
+
+def test_classify_client_chart():
+    chart = [("61", "expense", "PL"), ("6", "revenue", "PL")]
+    keys = pd.Series(["6101", "6201", "7001"])
+    assert coa.classify(keys, chart).tolist() == ["expense", "revenue", coa.OTHER]
+    assert list(coa.classify(keys, chart).cat.categories) == ["expense", "revenue", coa.OTHER]
@@ -0,0 +1,37 @@
+# tests/test_top_n.py
+# -*- coding: utf-8 -*-
+# top_n / top_rows: их утга эхэнд, тэнцүү утга мөрийн дарааллаараа, NaN зөвхөн дутууг нөхнө
+
+import sys
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import all_reports_master_merged as master
+
+def _stable(v, n):
+    return pd.Series(v).sort_values(ascending=False, kind="stable").head(n).index.to_numpy()
+
+def test_ties_keep_row_order():
+    v = np.array([1000.0, 5.0, 1000.0, 2000.0, 1000.0, 5.0, 1000.0])
+    assert master.top_n(v, 4).tolist() == [3, 0, 2, 4]
+    assert master.top_n(v, 6).tolist() == [3, 0, 2, 4, 6, 1]
+
+def test_nan_only_fills_short_result():
+    v = np.array([np.nan, 3.0, np.nan, 3.0])
+    assert master.top_n(v, 1).tolist() == [1]
+    assert master.top_n(v, 4).tolist() == [1, 3, 0, 2]
+    assert master.top_n(v, 0).tolist() == []
+
+def test_matches_stable_sort_on_round_amounts():
+    rng = np.random.default_rng(0)
+    for _ in range(500):
+        v = rng.choice([0.0, 100.0, 1000.0, 1000000.0, -1000.0, np.nan], size=int(rng.integers(0, 80)))
+        n = int(rng.integers(0, 90))
+        assert master.top_n(v, n).tolist() == _stable(v, n).tolist()
+
+def test_top_rows_absolute_and_shared_prefix():
+    gl = pd.DataFrame({"__TXN__": [-500.0, 500.0, 20.0, -700.0, 500.0]})
+    assert master.top_rows(gl, "__TXN__", 3, absolute=True).index.tolist() == [3, 0, 1]
+    assert master.top_rows(gl, "__TXN__", 2, absolute=True).index.tolist() == [3, 0]
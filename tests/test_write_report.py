@@ -0,0 +1,35 @@
+# tests/test_write_report.py
+# -*- coding: utf-8 -*-
+# write_report: амжилттай бол out бичигдэнэ; алдаа гарвал out ч, түр файл ч үлдэхгүй
+
+import sys
+from pathlib import Path
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import all_reports_master_merged as master
+
+def _ledger():
+    return pd.DataFrame({"Данс": ["6101-01", "5101", "7001", "1201"],
+                         "Дансны нэр": list("abcd"),
+                         "Огноо": pd.to_datetime(["2024-01-31", "2024-02-29", "2024-03-31", "2024-12-31"]),
+                         "Гүйлгээний дугаар": [1, 2, 3, 4],
+                         "Transaction": ["1,000.00", "(250)", 1000, "MNT 500"],
+                         "Дебет дүн": [1000, 0, 1000, 500], "Кредит дүн": [0, 250, 0, 0],
+                         "Гүйлгээний утга": ["rent", "refund", "fuel", "fee"]})
+
+def test_writes_workbook(tmp_path):
+    out = tmp_path / "report.xlsx"
+    master.write_report(out, _ledger(), "GL", workers=1, sidecar_dir=tmp_path / "sidecars")
+    assert out.stat().st_size > 0
+    assert [p.name for p in tmp_path.iterdir() if p.is_file()] == ["report.xlsx"]
+
+def test_failure_leaves_no_output(tmp_path, monkeypatch):
+    def boom(*args, **kwargs):
+        raise KeyboardInterrupt
+    monkeypatch.setattr(master, "sheet_gl_raw", boom)
+    out = tmp_path / "report.xlsx"
+    with pytest.raises(KeyboardInterrupt):
+        master.write_report(out, _ledger(), "GL", workers=1, sidecar_dir=tmp_path / "sidecars")
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,37 @@
+# tests/test_write_table.py
+# -*- coding: utf-8 -*-
+# write_table: нүдний number_format нь утга бүрийнхээ төрлөөр (загвар нүдний өмнөх утгаас биш)
+
+import datetime as dt
+import io
+import sys
+from pathlib import Path
+import pandas as pd
+from openpyxl import load_workbook
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import build_full_report_pretty as report
+
+def _written(df, **fmt):
+    wb = report.new_workbook()
+    report.write_table(wb.create_sheet("T"), df, **fmt)
+    buf = io.BytesIO()
+    wb.save(buf)
+    return load_workbook(io.BytesIO(buf.getvalue()))["T"]
+
+def test_mixed_date_column_keeps_general_after_date():
+    df = pd.DataFrame({"Mixed": pd.Series([dt.datetime(2024, 12, 31, 10, 0), 45000, "text", 3.5, None],
+                                          dtype=object)})
+    ws = _written(df)
+    cells = [ws.cell(row=r, column=1) for r in range(2, 7)]
+    assert cells[0].is_date and cells[0].number_format == "yyyy-mm-dd h:mm:ss"
+    assert [c.value for c in cells[1:4]] == [45000, "text", 3.5]
+    assert [c.number_format for c in cells[1:]] == ["General"] * 4
+
+def test_uniform_columns_keep_their_styles():
+    df = pd.DataFrame({"Date": pd.to_datetime(["2024-01-01", "2024-01-02"]),
+                       "Amount": [1_000.0, 2_500.0], "Name": ["a", "b"]})
+    ws = _written(df, money_cols={"Amount"})
+    assert [ws.cell(row=r, column=1).number_format for r in (2, 3)] == ["yyyy-mm-dd h:mm:ss"] * 2
+    assert [ws.cell(row=r, column=2).number_format for r in (2, 3)] == ["#,##0"] * 2
+    assert [ws.cell(row=r, column=3).value for r in (2, 3)] == ["a", "b"]
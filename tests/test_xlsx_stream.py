@@ -0,0 +1,53 @@
+# tests/test_xlsx_stream.py
+# -*- coding: utf-8 -*-
+# read_sheet: chunk-ууд өөр dtype гаргасан ч pd.read_excel-тэй ижил frame
+
+import datetime as dt
+import sys
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import xlsx_stream
+
+CHUNK = 4
+D = dt.datetime(2024, 3, 31, 12, 0)
+
+# багана бүрийн эхний chunk-ууд нэг төрөл, дараагийнх нь өөр төрөл гаргана
+COLUMNS = {
+    "int_then_float":   [1, 2, 3, 4, 5, 6, 7.5, None, 9],
+    "int_then_text":    [1, 2, 3, 4, 5, "1,000.00", "(250)", 8, None],
+    "text_then_blank":  ["a", "b", "c", "d", None, None, None, None, "e"],
+    "numeric_strings":  ["123", "456", "7", "8", "x", 9, None, "10", "NA"],
+    "bool_then_blank":  [True, False, True, False, None, None, None, None, True],
+    "bool_then_int":    [True, False, True, False, 5, 6, 7, 8, 9],
+    "date_then_blank":  [D, D, D, D, None, None, None, None, D],
+    "date_then_text":   [D, D, D, D, "n/a", D, D, D, D],
+    "blank_then_int":   [None, None, None, None, 1, 2, 3, 4, 5],
+}
+
+def _workbook(tmp_path) -> Path:
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "GL"
+    ws.append(list(COLUMNS))
+    for row in zip(*COLUMNS.values()):
+        ws.append(list(row))
+    path = tmp_path / "gl.xlsx"
+    wb.save(path)
+    return path
+
+def test_mixed_chunks_match_read_excel(tmp_path):
+    path = _workbook(tmp_path)
+    expected = pd.read_excel(path, sheet_name="GL")
+    got = xlsx_stream.read_sheets(path, ["GL"], chunk_rows=CHUNK)["GL"]
+    pd.testing.assert_frame_equal(got, expected)
+    for c in expected.columns:  # object баганын утгын төрөл (1 ба "1") мөн ижил
+        if expected[c].dtype == object:
+            assert [type(v) for v in got[c]] == [type(v) for v in expected[c]], c
+
+def test_samples_keep_one_value_per_kind():
+    s = pd.Series([1.0, 2.0, np.nan, 3.5, 4.0])
+    assert xlsx_stream._samples(s, None) == [1, "", 3.5]
@@ -0,0 +1,370 @@
+# xlsx_cache.py
+# -*- coding: utf-8 -*-
+# Uploaded GL/TB workbook-ийн parse хийсэн sheet-үүдийг дискэнд хадгална.
+# Түлхүүр нь файлын агуулгын sha256 тул ижил файлыг дахин оруулахад openpyxl
+# parse алгасагдана. Нэг cache хавтсыг тухайн хэрэглэгчийн бүх session, process
+# хуваалцна. Frame-үүд зөвхөн Feather (өгөгдөл) хэлбэрээр – pickle ашиглахгүй.
+
+import datetime as dt
+import getpass
+import hashlib
+import json
+import os
+import shutil
+import stat
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import xlsx_stream
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # pyarrow байхгүй бол frame cache хийгдэхгүй (sheet бүрийг дахин parse)
+    pa = feather = None
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# ---------------------------------------------------------------------
+# Config
+# ---------------------------------------------------------------------
+def _user_tag() -> str:
+    try:
+        return getpass.getuser()
+    except Exception:  # нэргүй uid (container гэх мэт)
+        return str(os.getuid()) if hasattr(os, "getuid") else "default"
+
+# хэрэглэгч бүрт тусдаа хавтас; өөр хэрэглэгчийн үүсгэсэн хавтсыг ашиглахгүй (_cache_root)
+CACHE_DIR = Path(os.getenv("JET_CACHE_DIR", Path(tempfile.gettempdir()) / f"jet_xlsx_cache-{_user_tag()}"))
+CACHE_MAX_BYTES = int(os.getenv("JET_CACHE_MAX_MB", "2048")) * 1024 * 1024
+MANIFEST = "manifest.json"
+LOCK_FILE = ".lock"
+
+# ---------------------------------------------------------------------
+# Keys
+# ---------------------------------------------------------------------
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def file_hash(path: Path, block: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(block), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _column_parts(s: pd.Series):
+    """Canonical byte views of a column's values (same values -> same bytes)."""
+    if isinstance(s.dtype, np.dtype) and s.dtype != object:
+        return [np.ascontiguousarray(s.to_numpy()).view(np.uint8)]
+    if pa is not None and isinstance(s.dtype, pd.StringDtype):
+        arr = pa.array(s, from_pandas=True)  # slice-ийн хувьд zero-copy
+        parts = []
+        for chunk in getattr(arr, "chunks", [arr]):
+            if not (pa.types.is_string(chunk.type) or pa.types.is_large_string(chunk.type)):
+                break
+            _, offs, data = chunk.buffers()
+            width = np.int64 if pa.types.is_large_string(chunk.type) else np.int32
+            o = np.frombuffer(offs, dtype=width)[chunk.offset:chunk.offset + len(chunk) + 1]
+            parts += [(o - o[0]).astype(np.int64).view(np.uint8),
+                      np.frombuffer(data, dtype=np.uint8)[o[0]:o[-1]] if data is not None and len(o) else b""]
+            if chunk.null_count:
+                parts.append(chunk.is_null().to_numpy(zero_copy_only=False).view(np.uint8))
+        else:
+            return parts
+    return [pd.util.hash_pandas_object(s, index=False).to_numpy().view(np.uint8)]
+
+def frame_hash(df: pd.DataFrame) -> str:
+    """sha256 of a frame's column names, dtypes and values (the index is ignored)."""
+    h = hashlib.sha256()
+    for c in df.columns:
+        s = df[c]
+        h.update(f"{c}\0{s.dtype}\0{len(s)}\0".encode("utf-8"))
+        for part in _column_parts(s):
+            h.update(part)
+    return h.hexdigest()
+
+# ---------------------------------------------------------------------
+# Entry I/O
+# ---------------------------------------------------------------------
+def private_dir(path: Path, create: bool = False) -> Path:
+    """``path``, after checking it is a real directory private to this user.
+
+    Raises OSError otherwise (e.g. another local user created it first), which
+    every caller treats as "no cache".
+    """
+    path = Path(path)
+    if create:
+        path.mkdir(mode=0o700, parents=True, exist_ok=True)
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode):
+        raise OSError(f"{path} is not a directory")
+    if hasattr(os, "getuid") and (st.st_uid != os.getuid() or st.st_mode & 0o077):
+        raise OSError(f"{path} must be owned by this user with mode 0700")
+    return path
+
+def _cache_root(create: bool = False) -> Path:
+    return private_dir(CACHE_DIR, create)
+
+def _entry(key: str, create: bool = False) -> Path:
+    path = _cache_root(create) / key
+    if create:
+        path.mkdir(exist_ok=True)
+    return path
+
+def _read_manifest(key: str) -> dict:
+    try:
+        return json.loads((_entry(key) / MANIFEST).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+def _write_atomic(path: Path, write) -> None:
+    # өөр process хагас бичсэн файл уншихгүйн тулд temp -> os.replace
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    os.close(fd)
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+@contextmanager
+def _manifest_lock(key: str):
+    """Exclusive lock on entry ``key``'s manifest across threads and processes
+    (job workers share the cache), held for one read-modify-write."""
+    with open(_entry(key) / LOCK_FILE, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+def _write_manifest(key: str, m: dict) -> None:
+    _write_atomic(_entry(key) / MANIFEST,
+                  lambda p: Path(p).write_text(json.dumps(m, ensure_ascii=False), encoding="utf-8"))
+
+def _update_manifest(key: str, **fields) -> None:
+    with _manifest_lock(key):
+        m = _read_manifest(key)
+        for k, v in fields.items():
+            if isinstance(v, dict):
+                m.setdefault(k, {}).update(v)
+            else:
+                m[k] = v
+        _write_manifest(key, m)
+
+# Холимог object баганын утга -> (tag, текст); уншихдаа яг ижил Python утга буцна.
+# Эдгээрээс өөр төрөлтэй frame-ийг cache хийхгүй.
+def _encode_value(v) -> tuple[str, str]:
+    if isinstance(v, str):
+        return "s", v
+    if v is None:
+        return "N", ""
+    if isinstance(v, float) and v != v:
+        return "n", ""
+    if isinstance(v, bool):
+        return "b", "1" if v else ""
+    if type(v) is int:
+        return "i", str(v)
+    if type(v) is float:
+        return "f", repr(v)
+    if type(v) is pd.Timestamp:
+        return "T", v.isoformat()
+    if type(v) is dt.datetime:
+        return "d", v.isoformat()
+    if type(v) is dt.date:
+        return "D", v.isoformat()
+    if type(v) is dt.time:
+        return "t", v.isoformat()
+    if type(v) is dt.timedelta:
+        return "k", f"{v.days},{v.seconds},{v.microseconds}"
+    raise TypeError(f"cannot cache value of type {type(v).__name__}")
+
+_DECODE = {
+    "N": lambda s: None, "n": lambda s: np.nan, "b": bool, "i": int, "f": float, "T": pd.Timestamp,
+    "d": dt.datetime.fromisoformat, "D": dt.date.fromisoformat, "t": dt.time.fromisoformat,
+    "k": lambda s: dt.timedelta(*map(int, s.split(","))),
+}
+
+def _decode_value(tag: str, text: str):
+    return text if tag == "s" else _DECODE[tag](text)
+
+def _mixed(s: pd.Series) -> bool:
+    return s.dtype == object and pd.api.types.infer_dtype(s, skipna=True) not in ("string", "empty")
+
+def _encode_column(s: pd.Series) -> tuple[list, list]:
+    pairs = [_encode_value(v) for v in s.tolist()]
+    return [p[0] for p in pairs], [p[1] for p in pairs]
+
+def _decode_column(tags, texts) -> np.ndarray:
+    out = np.array(texts, dtype=object)
+    tags = np.asarray(tags, dtype=object)
+    for tag in set(tags.tolist()) - {"s"}:
+        idx = np.flatnonzero(tags == tag)
+        out[idx] = [_decode_value(tag, x) for x in out[idx].tolist()]
+    return out
+
+def _to_table(df: pd.DataFrame) -> tuple[pd.DataFrame, list]:
+    """Feather-ready frame with positional column names; mixed columns become (text, tag) pairs."""
+    cols, mixed = {}, []
+    for i in range(df.shape[1]):
+        s = df.iloc[:, i].reset_index(drop=True)
+        if _mixed(s):
+            tags, texts = _encode_column(s)
+            cols[f"{i}"], cols[f"{i}:tag"] = pd.Series(texts, dtype=object), pd.Series(tags, dtype=object)
+            mixed.append(i)
+        else:
+            cols[f"{i}"] = s
+    return pd.DataFrame(cols), mixed
+
+def _frame_file(name: str) -> str:
+    return hashlib.sha1(name.encode("utf-8")).hexdigest()[:16]
+
+def get_frame(key: str, name: str) -> pd.DataFrame | None:
+    m = _read_manifest(key)
+    info = m.get("frames", {}).get(name)
+    if info is None:
+        return None
+    if info.get("format") != "feather2" or feather is None:
+        return None  # хуучин (pickle) бичлэгийг уншихгүй
+    try:
+        table = feather.read_feather(_entry(key) / info["file"])
+        mixed = set(info["mixed"])
+        cols = []
+        # Arrow-оос ирсэн dtype/None-г анхны хэлбэрт нь буцаана
+        for i, dtype in enumerate(info["dtypes"]):
+            s = table[f"{i}"]
+            if i in mixed:
+                s = pd.Series(_decode_column(table[f"{i}:tag"], s.tolist()), dtype=object)
+            elif dtype == "object":
+                s = s.astype(object).where(s.notna(), np.nan)
+            elif str(s.dtype) != dtype:
+                s = s.astype(dtype)
+            cols.append(s)
+        df = pd.DataFrame(dict(enumerate(cols)), index=pd.RangeIndex(len(table)))
+        df.columns = pd.Index([_decode_value(tag, x) for tag, x in info["columns"]])
+    except Exception:
+        return None  # зэрэг evict хийгдсэн эсвэл эвдэрсэн -> miss
+    touch(key)
+    return df
+
+def put_frame(key: str, name: str, df: pd.DataFrame) -> None:
+    if feather is None:
+        return
+    try:
+        columns = [_encode_value(c) for c in df.columns]
+        table, mixed = _to_table(df)
+        fname = _frame_file(name) + ".feather"
+        _write_atomic(_entry(key, create=True) / fname,
+                      lambda p: feather.write_feather(table, p, compression="lz4"))
+        _update_manifest(key, frames={name: {"file": fname, "format": "feather2", "columns": columns,
+                                             "mixed": mixed, "dtypes": [str(t) for t in df.dtypes]}})
+        written = (_entry(key) / fname).stat().st_size
+    except Exception:
+        return  # cache нь зөвхөн хурдасгуур; бичиж/хөрвүүлж чадахгүй бол алгасна
+    _grow(written)
+
+def frame_names(key: str) -> list[str]:
+    return list(_read_manifest(key).get("frames", {}))
+
+def drop_frames(key: str, names) -> None:
+    """Remove ``names`` (files and manifest records) from entry ``key``."""
+    names = set(names)
+    if not names:
+        return
+    try:
+        with _manifest_lock(key):
+            m = _read_manifest(key)
+            frames = m.get("frames", {})
+            gone = [frames.pop(n) for n in names if n in frames]
+            if not gone:
+                return
+            _write_manifest(key, m)
+        for info in gone:
+            (_entry(key) / info["file"]).unlink(missing_ok=True)
+    except OSError:
+        pass
+
+# ---------------------------------------------------------------------
+# LRU eviction
+# ---------------------------------------------------------------------
+def touch(key: str) -> None:
+    try:
+        os.utime(_entry(key))
+    except OSError:
+        pass
+
+def _entry_size(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.iterdir() if f.is_file())
+
+# Энэ process-ийн харсан cache-ийн хэмжээ: сүүлийн scan + түүнээс хойш бичсэн.
+# put_frame бүр бүх модыг scan хийхгүй; хязгаар давах үед (эсвэл бусад process-ийн
+# бичсэнийг тооцохоор хязгаарын 1/8-ийг бичих бүрт) л evict() ажиллана.
+_SIZE = {"seen": None, "since_scan": 0}
+_SIZE_LOCK = threading.Lock()
+
+def _grow(n: int) -> None:
+    with _SIZE_LOCK:
+        _SIZE["since_scan"] += n
+        if _SIZE["seen"] is not None:
+            _SIZE["seen"] += n
+        scan = (_SIZE["seen"] is None or _SIZE["seen"] > CACHE_MAX_BYTES
+                or _SIZE["since_scan"] > CACHE_MAX_BYTES // 8)
+    if scan:
+        evict()
+
+def evict(max_bytes: int | None = None) -> None:
+    """Drop least-recently-used entries until the cache fits ``max_bytes``."""
+    limit = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    entries = []
+    try:
+        for p in _cache_root().iterdir():
+            if p.is_dir():
+                entries.append((p.stat().st_mtime, _entry_size(p), p))
+    except OSError:
+        return
+    total = sum(size for _, size, _ in entries)
+    for _, size, p in sorted(entries):
+        if total <= limit:
+            break
+        shutil.rmtree(p, ignore_errors=True)
+        total -= size
+    with _SIZE_LOCK:
+        _SIZE["seen"], _SIZE["since_scan"] = total, 0
+
+# ---------------------------------------------------------------------
+# Workbook helpers
+# ---------------------------------------------------------------------
+def read_sheets(path: Path, sheets: list[str]) -> dict[str, pd.DataFrame]:
+    """Every sheet in ``sheets``; missing sheets come back as empty frames."""
+    key = file_hash(path)
+    names = xlsx_stream.sheet_names(path)
+    wb = None  # зөвхөн cache miss үед, нэг удаа нээнэ
+    out = {}
+    try:
+        for s in sheets:
+            df = get_frame(key, s) if s in names else pd.DataFrame()
+            if df is None:
+                wb = wb or xlsx_stream.open_workbook(path)
+                df = xlsx_stream.read_sheet(wb, s)
+                put_frame(key, s, df)
+            out[s] = df
+    finally:
+        if wb is not None:
+            wb.close()
+    return out
@@ -0,0 +1,217 @@
+# xlsx_stream.py
+# -*- coding: utf-8 -*-
+# Том GL sheet-ийг санах ой хязгаартай уншина.
+# Workbook-ийг нэг удаа read-only горимд нээж, мөрүүдийг CHUNK_ROWS-оор
+# задлан compact DataFrame болгоно. pd.read_excel шиг бүх sheet-ийг
+# Python list-of-lists болгон санах ойд барихгүй; үр дүн нь pd.read_excel-тэй
+# ижил (багана, dtype, утга).
+
+import datetime as dt
+import html
+import re
+import zipfile
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+from pandas.io.parsers import TextParser
+
+CHUNK_ROWS = 20_000
+
+# ---------------------------------------------------------------------
+# Workbook metadata
+# ---------------------------------------------------------------------
+_SHEET_TAG = re.compile(r"<(?:\w+:)?sheet\b[^>]*?\bname=\"([^\"]*)\"")
+
+def sheet_names(path: Path) -> list[str]:
+    """Sheet names straight from xl/workbook.xml – no cell or shared-string parsing."""
+    with zipfile.ZipFile(path) as z:
+        xml = z.read("xl/workbook.xml").decode("utf-8")
+    sheets = xml[xml.find("<sheets"):]
+    return [html.unescape(n) for n in _SHEET_TAG.findall(sheets)]
+
+def open_workbook(path: Path):
+    return load_workbook(path, read_only=True, data_only=True, keep_links=False)
+
+# ---------------------------------------------------------------------
+# Row streaming (pandas OpenpyxlReader-тэй ижил хөрвүүлэлт)
+# ---------------------------------------------------------------------
+def _convert_cell(cell):
+    if cell.value is None:
+        return ""
+    if cell.data_type == TYPE_ERROR:
+        return np.nan
+    if cell.data_type == TYPE_NUMERIC:
+        val = int(cell.value)
+        return val if val == cell.value else float(cell.value)
+    return cell.value
+
+def _row_chunks(ws, chunk_rows: int):
+    """Converted rows in lists of ``chunk_rows``; trailing empty rows are dropped."""
+    ws.reset_dimensions()
+    buf, n_empty = [], 0
+    for row in ws.rows:
+        vals = [_convert_cell(c) for c in row]
+        while vals and vals[-1] == "":
+            vals.pop()
+        if not vals:
+            n_empty += 1  # сүүлийн хоосон мөр эсэх нь дараа нь тодорхой болно
+            continue
+        for _ in range(n_empty):
+            buf.append([])
+            if len(buf) >= chunk_rows:
+                yield buf; buf = []
+        n_empty = 0
+        buf.append(vals)
+        if len(buf) >= chunk_rows:
+            yield buf; buf = []
+    if buf:
+        yield buf
+
+def _parse(rows: list, width: int) -> pd.DataFrame:
+    rows = [r + [""] * (width - len(r)) for r in rows]
+    return TextParser(rows, header=0, skip_blank_lines=False).read()
+
+# ---------------------------------------------------------------------
+# Column reconciliation
+# ---------------------------------------------------------------------
+# parse хийсэн dtype-аас анхны утгыг сэргээж болох эсэх
+_NATURAL = {"i": lambda v: type(v) is int,
+            "f": lambda v: v == "" or (type(v) in (int, float)),
+            "b": lambda v: type(v) is bool,
+            "M": lambda v: v == "" or type(v) is dt.datetime}
+
+def _raw_values(s: pd.Series, stash) -> list:
+    """Cell values as OpenpyxlReader produced them, for re-running inference."""
+    if stash is not None:
+        return stash
+    kind = s.dtype.kind
+    if kind == "f":
+        return ["" if v != v else (int(v) if v.is_integer() else v) for v in s.tolist()]
+    if kind == "M":
+        return ["" if v is None else v for v in s.to_numpy().astype(object).tolist()]
+    if kind in "ib":
+        return s.tolist()
+    return ["" if v is None or v is pd.NA or (isinstance(v, float) and v != v) else v
+            for v in s.astype(object).tolist()]
+
+def _reparse(name, vals: list, **kw) -> pd.Series:
+    return TextParser([[name]] + [[v] for v in vals], header=0, skip_blank_lines=False, **kw).read().iloc[:, 0]
+
+def _value_kind(raw, parsed) -> tuple:
+    # inference-д нөлөөлөх ангилал: анхны төрөл + parse хийсэн утгын төрөл, NaN, бүхэл эсэх;
+    # текстийн хувьд цифрээс бусад тэмдэгт ("12" ба "1e3" өөр)
+    chars = frozenset(c for c in raw if not c.isdigit()) if isinstance(raw, str) else None
+    return (type(raw), type(parsed), parsed != parsed, isinstance(parsed, float) and parsed.is_integer(), chars)
+
+def _samples(s: pd.Series, stash) -> list:
+    """First raw value of every value kind in one chunk (a handful, not the chunk)."""
+    seen = {}
+    for raw, parsed in zip(_raw_values(s, stash), s.tolist()):
+        seen.setdefault(_value_kind(raw, parsed), raw)
+    return list(seen.values())
+
+def _irregular(s: pd.Series, stash) -> bool:
+    # bool болон алдаатай (NaN) нүдтэй chunk: inference нь chunk-аар нийлэхгүй
+    if s.dtype.kind == "b":
+        return True
+    vals = stash if stash is not None else (s.tolist() if s.dtype == object else ())
+    return any(type(v) is bool or (stash is not None and type(v) is float and v != v) for v in vals)
+
+def _common_dtype(name, parts: list):
+    series = [s for s, _ in parts]
+    if any(s.dtype == object for s in series):
+        return np.dtype(object)  # холимог chunk: бүх баганад мөн холимог
+    text = [s.dtype for s in series if s.dtype.kind == "O"]
+    if text:  # бусад chunk-ийн анхны утга бүгд текст/хоосон бол текст, үгүй бол холимог
+        only_text = all(s.dtype.kind == "O" or (s.isna().all() if stash is None else
+                                                all(isinstance(v, str) for v in stash))
+                        for s, stash in parts)
+        return text[0] if only_text else np.dtype(object)
+    # тоо/огноо: ангилал бүрийн цөөн утгаар inference-ийг ажиллуулна
+    samples = []
+    for s, stash in parts:
+        samples += _samples(s, stash)
+    return _reparse(name, samples).dtype
+
+def _combine(name, parts: list) -> pd.Series:
+    """One column from its per-chunk parses, with the dtype inference over the
+    whole column would give.
+
+    When chunks disagree, their common dtype comes from the chunk dtypes (any
+    text chunk) or from inference over a few sample values of each value kind
+    per chunk, and every chunk is then converted to it on its own, so the raw
+    values of the whole column are never held at once. Columns with boolean or
+    error cells are the exception: their inference does not combine chunk by
+    chunk, so they are still re-inferred over the whole column.
+    """
+    series = [s for s, _ in parts]
+    dtypes = {str(s.dtype) for s in series}
+    if len(dtypes) == 1:
+        return pd.concat(series, ignore_index=True)
+    if any(_irregular(s, stash) for s, stash in parts):
+        vals = []
+        for s, stash in parts:
+            vals.extend(_raw_values(s, stash))
+        return _reparse(name, vals)
+    target = _common_dtype(name, parts)
+    if target.kind == "O":  # текст/холимог: chunk бүрийн анхны утга (хоосон -> NaN)
+        out = [s if s.dtype == object else _reparse(name, _raw_values(s, stash), dtype=object)
+               for s, stash in parts]
+        col = pd.concat(out, ignore_index=True)
+        return col if target == object else col.astype(target)
+    return pd.concat([s.astype(target) for s in series], ignore_index=True)
+
+# ---------------------------------------------------------------------
+# Public
+# ---------------------------------------------------------------------
+def read_sheet(wb, sheet: str, chunk_rows: int = CHUNK_ROWS) -> pd.DataFrame:
+    """``pd.read_excel(path, sheet_name=sheet)`` from an open read-only workbook, chunk by chunk."""
+    ws = wb[sheet]
+    header, width, names = None, 0, None
+    chunks = []  # [(n_rows, {col_pos: (series, stash)})]
+    for rows in _row_chunks(ws, chunk_rows):
+        if header is None:
+            header, rows = rows[0], rows[1:]
+            width = len(header)
+            if not rows:
+                continue
+        width = max(width, max(len(r) for r in rows))
+        df = _parse([header] + rows, width)
+        names = list(df.columns)
+        cols = {}
+        for j in range(df.shape[1]):
+            s = df.iloc[:, j]
+            stash = None
+            if s.dtype.kind in _NATURAL:
+                raw = [r[j] if j < len(r) else "" for r in rows]
+                if not all(map(_NATURAL[s.dtype.kind], raw)):
+                    stash = raw  # ж: "123" текст -> int болсон; анхны утгыг хадгална
+            cols[j] = (s, stash)
+        chunks.append((len(rows), cols))
+        del df, rows
+    if header is None:
+        return pd.DataFrame()
+    if not chunks:
+        return _parse([header], width)
+
+    out = {}
+    for j, name in enumerate(names):
+        parts = []
+        for n, cols in chunks:
+            # нарийн chunk-д байхгүй багана = хоосон нүднүүд
+            parts.append(cols.pop(j) if j in cols else (pd.Series(np.full(n, np.nan)), None))
+        out[name] = _combine(name, parts)
+    return pd.DataFrame(out)
+
+def read_sheets(path: Path, sheets: list[str], chunk_rows: int = CHUNK_ROWS) -> dict[str, pd.DataFrame]:
+    """Open ``path`` once and stream every requested sheet; missing ones come back empty."""
+    names = set(sheet_names(path))
+    if not names.intersection(sheets):
+        return {s: pd.DataFrame() for s in sheets}
+    wb = open_workbook(path)
+    try:
+        return {s: read_sheet(wb, s, chunk_rows) if s in names else pd.DataFrame() for s in sheets}
+    finally:
+        wb.close()